@@ -0,0 +1,180 @@
+# Описания упражнений (архитектур) в файлах specs/*.json и их компиляция
+# в эталонные графы для проверки.
+#
+# Спецификация задает меню блоков и этапы сборки (например, энкодер, затем
+# декодер). Каждый этап - стек из N одинаковых слоев: пролог, слой и эпилог.
+# Скомпилированная архитектура сохраняется в кэше (pickle), поэтому повторная
+# загрузка и переключение упражнений не разбирают JSON заново.
+import hashlib
+import json
+import os
+import pickle
+from typing import Dict, List, Optional
+
+from cache import default_cache_dir, read_cached, write_cached
+from validator import ReferenceGraph
+
+SPEC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'specs')
+DEFAULT_ARCHITECTURE = 'transformer'
+MAX_LAYERS = 12
+COMPILER_VERSION = 1  # увеличивается при изменении формата скомпилированных данных
+
+
+class LayerStack:
+    # Шаблон стека из N одинаковых слоев: пролог, слой и эпилог.
+    # В соединениях слоя индекс -1 - вход слоя (выход пролога или предыдущего
+    # слоя), выход слоя - его последний элемент; в соединениях эпилога
+    # -1 - выход последнего слоя.
+    def __init__(self, prefix, prefix_connections, layer, layer_connections,
+                 suffix=(), suffix_connections=(), cross_attention=None):
+        self.prefix = list(prefix)
+        self.prefix_connections = list(prefix_connections)
+        self.layer = list(layer)
+        self.layer_connections = list(layer_connections)
+        self.suffix = list(suffix)
+        self.suffix_connections = list(suffix_connections)
+        self.cross_attention = cross_attention  # индекс внутри слоя, куда приходит выход предыдущего этапа
+
+    def build(self, layers: int = 1):
+        # Возвращает (последовательность, соединения, выход стека, индексы cross-attention)
+        sequence = list(self.prefix)
+        connections = list(self.prefix_connections)
+        cross_attention = []
+        layer_input = len(self.prefix) - 1
+        for _ in range(layers):
+            offset = len(sequence)
+            sequence.extend(self.layer)
+            for start, end in self.layer_connections:
+                connections.append((layer_input if start == -1 else offset + start, offset + end))
+            if self.cross_attention is not None:
+                cross_attention.append(offset + self.cross_attention)
+            layer_input = len(sequence) - 1
+
+        offset = len(sequence)
+        sequence.extend(self.suffix)
+        for start, end in self.suffix_connections:
+            connections.append((layer_input if start == -1 else offset + start, offset + end))
+        return sequence, connections, layer_input, cross_attention
+
+
+class Stage:
+    # Скомпилированный этап сборки
+    def __init__(self, name: str, title: str, reference: ReferenceGraph, output: int, cross_attention: List[int]):
+        self.name = name                        # режим игры: 'encoder', 'decoder', ...
+        self.title = title                      # название для сообщений
+        self.reference = reference
+        self.output = output                    # индекс выхода этапа в эталоне
+        self.cross_attention = cross_attention  # куда должен приходить выход предыдущего этапа
+
+
+class Architecture:
+    def __init__(self, name: str, title: str, menu, colors, stages: List[Stage], layers: int):
+        self.name = name
+        self.title = title
+        self.menu = menu          # [(подпись, ключ размера из SIZE)]; 'pos' - блок позиционного кодирования
+        self.colors = colors      # цвета блоков, которых нет в стандартной палитре
+        self.stages = stages
+        self.layers = layers
+        self.source = name        # откуда загружена (см. spec_source); ее пишут в снимки работы
+
+    def stage(self, name: str) -> Optional[Stage]:
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        return None
+
+
+def available_architectures(spec_dir: str = SPEC_DIR) -> List[str]:
+    return sorted(os.path.splitext(name)[0] for name in os.listdir(spec_dir) if name.endswith('.json'))
+
+
+def spec_path(name: str, spec_dir: str = SPEC_DIR) -> str:
+    # Имя из specs/ или путь к собственному файлу спецификации
+    if name.endswith('.json') or os.sep in name:
+        return name
+    return os.path.join(spec_dir, f"{name}.json")
+
+
+def spec_source(path: str, spec_dir: str = SPEC_DIR) -> str:
+    # Как сослаться на загруженную спецификацию в снимке или трассе: имя для
+    # specs/, полный путь для собственного файла (имя из JSON тут не годится -
+    # по нему файл не найти)
+    path = os.path.abspath(path)
+    if os.path.dirname(path) == os.path.abspath(spec_dir):
+        return os.path.splitext(os.path.basename(path))[0]
+    return path
+
+
+def resolve_spec(source: str, spec_dirs=()) -> str:
+    # Спецификация из присланного снимка: только упражнения из specs/ или файлы
+    # из явно разрешенных каталогов, где ее ищут по имени файла (путь записан
+    # на машине студента), иначе снимок открыл бы произвольный .json
+    if source in available_architectures():
+        return source
+    for directory in spec_dirs:
+        path = os.path.join(directory, os.path.basename(source))
+        if path.endswith('.json') and os.path.isfile(path):
+            return path
+    raise ValueError(f"неизвестное упражнение: {source!r}")
+
+
+def compile_spec(spec: Dict, layers: int = 1) -> Architecture:
+    name = spec.get('name', '?')
+    if not 1 <= layers <= MAX_LAYERS:
+        raise ValueError(f"{name}: число слоев должно быть от 1 до {MAX_LAYERS}")
+    menu = [(label, size) for label, size in spec['menu']]
+    known = {label for label, _ in menu}
+    stages = []
+    for i, data in enumerate(spec['stages']):
+        stack = LayerStack(data['prefix'], map(tuple, data.get('prefix_connections', ())),
+                           data['layer'], map(tuple, data.get('layer_connections', ())),
+                           data.get('suffix', ()), map(tuple, data.get('suffix_connections', ())),
+                           data.get('cross_attention'))
+        if stack.cross_attention is not None and i == 0:
+            raise ValueError(f"{name}: у первого этапа нет предыдущего для cross-attention")
+        sequence, connections, output, cross_attention = stack.build(layers)
+        unknown = set(sequence) - known
+        if unknown:
+            raise ValueError(f"{name}: блоков {sorted(unknown)} нет в меню")
+        if any(not (0 <= start < len(sequence) and 0 <= end < len(sequence)) for start, end in connections):
+            raise ValueError(f"{name}: соединение этапа {data['name']} ссылается на несуществующий блок")
+        stages.append(Stage(data['name'], data.get('title', data['name']),
+                            ReferenceGraph(sequence, connections), output, cross_attention))
+    if not 1 <= len(stages) <= 2:
+        raise ValueError(f"{name}: поддерживаются один или два этапа сборки")
+    colors = {label: tuple(color) for label, color in spec.get('colors', {}).items()}
+    return Architecture(name, spec.get('title', name), menu, colors, stages, layers)
+
+
+_LOADED: Dict = {}
+
+
+def load_architecture(name: str = DEFAULT_ARCHITECTURE, layers: int = 1,
+                      cache_dir: Optional[str] = None) -> Architecture:
+    # Скомпилированная архитектура: из памяти, из кэша на диске или из JSON
+    path = spec_path(name)
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, layers)
+    architecture = _LOADED.get(key)
+    if architecture is not None:
+        return architecture
+
+    # В имени - хэш полного пути: одноименные спецификации из разных каталогов
+    # (--arch path/x.json) не должны читать кэш друг друга
+    stem = os.path.splitext(os.path.basename(path))[0]
+    location = hashlib.sha1(key[0].encode('utf-8')).hexdigest()[:12]
+    cache_path = os.path.join(cache_dir if cache_dir is not None else default_cache_dir(), 'specs',
+                              f"{stem}-{location}-{layers}-{stat.st_mtime_ns}-{stat.st_size}-v{COMPILER_VERSION}.pickle")
+    data = read_cached(cache_path)
+    if data is not None:
+        try:
+            architecture = pickle.loads(data)
+        except Exception:
+            architecture = None  # поврежденный или устаревший кэш просто пересобираем
+    if architecture is None:
+        with open(path, encoding='utf-8') as file:
+            architecture = compile_spec(json.load(file), layers)
+        write_cached(cache_path, pickle.dumps(architecture, protocol=pickle.HIGHEST_PROTOCOL))
+    architecture.source = spec_source(path)
+    _LOADED[key] = architecture
+    return architecture
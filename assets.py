@@ -0,0 +1,58 @@
+# Загрузка графических ресурсов с кэшем уже отмасштабированных картинок.
+#
+# Декодирование PNG и smoothscale выполняются один раз: результат сохраняется
+# как сырые RGBA-пиксели в локальном каталоге кэша и при следующих запусках
+# читается одним вызовом. Ключ кэша - имя файла, целевой размер, а также
+# время изменения и размер исходника, поэтому правка картинки сбрасывает кэш.
+import os
+from typing import Dict, Optional, Tuple
+
+import pygame
+
+from cache import default_cache_dir, read_cached, write_cached
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+
+def to_display_format(surface: pygame.Surface) -> pygame.Surface:
+    # convert_alpha возможен только после создания окна
+    if pygame.display.get_init() and pygame.display.get_surface() is not None:
+        return surface.convert_alpha()
+    return surface
+
+
+class AssetCache:
+    def __init__(self, static_dir: str = STATIC_DIR, cache_dir: Optional[str] = None):
+        self.static_dir = static_dir
+        self.cache_dir = cache_dir if cache_dir is not None else default_cache_dir()
+        self.surfaces: Dict[Tuple[str, Tuple[int, int]], pygame.Surface] = {}
+
+    def cache_path(self, name: str, size: Tuple[int, int]) -> str:
+        stat = os.stat(os.path.join(self.static_dir, name))
+        stem = os.path.splitext(name)[0]
+        return os.path.join(self.cache_dir,
+                            f"{stem}-{size[0]}x{size[1]}-{stat.st_mtime_ns}-{stat.st_size}.rgba")
+
+    def load_scaled(self, name: str, size: Tuple[int, int]) -> pygame.Surface:
+        # Картинка из static/, отмасштабированная до size и приведенная к формату экрана
+        size = (int(size[0]), int(size[1]))
+        key = (name, size)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            path = self.cache_path(name, size)
+            data = read_cached(path)
+            if data is not None and len(data) == size[0] * size[1] * 4:
+                surface = pygame.image.frombytes(data, size, 'RGBA')
+            else:
+                surface = pygame.image.load(os.path.join(self.static_dir, name))
+                surface = pygame.transform.smoothscale(surface, size)
+                write_cached(path, pygame.image.tobytes(surface, 'RGBA'))
+            surface = to_display_format(surface)
+            self.surfaces[key] = surface
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+ASSETS = AssetCache()
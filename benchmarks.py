@@ -0,0 +1,189 @@
+# Микробенчмарки горячих путей игры на синтетических схемах от 10 до 10 000 блоков
+# и прямого прохода эталонной схемы (engine.py).
+#
+#   python benchmarks.py                          # замер и печать таблицы
+#   python benchmarks.py --save bench.json        # сохранить базовую линию
+#   python benchmarks.py --compare bench.json     # сравнить с базовой линией
+#
+# При сравнении замеры медленнее базовой линии больше чем на --tolerance
+# помечаются как регрессия, и скрипт завершается с кодом 1.
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+import pygame
+
+import transformer_game as tg
+from architectures import DEFAULT_ARCHITECTURE, load_architecture
+from engine import Program, reference_stages
+from validator import validate
+
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+FORWARD_LAYERS = 6  # слоев эталонного трансформера в замере прямого прохода
+
+
+def build_diagram(game, size: int, seed: int = 0):
+    # Копии эталонного энкодера, пока не наберется size блоков; стрелки
+    # повторяют соединения эталона внутри каждой копии
+    rng = random.Random(seed)
+    reference = game.current_reference()
+    sequence = reference.labels
+    connections = reference.edge_list
+    left, top = tg.MENU_WIDTH + 20, 80
+    width, height = tg.WINDOW_WIDTH - left - 170, tg.WINDOW_HEIGHT - top - 80
+
+    blocks = []
+    while len(blocks) < size:
+        copy = []
+        for name in sequence[:size - len(blocks)]:
+            pos = (left + rng.randrange(width), top + rng.randrange(height))
+            if name == "Positional\nEncoding":
+                block = tg.YinYangBlock(name, pos, tg.SIZE['pos'])
+            else:
+                block = tg.TransformerBlock(name, pos, tg.SIZE['block'])
+            game.add_block(block)
+            copy.append(block)
+        for start, end in connections:
+            if start < len(copy) and end < len(copy):
+                game.add_arrow(tg.Arrow(copy[start].connection_points['top'],
+                                        copy[end].connection_points['bottom']))
+        blocks.extend(copy)
+
+    for block in blocks:
+        block.show_points()
+    return blocks
+
+
+def measure(func: Callable[[], None], min_time: float = 0.2, max_repeats: int = 200) -> Dict[str, float]:
+    # Повторяем до min_time секунд, но не больше max_repeats раз
+    func()  # прогрев кэшей
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_repeats and (len(samples) < 3 or time.perf_counter() - started < min_time):
+        t0 = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {'median_ms': statistics.median(samples), 'min_ms': min(samples), 'repeats': len(samples)}
+
+
+def bench_size(size: int) -> Dict[str, Dict[str, float]]:
+    game = tg.TransformerGame(headless=True)
+    blocks = build_diagram(game, size)
+    surface = pygame.Surface((tg.WINDOW_WIDTH, tg.WINDOW_HEIGHT))
+    rng = random.Random(size)
+    probes = [rng.choice(blocks).connection_points[side].pos
+              for side in rng.choices(('top', 'right', 'bottom', 'left'), k=64)]
+
+    reference = game.current_reference()
+
+    def validate_diagram():
+        # То же, что кнопка «Проверить», но без ее последствий: верная схема
+        # (например, --sizes 6) заморозила бы этап, и следующие замеры шли бы
+        # уже по другому режиму игры
+        labels = {block: block.name for block in game.blocks}
+        arrows_by_edge = {}
+        for arrow in game.arrows:
+            arrows_by_edge.setdefault((arrow.start_point.block, arrow.end_point.block), arrow)
+        validate(labels, arrows_by_edge, reference)
+
+    def hit_test():
+        # Те же запросы, что handle_events делает при нажатии кнопки мыши
+        for pos in probes:
+            game.point_at(pos)
+            game.block_under_cursor(pos)
+
+    def arrow_table_draw():
+        # Пакетная отрисовка по готовой геометрии, как при построении слоя стрелок
+        game.arrow_table.draw(surface, game.arrow_table.arrows)
+
+    def block_draw():
+        for block in game.blocks:
+            block.draw(surface)
+
+    def full_frame():
+        game.invalidate_all()
+        game.draw()
+
+    return {
+        'validate': measure(validate_diagram),
+        'hit_test_x64': measure(hit_test),
+        'arrow_table_draw': measure(arrow_table_draw),
+        'block_draw': measure(block_draw),
+        'full_frame': measure(full_frame),
+    }
+
+
+def run(sizes: List[int]) -> Dict:
+    results = {}
+    for size in sizes:
+        for name, stats in bench_size(size).items():
+            results[f"{name}[{size}]"] = stats
+    # Пропускная способность движка исполнения схем (engine.py) на игрушечном батче
+    program = Program(reference_stages(load_architecture(DEFAULT_ARCHITECTURE, FORWARD_LAYERS)))
+    results[f"forward_pass[{DEFAULT_ARCHITECTURE}:{FORWARD_LAYERS}]"] = measure(program.run)
+    return {
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    regressions = []
+    for key, stats in current['results'].items():
+        base = baseline['results'].get(key)
+        if base is None:
+            continue
+        ratio = stats['median_ms'] / base['median_ms'] if base['median_ms'] else 1.0
+        if ratio > 1 + tolerance:
+            regressions.append(f"{key}: {base['median_ms']:.3f} -> {stats['median_ms']:.3f} мс (x{ratio:.2f})")
+    return regressions
+
+
+def format_results(current: Dict, baseline: Dict = None) -> str:
+    lines = [f"{'замер':<28}{'медиана, мс':>14}{'мин, мс':>12}{'база, мс':>12}"]
+    for key, stats in current['results'].items():
+        base = baseline['results'].get(key) if baseline else None
+        base_text = f"{base['median_ms']:>12.3f}" if base else f"{'-':>12}"
+        lines.append(f"{key:<28}{stats['median_ms']:>14.3f}{stats['min_ms']:>12.3f}{base_text}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки горячих путей тренажера")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="размеры схем через запятую (по умолчанию %(default)s)")
+    parser.add_argument('--save', metavar='PATH', help="сохранить результаты как базовую линию")
+    parser.add_argument('--compare', metavar='PATH', help="сравнить с базовой линией")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="допустимое замедление относительно базы (доля, по умолчанию %(default)s)")
+    args = parser.parse_args(argv)
+
+    current = run([int(size) for size in args.sizes.split(',')])
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            baseline = json.load(file)
+    print(format_results(current, baseline))
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(current, file, indent=2)
+
+    if baseline is not None:
+        regressions = compare(current, baseline, args.tolerance)
+        if regressions:
+            print("\nЗамедления больше допустимого:")
+            print('\n'.join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,33 @@
+# Общий локальный каталог кэша игры и атомарная запись файлов в него.
+import os
+from typing import Optional
+
+
+def default_cache_dir() -> str:
+    # TRANSFORMER_GAME_CACHE позволяет вынести кэш с сетевого домашнего каталога
+    path = os.environ.get('TRANSFORMER_GAME_CACHE')
+    if path:
+        return path
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'transformer_game')
+
+
+def read_cached(path: str) -> Optional[bytes]:
+    try:
+        with open(path, 'rb') as file:
+            return file.read()
+    except OSError:
+        return None
+
+
+def write_cached(path: str, data: bytes):
+    # Кэш - только ускорение: ошибки записи (каталог только для чтения и т.п.)
+    # игнорируются, а временный файл не дает читателям увидеть запись наполовину
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
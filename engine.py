@@ -0,0 +1,549 @@
+# Исполняемая схема: собранный и проверенный граф блоков компилируется в
+# прямой проход на NumPy по игрушечному батчу.
+#
+#   python engine.py --arch transformer --layers 6 --batch 16 --seq 64
+#
+# Каждый блок становится шагом программы: эмбеддинги - таблица поиска,
+# позиционное кодирование - синусоиды, внимание - батчевое scaled
+# dot-product (маскированное - с причинной маской), Add & Norm - сумма входов
+# и LayerNorm (в pre-norm схемах Add и Layer Norm - отдельные блоки), Feed
+# Forward, Linear и Softmax - обычные операции. Где граф
+# позволяет, соседние блоки сливаются в один шаг: эмбеддинг с позиционным
+# кодированием и Linear с Softmax, а проекции Q, K, V внимания считаются
+# одним умножением. Для каждого шага замеряется время и считаются FLOP.
+#
+# Схема задается по этапам: {узел: подпись} и ребра. Ребро из узла
+# предыдущего этапа (выход энкодера) - память для cross-attention.
+#
+# Генерация (--decode 16,32,64): декодер жадно выдает по токену за шаг. С
+# KV-кэшем каждый шаг считает только новый токен, а K и V прошлых позиций
+# берет из кэша; без кэша весь префикс пересчитывается заново. Таблица
+# сравнивает токены/с и память обоих режимов по мере роста длины.
+#
+#   python engine.py --arch transformer --layers 2 --decode 16,32,64,128
+import argparse
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+import numpy as np
+
+from architectures import DEFAULT_ARCHITECTURE, MAX_LAYERS, load_architecture
+
+INPUT_EMBEDDING = 'Input\nEmbedding'
+OUTPUT_EMBEDDING = 'Output\nEmbedding'
+POSITIONAL_ENCODING = 'Positional\nEncoding'
+ATTENTION = 'Multi-Head\nAttention'
+MASKED_ATTENTION = 'Masked\nMulti-Head\nAttention'
+ADD_NORM = 'Add & Norm'
+LAYER_NORM = 'Layer Norm'
+ADD = 'Add'
+FEED_FORWARD = 'Feed\nForward'
+LINEAR = 'Linear'
+SOFTMAX = 'Softmax'
+
+# Какую последовательность токенов читает эмбеддинг
+TOKEN_INPUTS = {INPUT_EMBEDDING: 'source', OUTPUT_EMBEDDING: 'target'}
+
+StageGraph = Tuple[Dict[Hashable, str], Sequence[Tuple[Hashable, Hashable]]]
+
+
+class EngineConfig:
+    # Размеры игрушечной модели и батча
+    def __init__(self, d_model: int = 64, heads: int = 4, d_ff: int = 256, vocab: int = 512,
+                 batch: int = 8, seq_len: int = 32, seed: int = 0):
+        if d_model % heads:
+            raise ValueError("d_model должно делиться на число голов")
+        self.d_model = d_model
+        self.heads = heads
+        self.d_ff = d_ff
+        self.vocab = vocab
+        self.batch = batch
+        self.seq_len = seq_len
+        self.seed = seed
+
+
+class Step:
+    # Шаг программы: один блок схемы или несколько слитых подряд
+    def __init__(self, nodes: Tuple, kind: str, inputs: List, params: Dict, flops: int):
+        self.nodes = nodes    # блоки шага; результат записывается под последним
+        self.kind = kind
+        self.inputs = inputs  # узлы, выходы которых нужны шагу (для cross-attention: запрос, память)
+        self.params = params
+        self.flops = flops
+
+    @property
+    def fused(self) -> bool:
+        return len(self.nodes) > 1
+
+
+class Profile:
+    # Медианное время каждого шага по нескольким прогонам
+    def __init__(self, program: 'Program', times_ms: List[float]):
+        self.program = program
+        self.times_ms = times_ms
+        self.total_ms = sum(times_ms)
+        self.total_flops = sum(step.flops for step in program.steps)
+
+    @property
+    def tokens_per_second(self) -> float:
+        config = self.program.config
+        return config.batch * config.seq_len / (self.total_ms / 1000) if self.total_ms else 0.0
+
+    def by_node(self) -> Dict[Hashable, Tuple[Step, float]]:
+        # Блок схемы -> (его шаг, время шага в мс); слитые блоки делят шаг
+        return {node: (step, ms) for step, ms in zip(self.program.steps, self.times_ms) for node in step.nodes}
+
+    def table(self, name=str) -> str:
+        # name: подпись узла для таблицы; слитые блоки дописываются к первому
+        lines = [f"{'шаг':<48}{'мс':>9}{'MFLOP':>10}{'доля FLOP':>11}"]
+        for step, ms in zip(self.program.steps, self.times_ms):
+            title = ' + '.join([name(step.nodes[0])] + [self.program.labels[node].replace('\n', ' ')
+                                                         for node in step.nodes[1:]])
+            share = step.flops / self.total_flops if self.total_flops else 0.0
+            lines.append(f"{title:<48.48}{ms:>9.3f}{step.flops / 1e6:>10.2f}{share:>11.1%}")
+        lines.append(f"итого: {self.total_ms:.3f} мс, {self.total_flops / 1e6:.1f} MFLOP, "
+                     f"{self.tokens_per_second:,.0f} токенов/с")
+        return '\n'.join(lines)
+
+
+def _topological_order(labels: Dict, out_edges: Dict, in_edges: Dict) -> List:
+    # Порядок Кана; среди готовых узлов - в порядке перечисления
+    order = {node: i for i, node in enumerate(labels)}
+    pending = {node: len(in_edges[node]) for node in labels}
+    ready = deque(node for node in labels if pending[node] == 0)
+    result = []
+    while ready:
+        node = ready.popleft()
+        result.append(node)
+        for end in sorted(out_edges[node], key=order.__getitem__):
+            pending[end] -= 1
+            if pending[end] == 0:
+                ready.append(end)
+    if len(result) != len(labels):
+        raise ValueError("в схеме есть цикл, ее нельзя выполнить")
+    return result
+
+
+def _sinusoids(seq_len: int, d_model: int) -> np.ndarray:
+    position = np.arange(seq_len)[:, None]
+    rate = np.exp(-np.log(10000.0) * (np.arange(0, d_model, 2) / d_model))
+    table = np.zeros((seq_len, d_model), dtype=np.float32)
+    table[:, 0::2] = np.sin(position * rate)
+    table[:, 1::2] = np.cos(position * rate)
+    return table
+
+
+class Program:
+    # Скомпилированный прямой проход: шаги в топологическом порядке и их веса
+    def __init__(self, stages: Sequence[StageGraph], config: EngineConfig = None):
+        self.config = config or EngineConfig()
+        self.rng = np.random.default_rng(self.config.seed)
+        self.labels = {}
+        stage_of = {}
+        out_edges, in_edges = defaultdict(list), defaultdict(list)
+        for index, (labels, edges) in enumerate(stages):
+            for node, label in labels.items():
+                self.labels[node] = label
+                stage_of[node] = index
+            for start, end in edges:
+                out_edges[start].append(end)
+                in_edges[end].append(start)
+        unknown = [node for node in list(out_edges) + list(in_edges) if node not in self.labels]
+        if unknown:
+            raise ValueError("стрелка ведет к блоку, которого нет в схеме")
+
+        self.positional = _sinusoids(self.config.seq_len, self.config.d_model)
+        self.steps = []
+        fused = set()
+        for node in _topological_order(self.labels, out_edges, in_edges):
+            if node in fused:
+                continue
+            step = self._compile_node(node, out_edges, in_edges, stage_of)
+            fused.update(step.nodes[1:])
+            self.steps.append(step)
+
+        config = self.config
+        self.tokens = {name: self.rng.integers(config.vocab, size=(config.batch, config.seq_len))
+                       for name in TOKEN_INPUTS.values()}
+
+    def _weight(self, rows: int, cols: int) -> np.ndarray:
+        return (self.rng.standard_normal((rows, cols)) / np.sqrt(rows)).astype(np.float32)
+
+    def _single_successor(self, node, label: str, out_edges, in_edges):
+        # Узел, с которым node можно слить: единственный потребитель с единственным входом
+        successors = out_edges[node]
+        if len(successors) == 1 and self.labels[successors[0]] == label and len(in_edges[successors[0]]) == 1:
+            return successors[0]
+        return None
+
+    def _compile_node(self, node, out_edges, in_edges, stage_of) -> Step:
+        config = self.config
+        b, t, d, f, v = config.batch, config.seq_len, config.d_model, config.d_ff, config.vocab
+        label = self.labels[node]
+        inputs = in_edges[node]
+        tokens = b * t
+
+        def expect(count):
+            if len(inputs) != count:
+                raise ValueError(f"у блока «{label.replace(chr(10), ' ')}» должно быть входов: {count}")
+
+        if label in TOKEN_INPUTS:
+            expect(0)
+            params = {'table': self._weight(v, d) * np.float32(np.sqrt(d)), 'tokens': TOKEN_INPUTS[label]}
+            positional = self._single_successor(node, POSITIONAL_ENCODING, out_edges, in_edges)
+            if positional is not None:
+                return Step((node, positional), 'embed_positional', [], params, tokens * d)
+            return Step((node,), 'embed', [], params, 0)
+
+        if label == POSITIONAL_ENCODING:
+            expect(1)
+            return Step((node,), 'positional', list(inputs), {}, tokens * d)
+
+        if label in (ATTENTION, MASKED_ATTENTION):
+            # Вход из того же этапа - запрос, из предыдущего - память (выход энкодера)
+            local = [start for start in inputs if stage_of[start] == stage_of[node]]
+            memory = [start for start in inputs if stage_of[start] != stage_of[node]]
+            if len(local) != 1 or len(memory) > 1:
+                raise ValueError("у блока внимания должен быть один вход и не больше одного выхода энкодера")
+            h = config.heads
+            flops = 2 * tokens * d * 4 * d + 2 * 2 * b * h * t * t * (d // h)
+            params = {'causal': label == MASKED_ATTENTION, 'output': self._weight(d, d)}
+            if memory:
+                params.update(query=self._weight(d, d), key_value=self._weight(d, 2 * d))
+                return Step((node,), 'cross_attention', local + memory, params, flops)
+            params['qkv'] = self._weight(d, 3 * d)
+            return Step((node,), 'attention', local, params, flops)
+
+        if label == ADD_NORM:
+            if not inputs:
+                raise ValueError("у блока Add & Norm нет входов")
+            params = {'gamma': np.ones(d, dtype=np.float32), 'beta': np.zeros(d, dtype=np.float32)}
+            return Step((node,), 'add_norm', list(inputs), params, tokens * d * (len(inputs) + 7))
+
+        if label == LAYER_NORM:
+            expect(1)
+            params = {'gamma': np.ones(d, dtype=np.float32), 'beta': np.zeros(d, dtype=np.float32)}
+            return Step((node,), 'layer_norm', list(inputs), params, tokens * d * 7)
+
+        if label == ADD:
+            if len(inputs) < 2:
+                raise ValueError("у блока Add должно быть хотя бы два входа")
+            return Step((node,), 'add', list(inputs), {}, tokens * d * (len(inputs) - 1))
+
+        if label == FEED_FORWARD:
+            expect(1)
+            params = {'w1': self._weight(d, f), 'b1': np.zeros(f, dtype=np.float32),
+                      'w2': self._weight(f, d), 'b2': np.zeros(d, dtype=np.float32)}
+            return Step((node,), 'feed_forward', list(inputs), params, 2 * 2 * tokens * d * f)
+
+        if label == LINEAR:
+            expect(1)
+            params = {'weight': self._weight(d, v), 'bias': np.zeros(v, dtype=np.float32)}
+            softmax = self._single_successor(node, SOFTMAX, out_edges, in_edges)
+            if softmax is not None:
+                return Step((node, softmax), 'linear_softmax', list(inputs), params, 2 * tokens * d * v + 4 * tokens * v)
+            return Step((node,), 'linear', list(inputs), params, 2 * tokens * d * v)
+
+        if label == SOFTMAX:
+            expect(1)
+            return Step((node,), 'softmax', list(inputs), {}, 4 * tokens * v)
+
+        raise ValueError(f"блок «{label.replace(chr(10), ' ')}» нельзя выполнить")
+
+    # Ядра шагов: x - (batch, seq, d_model)
+
+    def _attention(self, query, key, value, causal: bool):
+        b, t, d = query.shape
+        h = self.config.heads
+
+        def heads(x):
+            return x.reshape(b, x.shape[1], h, d // h).transpose(0, 2, 1, 3)
+
+        q, k, v = heads(query), heads(key), heads(value)
+        scores = q @ k.transpose(0, 1, 3, 2)
+        scores *= np.float32(1 / np.sqrt(d // h))
+        if causal:
+            scores += np.triu(np.full((t, k.shape[2]), -np.inf, dtype=np.float32), 1)
+        _softmax_inplace(scores)
+        return (scores @ v).transpose(0, 2, 1, 3).reshape(b, t, d)
+
+    def _execute(self, step: Step, values: Dict, tokens: Dict = None, positional: np.ndarray = None):
+        # tokens и positional подменяют батч и синусоиды (генерация по префиксу)
+        tokens = self.tokens if tokens is None else tokens
+        positional = self.positional if positional is None else positional
+        params = step.params
+        kind = step.kind
+        if kind in ('embed', 'embed_positional'):
+            x = params['table'][tokens[params['tokens']]]
+            if kind == 'embed_positional':
+                x += positional
+            return x
+        x = values[step.inputs[0]]
+        if kind == 'positional':
+            return x + positional
+        if kind == 'attention':
+            q, k, v = np.split(x @ params['qkv'], 3, axis=-1)
+            return self._attention(q, k, v, params['causal']) @ params['output']
+        if kind == 'cross_attention':
+            k, v = np.split(values[step.inputs[1]] @ params['key_value'], 2, axis=-1)
+            return self._attention(x @ params['query'], k, v, params['causal']) @ params['output']
+        if kind in ('add', 'add_norm'):
+            # Сумма остаточных входов (и для Add & Norm - LayerNorm) в одном буфере
+            x = x.copy()
+            for start in step.inputs[1:]:
+                x += values[start]
+            if kind == 'add_norm':
+                _layer_norm_inplace(x, params)
+            return x
+        if kind == 'layer_norm':
+            x = x.copy()
+            _layer_norm_inplace(x, params)
+            return x
+        if kind == 'feed_forward':
+            hidden = x @ params['w1']
+            hidden += params['b1']
+            np.maximum(hidden, 0, out=hidden)
+            out = hidden @ params['w2']
+            out += params['b2']
+            return out
+        if kind in ('linear', 'linear_softmax'):
+            logits = x @ params['weight']
+            logits += params['bias']
+            if kind == 'linear_softmax':
+                _softmax_inplace(logits)
+            return logits
+        if kind == 'softmax':
+            out = x.copy()
+            _softmax_inplace(out)
+            return out
+        raise ValueError(f"неизвестный шаг: {kind}")
+
+    def run(self, timings: List[float] = None):
+        # Прямой проход; timings, если передан, получает время каждого шага в мс
+        values = {}
+        clock = time.perf_counter
+        for step in self.steps:
+            started = clock()
+            values[step.nodes[-1]] = self._execute(step, values)
+            if timings is not None:
+                timings.append((clock() - started) * 1000)
+        return values[self.steps[-1].nodes[-1]] if self.steps else None
+
+    def profile(self, repeats: int = 5) -> Profile:
+        self.run()  # прогрев
+        samples = []
+        for _ in range(repeats):
+            timings = []
+            self.run(timings)
+            samples.append(timings)
+        return Profile(self, [statistics.median(column) for column in zip(*samples)])
+
+    # Авторегрессионная генерация: декодер выдает по одному токену за шаг
+
+    def decoder_steps(self) -> List[Step]:
+        # Шаги, зависящие от целевой последовательности; остальные (энкодер)
+        # считаются один раз до начала генерации
+        dynamic, steps = set(), []
+        for step in self.steps:
+            if step.params.get('tokens') == 'target' or any(node in dynamic for node in step.inputs):
+                dynamic.add(step.nodes[-1])
+                steps.append(step)
+        if not steps:
+            raise ValueError("в схеме нет декодера (Output Embedding), генерировать нечего")
+        if steps[-1] is not self.steps[-1] or steps[-1].kind not in ('linear', 'linear_softmax', 'softmax'):
+            raise ValueError("декодер должен заканчиваться блоком Linear")
+        if any(step.kind == 'attention' and not step.params['causal'] for step in steps):
+            raise ValueError("внимание декодера должно быть маскированным, иначе токены видят будущее")
+        return steps
+
+    def _execute_cached(self, step: Step, values: Dict, sequence: np.ndarray, positional: np.ndarray,
+                        position: int, caches: Dict):
+        # Шаг декодера только для нового токена на позиции position
+        params = step.params
+        kind = step.kind
+        if kind in ('embed', 'embed_positional'):
+            x = params['table'][sequence[:, position:position + 1]]
+            if kind == 'embed_positional':
+                x += positional[position]
+            return x
+        if kind == 'positional':
+            return values[step.inputs[0]] + positional[position]
+        if kind == 'attention':
+            # K и V нового токена дописываются в кэш, запрос смотрит на все прошлые позиции
+            q, k, v = np.split(values[step.inputs[0]] @ params['qkv'], 3, axis=-1)
+            if step not in caches:
+                shape = (self.config.batch, len(positional), self.config.d_model)
+                caches[step] = (np.empty(shape, dtype=np.float32), np.empty(shape, dtype=np.float32))
+            keys, vals = caches[step]
+            keys[:, position] = k[:, 0]
+            vals[:, position] = v[:, 0]
+            end = position + 1
+            return self._attention(q, keys[:, :end], vals[:, :end], False) @ params['output']
+        if kind == 'cross_attention':
+            # Память энкодера не меняется: ее K и V проецируются один раз за генерацию
+            if step not in caches:
+                caches[step] = tuple(np.split(values[step.inputs[1]] @ params['key_value'], 2, axis=-1))
+            keys, vals = caches[step]
+            if params['causal']:
+                keys, vals = keys[:, :position + 1], vals[:, :position + 1]
+            return self._attention(values[step.inputs[0]] @ params['query'], keys, vals, False) @ params['output']
+        return self._execute(step, values)
+
+    def generate(self, length: int, cache: bool = True, stats: Dict = None) -> np.ndarray:
+        # Жадная генерация: первый токен берется из целевой последовательности,
+        # каждый следующий - argmax выхода декодера на последней позиции.
+        # cache=True - KV-кэш, каждый шаг обрабатывает один новый токен;
+        # cache=False - на каждом шаге весь префикс считается заново.
+        # stats, если передан, получает размер кэша в байтах ('cache_bytes')
+        if length < 2:
+            raise ValueError("длина генерации должна быть не меньше 2")
+        decoder = self.decoder_steps()
+        values = {}
+        for step in self.steps:
+            if step not in decoder:
+                values[step.nodes[-1]] = self._execute(step, values)
+
+        positional = _sinusoids(length, self.config.d_model)
+        sequence = np.zeros((self.config.batch, length), dtype=self.tokens['target'].dtype)
+        sequence[:, 0] = self.tokens['target'][:, 0]
+        output = decoder[-1].nodes[-1]
+        caches = {}
+        for position in range(length - 1):
+            if cache:
+                for step in decoder:
+                    values[step.nodes[-1]] = self._execute_cached(step, values, sequence, positional,
+                                                                  position, caches)
+            else:
+                tokens = dict(self.tokens, target=sequence[:, :position + 1])
+                for step in decoder:
+                    values[step.nodes[-1]] = self._execute(step, values, tokens, positional[:position + 1])
+            sequence[:, position + 1] = values[output][:, -1].argmax(axis=-1)
+        if stats is not None:
+            stats['cache_bytes'] = sum(array.nbytes for pair in caches.values() for array in pair)
+        return sequence
+
+
+class DecodeResult:
+    # Замер генерации одной длины в одном режиме
+    def __init__(self, length: int, cached: bool, tokens: int, seconds: float, peak_bytes: int,
+                 cache_bytes: int):
+        self.length = length
+        self.cached = cached
+        self.tokens = tokens  # сгенерировано токенов во всем батче
+        self.seconds = seconds
+        self.peak_bytes = peak_bytes  # пик выделенной памяти за генерацию
+        self.cache_bytes = cache_bytes
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.tokens / self.seconds if self.seconds else 0.0
+
+
+def _measure_generation(program: Program, length: int, cached: bool, repeats: int) -> DecodeResult:
+    # Время - медиана repeats прогонов; пик памяти - отдельным прогоном под
+    # tracemalloc (NumPy сообщает ему о своих буферах), чтобы трассировка не
+    # искажала время
+    stats = {}
+    program.generate(length, cached, stats)  # прогрев
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        program.generate(length, cached)
+        samples.append(time.perf_counter() - started)
+
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    program.generate(length, cached)
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    if not tracing:
+        tracemalloc.stop()
+    return DecodeResult(length, cached, program.config.batch * (length - 1), statistics.median(samples),
+                        peak, stats['cache_bytes'])
+
+
+def compare_decoding(program: Program, lengths: Sequence[int], repeats: int = 3
+                     ) -> List[Tuple[DecodeResult, DecodeResult]]:
+    # Для каждой длины: (с KV-кэшем, полный пересчет префикса)
+    return [(_measure_generation(program, length, True, repeats),
+             _measure_generation(program, length, False, repeats)) for length in lengths]
+
+
+def decode_table(results: Sequence[Tuple[DecodeResult, DecodeResult]]) -> str:
+    lines = [f"{'длина':>6}{'кэш, ток/с':>13}{'пересчет, ток/с':>17}{'ускорение':>11}"
+             f"{'KV-кэш, КБ':>12}{'пик с кэшем, КБ':>17}{'пик без кэша, КБ':>18}"]
+    for cached, full in results:
+        speedup = cached.tokens_per_second / full.tokens_per_second if full.tokens_per_second else 0.0
+        lines.append(f"{cached.length:>6}{cached.tokens_per_second:>13,.0f}{full.tokens_per_second:>17,.0f}"
+                     f"{speedup:>10.1f}x{cached.cache_bytes / 1024:>12,.0f}"
+                     f"{cached.peak_bytes / 1024:>17,.0f}{full.peak_bytes / 1024:>18,.0f}")
+    return '\n'.join(lines)
+
+
+def _layer_norm_inplace(x: np.ndarray, params: Dict):
+    x -= x.mean(axis=-1, keepdims=True)
+    x /= np.sqrt((x * x).mean(axis=-1, keepdims=True) + np.float32(1e-5))
+    x *= params['gamma']
+    x += params['beta']
+
+
+def _softmax_inplace(x: np.ndarray):
+    x -= x.max(axis=-1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=-1, keepdims=True)
+
+
+def reference_stages(architecture) -> List[StageGraph]:
+    # Этапы эталонной схемы упражнения; узлы - пары (этап, индекс в эталоне)
+    stages = []
+    previous_output = None
+    for index, stage in enumerate(architecture.stages):
+        labels = {(index, i): label for i, label in enumerate(stage.reference.labels)}
+        edges = [((index, start), (index, end)) for start, end in stage.reference.edge_list]
+        edges += [(previous_output, (index, i)) for i in stage.cross_attention]
+        stages.append((labels, edges))
+        previous_output = (index, stage.output)
+    return stages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Прямой проход эталонной схемы на NumPy")
+    parser.add_argument('--arch', default=DEFAULT_ARCHITECTURE, help="упражнение из specs/ или путь к спецификации")
+    parser.add_argument('--layers', type=int, default=1, choices=range(1, MAX_LAYERS + 1), metavar='N')
+    parser.add_argument('--batch', type=int, default=8)
+    parser.add_argument('--seq', type=int, default=32)
+    parser.add_argument('--d-model', type=int, default=64)
+    parser.add_argument('--heads', type=int, default=4)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--decode', type=lambda text: [int(length) for length in text.split(',')],
+                        metavar='L1,L2,...', help="сравнить генерацию с KV-кэшем и без на этих длинах")
+    args = parser.parse_args(argv)
+
+    architecture = load_architecture(args.arch, args.layers)
+    config = EngineConfig(d_model=args.d_model, heads=args.heads, d_ff=4 * args.d_model,
+                          batch=args.batch, seq_len=args.seq)
+    try:
+        program = Program(reference_stages(architecture), config)
+        if args.decode:
+            print(decode_table(compare_decoding(program, args.decode, max(1, args.repeats // 5))))
+            return 0
+    except ValueError as error:
+        parser.error(str(error))
+    profile = program.profile(args.repeats)
+
+    def name(node):
+        index, i = node
+        return f"{architecture.stages[index].name}: {architecture.stages[index].reference.labels[i]}".replace('\n', ' ')
+
+    print(profile.table(name))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+# Пакетная проверка сохраненных работ студентов без окна игры.
+#
+#   python grader.py works/ --out results.csv
+#   python grader.py works/ --out results.jsonl --jobs 8
+#   python grader.py works/ --spec-dir my_specs/   # работы по собственным спецификациям
+#
+# Каждый файл рабочей области (см. workspace.py) проверяется по тем же
+# правилам, что и кнопка «Проверить»: энкодер, декодер и соединение выхода
+# энкодера с cross-attention декодера. Файлы обрабатываются пулом процессов,
+# строки результата пишутся по мере готовности в порядке файлов.
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, Iterable, List, Optional
+
+from architectures import load_architecture, resolve_spec
+from validator import describe_error, validate
+from workspace import load_workspace
+
+FIELDS = ('student', 'file', 'architecture', 'layers', 'passed', 'stage_reached',
+          'errors', 'first_error', 'missing_edges')
+
+
+def _name(label: str) -> str:
+    return label.replace('\n', ' ')
+
+
+def grade_snapshot(snapshot: Dict, spec_dirs: Optional[List[str]] = None) -> Dict:
+    # Итог проверки одного снимка рабочей области. Для чужих снимков задается
+    # spec_dirs: тогда спецификация - только из specs/ или из этих каталогов
+    # (architectures.resolve_spec), без него - ровно та, что записана в снимке
+    source = snapshot['architecture']
+    if spec_dirs is not None:
+        source = resolve_spec(source, spec_dirs)
+    architecture = load_architecture(source, snapshot['layers'])
+    parts = [(snapshot['blocks'], snapshot['arrows'])]
+    if snapshot['stage'] > 0:
+        parts.insert(0, (snapshot['encoder_blocks'], snapshot['encoder_arrows']))
+
+    first_error = None
+    missing_edges = []
+    errors = 0
+    all_edges = {(row[0], row[2]) for _, arrows in parts for row in arrows}
+    previous_output = None
+    for stage, (blocks, arrows) in zip(architecture.stages, parts):
+        reference = stage.reference
+        labels = {row[0]: row[2] for row in blocks}
+        result = validate(labels, [(row[0], row[2]) for row in arrows], reference)
+        if not result.ok:
+            errors += (len(result.extra_blocks) + len(result.missing_blocks) + len(result.missing_edges)
+                       + len(result.wrong_edges) + len(result.extra_edges))
+            first_error = first_error or describe_error(result, reference, labels, stage.name)
+        missing_edges += [f"{stage.name}: {_name(reference.labels[start])} -> {_name(reference.labels[end])}"
+                          for start, end in result.missing_edges]
+
+        unconnected = [index for index in stage.cross_attention
+                       if previous_output is None or (previous_output, result.node_for(index)) not in all_edges]
+        if unconnected:
+            errors += len(unconnected)
+            first_error = first_error or "Выход энкодера не соединен с cross-attention декодера"
+            missing_edges += [f"{stage.name}: выход энкодера -> {_name(reference.labels[index])}"
+                              for index in unconnected]
+        previous_output = result.node_for(stage.output)
+
+    stage_reached = len(parts)
+    for stage in architecture.stages[stage_reached:]:
+        # Этап, до которого студент не дошел, целиком отсутствует
+        errors += 1
+        first_error = first_error or f"Не собран {stage.title}"
+        missing_edges += [f"{stage.name}: {_name(stage.reference.labels[start])} -> "
+                          f"{_name(stage.reference.labels[end])}" for start, end in stage.reference.edge_list]
+
+    return {
+        'architecture': architecture.name,
+        'layers': architecture.layers,
+        'passed': errors == 0,
+        'stage_reached': stage_reached,
+        'errors': errors,
+        'first_error': first_error or "",
+        'missing_edges': missing_edges,
+    }
+
+
+def diagram_hash(snapshot: Dict) -> str:
+    # Хэш того, что влияет на проверку: подписи блоков, стрелки и этап.
+    # Координаты не входят, а номера блоков заменены порядковыми, поэтому
+    # одинаковые схемы, собранные в разных сессиях, дают один хэш.
+    blocks = snapshot['encoder_blocks'] + snapshot['blocks']
+    order = {row[0]: i for i, row in enumerate(blocks)}
+    canonical = [
+        snapshot['architecture'], snapshot['layers'], snapshot['stage'],
+        order.get(snapshot.get('encoder_output')), len(snapshot['encoder_blocks']),
+        [row[2] for row in blocks],
+        [[order.get(row[0]), row[1], order.get(row[2]), row[3]] for row in snapshot['encoder_arrows']],
+        [[order.get(row[0]), row[1], order.get(row[2]), row[3]] for row in snapshot['arrows']],
+    ]
+    data = json.dumps(canonical, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def grade_file(path: str, spec_dirs: List[str] = ()) -> Dict:
+    row = {'student': os.path.splitext(os.path.basename(path))[0], 'file': path}
+    try:
+        row.update(grade_snapshot(load_workspace(path), list(spec_dirs)))
+    except (OSError, ValueError, KeyError, TypeError) as error:
+        row.update({'architecture': '', 'layers': '', 'passed': False, 'stage_reached': 0, 'errors': 1,
+                    'first_error': f"Не удалось прочитать работу: {error}", 'missing_edges': []})
+    return row
+
+
+def find_works(directory: str, extensions: Iterable[str]) -> List[str]:
+    extensions = tuple(extensions)
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.endswith(extensions) and os.path.isfile(os.path.join(directory, name)))
+
+
+def grade_all(paths: List[str], jobs: int = None, spec_dirs: List[str] = ()) -> Iterable[Dict]:
+    # Результаты в порядке paths, каждый отдается сразу по готовности
+    grade = partial(grade_file, spec_dirs=list(spec_dirs))
+    if jobs == 1 or len(paths) < 2:
+        yield from map(grade, paths)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        chunksize = max(1, len(paths) // (4 * (jobs or os.cpu_count() or 1)))
+        yield from executor.map(grade, paths, chunksize=chunksize)
+
+
+class ResultWriter:
+    def __init__(self, file, json_lines: bool):
+        self.file = file
+        self.json_lines = json_lines
+        self.writer = None
+        if not json_lines:
+            self.writer = csv.DictWriter(file, fieldnames=FIELDS)
+            self.writer.writeheader()
+
+    def write(self, row: Dict):
+        if self.json_lines:
+            self.file.write(json.dumps(row, ensure_ascii=False) + '\n')
+        else:
+            self.writer.writerow(dict(row, missing_edges='; '.join(row['missing_edges'])))
+        self.file.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетная проверка сохраненных схем трансформера")
+    parser.add_argument('directory', help="каталог с файлами рабочих областей")
+    parser.add_argument('--out', metavar='PATH',
+                        help="файл результатов: *.jsonl - JSON-строки, иначе CSV (по умолчанию CSV в stdout)")
+    parser.add_argument('--jobs', type=int, default=None, help="число процессов (по умолчанию - все ядра)")
+    parser.add_argument('--ext', action='append', default=None,
+                        help="расширение файлов работ (можно несколько раз, по умолчанию .jsonl)")
+    parser.add_argument('--spec-dir', action='append', default=[], metavar='DIR',
+                        help="каталог собственных спецификаций (можно несколько раз); без него "
+                             "принимаются только упражнения из specs/")
+    args = parser.parse_args(argv)
+
+    paths = find_works(args.directory, args.ext or ['.jsonl'])
+    out = open(args.out, 'w', newline='', encoding='utf-8') if args.out else sys.stdout
+    json_lines = bool(args.out) and args.out.endswith('.jsonl')
+    writer = ResultWriter(out, json_lines)
+    passed = 0
+    try:
+        for row in grade_all(paths, args.jobs, args.spec_dir):
+            writer.write(row)
+            passed += row['passed']
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Проверено работ: {len(paths)}, сдано: {passed}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
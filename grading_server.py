@@ -0,0 +1,241 @@
+# Локальный сервер проверки схем и клиенты для игры.
+#
+#   python grading_server.py --port 8765
+#   python grading_server.py --unix /tmp/transformer-grader.sock
+#
+# Протокол - JSON-строки поверх TCP или unix-сокета, ответ приходит на каждый
+# запрос в том же соединении:
+#   {"id": 1, "type": "grade", "snapshot": {...}}
+#       -> {"id": 1, "ok": true, "cached": false, "result": {...}}
+#   {"id": 2, "type": "stats"} -> {"id": 2, "ok": true, "result": {...}}
+# Снимок - формат рабочей области из workspace.py, результат - строка
+# grader.grade_snapshot. Ошибки запроса возвращаются как {"ok": false, "error": ...}.
+#
+# Проверка выполняется в пуле процессов, число одновременных проверок
+# ограничено, а результаты кэшируются по хэшу схемы (без координат блоков),
+# поэтому повторные сдачи той же схемы отвечают сразу.
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import sys
+from collections import Counter, OrderedDict
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+from typing import Dict, Optional
+
+from architectures import resolve_spec
+from grader import diagram_hash, grade_snapshot
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+MAX_LINE = 16 * 1024 * 1024  # самая большая принимаемая строка запроса
+
+
+class GradingServer:
+    def __init__(self, workers: Optional[int] = None, cache_size: int = 4096, max_pending: int = 64):
+        self.workers = workers
+        self.executor = self.make_executor()
+        self.cache = OrderedDict()  # хэш схемы -> результат, вытеснение LRU
+        self.cache_size = cache_size
+        self.inflight = {}  # хэш схемы -> Future проверки, которая уже идет
+        self.max_pending = max_pending
+        self.semaphore = None
+        self.stats = Counter()
+
+    def make_executor(self) -> ProcessPoolExecutor:
+        # spawn, а не fork: иначе процессы пула наследуют сокеты клиентов и держат
+        # соединения открытыми после остановки сервера
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    async def grade(self, snapshot: Dict):
+        # Возвращает (результат, взят ли он из кэша)
+        key = diagram_hash(snapshot)
+        result = self.cache.get(key)
+        if result is not None:
+            self.cache.move_to_end(key)
+            self.stats['cache_hits'] += 1
+            return result, True
+        future = self.inflight.get(key)
+        if future is not None:
+            # Та же схема уже проверяется для другого клиента
+            self.stats['cache_hits'] += 1
+            return await asyncio.shield(future), True
+
+        loop = asyncio.get_running_loop()
+        future = self.inflight[key] = loop.create_future()
+        try:
+            async with self.semaphore:
+                executor = self.executor
+                try:
+                    result = await loop.run_in_executor(executor, grade_snapshot, snapshot)
+                except BrokenExecutor:
+                    # Процесс проверки упал: этот пул больше не принимает задачи, заводим новый
+                    if self.executor is executor:
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        self.executor = self.make_executor()
+                    raise
+            self.stats['graded'] += 1
+            self.cache[key] = result
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            future.set_result(result)
+            return result, False
+        except Exception as error:
+            future.set_exception(error)
+            future.exception()  # ошибку получит сам запрос, ожидающих может и не быть
+            raise
+        finally:
+            del self.inflight[key]
+
+    async def handle_request(self, request: Dict) -> Dict:
+        kind = request.get('type', 'grade')
+        if kind == 'grade':
+            snapshot = request['snapshot']
+            # Имя упражнения приходит от клиента: путь к файлу спецификации вместо
+            # имени открыл бы на сервере произвольный .json, поэтому только specs/
+            resolve_spec(snapshot['architecture'])
+            result, cached = await self.grade(snapshot)
+            return {'ok': True, 'cached': cached, 'result': result}
+        if kind == 'stats':
+            return {'ok': True, 'result': dict(self.stats, cache_size=len(self.cache))}
+        raise ValueError(f"неизвестный тип запроса: {kind}")
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.stats['connections'] += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Строка длиннее MAX_LINE: дальше поток не разобрать
+                    writer.write(_encode({'ok': False, 'error': "слишком большой запрос"}))
+                    break
+                if not line:
+                    break
+                self.stats['requests'] += 1
+                request_id = None
+                try:
+                    request = json.loads(line)
+                    request_id = request.get('id')
+                    response = await self.handle_request(request)
+                except KeyError as error:
+                    self.stats['errors'] += 1
+                    response = {'ok': False, 'error': f"в запросе нет поля {error}"}
+                except (ValueError, TypeError, AttributeError, OSError) as error:
+                    self.stats['errors'] += 1
+                    response = {'ok': False, 'error': str(error)}
+                except BrokenExecutor:
+                    self.stats['errors'] += 1
+                    response = {'ok': False, 'error': "процесс проверки завершился аварийно, повторите запрос"}
+                response['id'] = request_id
+                writer.write(_encode(response))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, unix_path: Optional[str] = None):
+        self.semaphore = asyncio.Semaphore(self.max_pending)
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle_client, unix_path, limit=MAX_LINE)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port, limit=MAX_LINE)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+def _encode(response: Dict) -> bytes:
+    return (json.dumps(response, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+class LocalGrader:
+    # Проверка в том же процессе, без сервера
+    def submit(self, snapshot: Dict) -> Dict:
+        return grade_snapshot(snapshot)
+
+    def close(self):
+        pass
+
+
+class SocketGrader:
+    # Клиент сервера проверки; address - "host:port" или путь к unix-сокету
+    def __init__(self, address: str, timeout: float = 10.0):
+        self.address = address
+        self.timeout = timeout
+        self.sock = None
+        self.file = None
+        self.next_id = 0
+
+    def connect(self):
+        if ':' in self.address:
+            host, port = self.address.rsplit(':', 1)
+            self.sock = socket.create_connection((host, int(port)), timeout=self.timeout)
+        else:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(self.timeout)
+            self.sock.connect(self.address)
+        self.file = self.sock.makefile('rwb')
+
+    def request(self, request: Dict) -> Dict:
+        if self.sock is None:
+            self.connect()
+        self.next_id += 1
+        request = dict(request, id=self.next_id)
+        try:
+            self.file.write((json.dumps(request, ensure_ascii=False) + '\n').encode('utf-8'))
+            self.file.flush()
+            line = self.file.readline()
+        except OSError:
+            self.close()
+            raise
+        if not line:
+            self.close()
+            raise ConnectionError("сервер проверки закрыл соединение")
+        response = json.loads(line)
+        if not response.get('ok'):
+            raise ValueError(response.get('error', "ошибка сервера проверки"))
+        return response['result']
+
+    def submit(self, snapshot: Dict) -> Dict:
+        # Собственная спецификация записана в снимке полным путем
+        # (architectures.spec_source): сервер ее не примет, и нечего отправлять
+        if os.path.isabs(snapshot['architecture']):
+            raise ValueError(f"сервер проверяет только упражнения из specs/, а не "
+                             f"{os.path.basename(snapshot['architecture'])}")
+        return self.request({'type': 'grade', 'snapshot': snapshot})
+
+    def close(self):
+        if self.sock is not None:
+            self.file.close()
+            self.sock.close()
+            self.sock = self.file = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сервер проверки схем трансформера")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix', metavar='PATH', help="слушать unix-сокет вместо TCP")
+    parser.add_argument('--workers', type=int, default=None, help="процессов проверки (по умолчанию - все ядра)")
+    parser.add_argument('--cache-size', type=int, default=4096, help="сколько результатов хранить в кэше")
+    args = parser.parse_args(argv)
+
+    server = GradingServer(workers=args.workers, cache_size=args.cache_size)
+    where = args.unix or f"{args.host}:{args.port}"
+    print(f"Сервер проверки слушает {where}", file=sys.stderr)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
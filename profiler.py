@@ -0,0 +1,127 @@
+# Покадровый профилировщик главного цикла игры: время каждой фазы,
+# счетчики объектов и рендеров шрифта, экранная сводка и выгрузка в CSV/JSON.
+import csv
+import json
+import time
+from collections import deque
+from typing import Dict, Optional
+
+PHASES = ('events', 'background', 'arrows', 'encoder_blocks', 'blocks', 'overlay', 'flip')
+COUNTERS = ('blocks_drawn', 'arrows_drawn', 'font_renders', 'dirty_rects')
+FLUSH_EVERY = 60  # кадров между сбросами выгрузки на диск: при аварийном выходе теряется не больше
+
+
+class _NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullProfiler:
+    # Заглушка: профилирование выключено, накладные расходы минимальны
+    enabled = False
+    overlay_visible = False
+    _phase = _NullPhase()
+
+    def begin_frame(self):
+        pass
+
+    def phase(self, name: str):
+        return self._phase
+
+    def count(self, name: str, value: int = 1):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _Phase:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        frame = self.profiler.frame
+        frame[self.name] = frame.get(self.name, 0.0) + (time.perf_counter() - self.started) * 1000
+        return False
+
+
+class FrameProfiler:
+    enabled = True
+
+    def __init__(self, export_path: Optional[str] = None, history: int = 120):
+        self.history = deque(maxlen=history)
+        self.frame = {}
+        self.frame_index = 0
+        self.frame_started = 0.0
+        self.overlay_visible = False
+        self.phases = {name: _Phase(self, name) for name in PHASES}
+        self.export_file = None
+        self.writer = None
+        self.json_lines = False
+        if export_path:
+            self.export_file = open(export_path, 'w', newline='', encoding='utf-8')
+            self.json_lines = not export_path.endswith('.csv')
+            if not self.json_lines:
+                self.writer = csv.DictWriter(self.export_file,
+                                             fieldnames=('frame', 'total') + PHASES + COUNTERS)
+                self.writer.writeheader()
+
+    def begin_frame(self):
+        self.frame = {}
+        self.frame_started = time.perf_counter()
+
+    def phase(self, name: str):
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = _Phase(self, name)
+        return phase
+
+    def count(self, name: str, value: int = 1):
+        self.frame[name] = self.frame.get(name, 0) + value
+
+    def end_frame(self):
+        record = {'frame': self.frame_index, 'total': (time.perf_counter() - self.frame_started) * 1000}
+        for name in PHASES:
+            record[name] = self.frame.get(name, 0.0)
+        for name in COUNTERS:
+            record[name] = self.frame.get(name, 0)
+        self.history.append(record)
+        self.frame_index += 1
+
+        if self.json_lines:
+            self.export_file.write(json.dumps(record) + '\n')
+        elif self.writer is not None:
+            self.writer.writerow(record)
+        if self.export_file is not None and self.frame_index % FLUSH_EVERY == 0:
+            self.export_file.flush()
+
+    def averages(self) -> Dict[str, float]:
+        if not self.history:
+            return {}
+        keys = ('total',) + PHASES + COUNTERS
+        return {key: sum(record[key] for record in self.history) / len(self.history) for key in keys}
+
+    def overlay_lines(self):
+        averages = self.averages()
+        if not averages:
+            return ["нет данных"]
+        lines = [f"кадр {averages['total']:.2f} мс (среднее за {len(self.history)})"]
+        lines += [f"{name}: {averages[name]:.3f} мс" for name in PHASES]
+        lines += [f"{name}: {averages[name]:.1f}" for name in COUNTERS]
+        return lines
+
+    def close(self):
+        if self.export_file is not None and not self.export_file.closed:
+            self.export_file.close()
@@ -0,0 +1,196 @@
+# Запись и детерминированное воспроизведение входных событий игры.
+#
+# Запись: python transformer_game.py --record session.trace.gz
+# Воспроизведение: python replay.py session.trace.gz [--realtime] [--json report.json]
+#
+# Трасса - gzip с JSON-строками: заголовок, затем по строке на каждый вызов
+# TransformerGame.handle_events: [время в мс от начала, [событие, ...]].
+# Упражнение в заголовке - имя из specs/ или полный путь к файлу спецификации
+# (architectures.spec_source), как и в снимках рабочей области.
+# Если сессия началась с восстановленной работы (--workspace), ее снимок
+# лежит в заголовке ('snapshot') и восстанавливается перед воспроизведением.
+import argparse
+import gzip
+import hashlib
+import json
+import time
+from typing import Dict, List, Tuple
+
+import pygame
+
+TRACE_FORMAT = 'transformer-game-trace'
+TRACE_VERSION = 1
+
+
+def encode_event(event):
+    # Компактная запись события; неинтересные игре события пропускаются
+    if event.type == pygame.MOUSEMOTION:
+        return ['m', *event.pos]
+    if event.type == pygame.MOUSEBUTTONDOWN:
+        return ['d', *event.pos, event.button]
+    if event.type == pygame.MOUSEBUTTONUP:
+        return ['u', *event.pos, event.button]
+    if event.type == pygame.MOUSEWHEEL:
+        return ['w', event.x, event.y]
+    if event.type == pygame.KEYDOWN:
+        return ['k', event.key, event.mod]
+    if event.type == pygame.QUIT:
+        return ['q']
+    if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+        return ['x']
+    return None
+
+
+def decode_event(data):
+    kind = data[0]
+    if kind == 'm':
+        return pygame.event.Event(pygame.MOUSEMOTION, pos=(data[1], data[2]), rel=(0, 0), buttons=(0, 0, 0))
+    if kind == 'd':
+        return pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(data[1], data[2]), button=data[3])
+    if kind == 'u':
+        return pygame.event.Event(pygame.MOUSEBUTTONUP, pos=(data[1], data[2]), button=data[3])
+    if kind == 'w':
+        return pygame.event.Event(pygame.MOUSEWHEEL, x=data[1], y=data[2], flipped=False)
+    if kind == 'k':
+        return pygame.event.Event(pygame.KEYDOWN, key=data[1], mod=data[2], unicode='')
+    if kind == 'q':
+        return pygame.event.Event(pygame.QUIT)
+    if kind == 'x':
+        return pygame.event.Event(pygame.VIDEOEXPOSE)
+    raise ValueError(f"Неизвестное событие в трассе: {data!r}")
+
+
+class InputRecorder:
+    # Пишет кадры с событиями в трассу; пустые кадры тоже сохраняются,
+    # чтобы таймеры при воспроизведении срабатывали в те же моменты
+    def __init__(self, path: str, architecture: str = 'transformer', layers: int = 1, snapshot: Dict = None):
+        self.file = gzip.open(path, 'wt', encoding='utf-8')
+        self.start = None
+        header = {'format': TRACE_FORMAT, 'version': TRACE_VERSION, 'architecture': architecture, 'layers': layers}
+        if snapshot is not None:
+            header['snapshot'] = snapshot
+        self.file.write(json.dumps(header, ensure_ascii=False) + '\n')
+
+    def record_frame(self, timestamp: float, events):
+        if self.start is None:
+            self.start = timestamp
+        encoded = [data for data in map(encode_event, events) if data is not None]
+        line = [round((timestamp - self.start) * 1000, 1), encoded]
+        self.file.write(json.dumps(line, separators=(',', ':')) + '\n')
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+def load_trace(path: str) -> Tuple[Dict, List]:
+    # Возвращает заголовок трассы и список кадров
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        header = json.loads(file.readline())
+        if header.get('format') != TRACE_FORMAT or header.get('version') != TRACE_VERSION:
+            raise ValueError(f"{path}: неподдерживаемый формат трассы")
+        return header, [json.loads(line) for line in file if line.strip()]
+
+
+def percentile(values: List[float], q: float) -> float:
+    # Перцентиль методом ближайшего ранга
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+class VirtualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def replay(path: str, realtime: bool = False, headless: bool = True) -> Dict:
+    # Воспроизводит трассу и возвращает отчет о времени кадров (в миллисекундах)
+    from transformer_game import TransformerGame
+
+    header, frames = load_trace(path)
+    clock = VirtualClock()
+    game = TransformerGame(headless=headless, time_source=clock,
+                           architecture=header.get('architecture', 'transformer'), layers=header.get('layers', 1))
+    if header.get('snapshot') is not None:
+        game.restore(header['snapshot'])
+
+    event_times = []
+    draw_times = []
+    wall_start = time.perf_counter()
+    for timestamp, encoded in frames:
+        clock.now = timestamp / 1000
+        if realtime:
+            delay = clock.now - (time.perf_counter() - wall_start)
+            if delay > 0:
+                time.sleep(delay)
+
+        events = [decode_event(data) for data in encoded]
+        started = time.perf_counter()
+        running = game.handle_events(events)
+        handled = time.perf_counter()
+        game.draw()
+        drawn = time.perf_counter()
+
+        event_times.append((handled - started) * 1000)
+        draw_times.append((drawn - handled) * 1000)
+        if not running:
+            break
+
+    state = json.dumps(game.get_state(), sort_keys=True, ensure_ascii=False, default=list)
+    return {
+        'trace': path,
+        'frames': len(event_times),
+        'duration_ms': frames[-1][0] if frames else 0.0,
+        'wall_ms': (time.perf_counter() - wall_start) * 1000,
+        'events_ms': _summary(event_times),
+        'draw_ms': _summary(draw_times),
+        'state_digest': hashlib.sha1(state.encode('utf-8')).hexdigest(),
+    }
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'max': max(values, default=0.0),
+    }
+
+
+def format_report(report: Dict) -> str:
+    lines = [
+        f"Трасса: {report['trace']}",
+        f"Кадров: {report['frames']}, длительность записи {report['duration_ms'] / 1000:.1f} с, "
+        f"воспроизведение {report['wall_ms'] / 1000:.2f} с",
+        f"{'фаза':<10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}",
+    ]
+    for name, key in (('события', 'events_ms'), ('отрисовка', 'draw_ms')):
+        summary = report[key]
+        lines.append(f"{name:<10}" + ''.join(f"{summary[q]:>10.3f}" for q in ('p50', 'p95', 'p99', 'max')))
+    lines.append(f"Итоговое состояние: {report['state_digest']}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Воспроизведение записанной сессии тренажера")
+    parser.add_argument('trace', help="файл трассы, записанный с --record")
+    parser.add_argument('--realtime', action='store_true', help="воспроизводить с исходной скоростью")
+    parser.add_argument('--window', action='store_true', help="показывать окно вместо внеэкранной отрисовки")
+    parser.add_argument('--json', metavar='PATH', help="сохранить отчет в JSON")
+    args = parser.parse_args(argv)
+
+    report = replay(args.trace, realtime=args.realtime, headless=not args.window)
+    print(format_report(report))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+import math
+import random
+
+import pygame
+import pytest
+
+import transformer_game as tg
+
+SIDES = ('top', 'right', 'bottom', 'left')
+
+
+def distance(arrow, point):
+    # Расстояние от точки до отрезка стрелки без NumPy
+    (x1, y1), (x2, y2) = arrow.start_point.pos, arrow.end_point.pos
+    dx, dy = x2 - x1, y2 - y1
+    if dx == dy == 0:
+        return math.inf
+    t = max(0.0, min(1.0, ((point[0] - x1) * dx + (point[1] - y1) * dy) / (dx * dx + dy * dy)))
+    return math.hypot(point[0] - (x1 + t * dx), point[1] - (y1 + t * dy))
+
+
+def random_arrows(rng, count, blocks=40):
+    nodes = [tg.TransformerBlock('Linear', (rng.randrange(2000), rng.randrange(2000)), tg.SIZE['block'])
+             for _ in range(blocks)]
+    arrows = []
+    for _ in range(count):
+        start, end = rng.sample(nodes, 2)
+        arrows.append(tg.Arrow(start.connection_points[rng.choice(SIDES)],
+                               end.connection_points[rng.choice(SIDES)]))
+    return arrows
+
+
+def check_nearest(table, arrows, rng, threshold=tg.ARROW_PICK_DISTANCE):
+    for _ in range(300):
+        if arrows and rng.random() < 0.5:
+            # Рядом с серединой случайной стрелки, чтобы попадания тоже проверялись
+            arrow = rng.choice(arrows)
+            (x1, y1), (x2, y2) = arrow.start_point.pos, arrow.end_point.pos
+            point = ((x1 + x2) / 2 + rng.uniform(-8, 8), (y1 + y2) / 2 + rng.uniform(-8, 8))
+        else:
+            point = (rng.uniform(0, 2200), rng.uniform(0, 2200))
+        found = table.nearest(point, threshold)
+        best = min((distance(arrow, point) for arrow in arrows), default=math.inf)
+        if best > threshold:
+            assert found is None
+        else:
+            assert found in arrows
+            assert distance(found, point) == pytest.approx(best)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_nearest_matches_brute_force(seed):
+    rng = random.Random(seed)
+    arrows = random_arrows(rng, 200)
+    table = tg.ArrowTable(capacity=8)  # с ростом массива
+    for arrow in arrows:
+        table.add(arrow)
+    assert len(table) == len(arrows)
+    check_nearest(table, arrows, rng)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_remove_keeps_rows_consistent(seed):
+    rng = random.Random(seed)
+    arrows = random_arrows(rng, 120)
+    table = tg.ArrowTable(capacity=8)
+    for arrow in arrows:
+        table.add(arrow)
+
+    rng.shuffle(arrows)
+    removed = arrows[:80]
+    for arrow in removed:
+        table.remove(arrow)
+    alive = arrows[80:]
+
+    assert len(table) == len(alive)
+    assert sorted(map(id, table.arrows)) == sorted(map(id, alive))
+    for arrow in alive:
+        row = table.rows[arrow]
+        assert table.arrows[row] is arrow
+        assert tuple(table.segments[row]) == (*arrow.start_point.pos, *arrow.end_point.pos)
+    for arrow in removed:
+        assert arrow not in table.rows
+        for block in (arrow.start_point.block, arrow.end_point.block):
+            assert arrow not in table.arrows_of(block)
+    check_nearest(table, alive, rng)
+
+    for arrow in alive:
+        table.remove(arrow)
+    assert len(table) == 0 and not table.by_block
+    assert table.nearest((100, 100)) is None
+
+
+def test_heads_follow_moved_block():
+    rng = random.Random(0)
+    arrows = random_arrows(rng, 30, blocks=6)
+    table = tg.ArrowTable()
+    for arrow in arrows:
+        table.add(arrow)
+    table.refresh_heads()
+
+    block = arrows[0].start_point.block
+    block.move((block.rect.centerx + 37, block.rect.centery - 11))
+    table.update_block(block)
+    table.refresh_heads()
+
+    fresh = tg.ArrowTable()
+    for arrow in arrows:
+        fresh.add(arrow)
+    fresh.refresh_heads()
+    for arrow in arrows:
+        assert tuple(table.heads[table.rows[arrow]]) == pytest.approx(tuple(fresh.heads[fresh.rows[arrow]]))
+
+
+def test_arrows_in_covers_bounds():
+    rng = random.Random(1)
+    arrows = random_arrows(rng, 150)
+    table = tg.ArrowTable()
+    for arrow in arrows:
+        table.add(arrow)
+    for _ in range(50):
+        rect = pygame.Rect(rng.randrange(2000), rng.randrange(2000), rng.randrange(1, 400), rng.randrange(1, 400))
+        found = set(table.arrows_in(rect))
+        assert {arrow for arrow in arrows if rect.colliderect(arrow.bounds())} <= found
+
+
+def test_deleting_block_removes_its_arrows():
+    game = tg.TransformerGame(headless=True)
+    rng = random.Random(2)
+    blocks = [tg.TransformerBlock('Linear', (400 + 60 * i, 100 + 50 * i), tg.SIZE['block']) for i in range(8)]
+    for block in blocks:
+        game.add_block(block)
+    for _ in range(20):
+        start, end = rng.sample(blocks, 2)
+        game.add_arrow(tg.Arrow(start.connection_points['bottom'], end.connection_points['top']))
+
+    doomed = blocks[3]
+    kept = [arrow for arrow in game.arrows if doomed not in (arrow.start_point.block, arrow.end_point.block)]
+    assert len(kept) < len(game.arrows)
+    # Блок бросают в корзину, как в игре
+    game.drag(game.camera.to_screen(doomed.rect.center), game.menu.trash_rect.center)
+
+    assert doomed not in game.blocks
+    assert list(game.arrows) == kept
+    assert sorted(map(id, game.arrow_table.arrows)) == sorted(map(id, kept))
+    assert doomed not in game.arrow_table.by_block
+    assert doomed not in game.live_validator.labels
+    assert not any(game.live_validator.edge_counts[edge] for edge in game.live_validator.edge_counts
+                   if doomed in edge)
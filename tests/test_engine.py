@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from architectures import load_architecture
+from engine import EngineConfig, Program, reference_stages
+
+
+def reference_program(name, layers=1, **config):
+    return Program(reference_stages(load_architecture(name, layers)), EngineConfig(**config))
+
+
+@pytest.mark.parametrize('name, layers', [('transformer', 1), ('transformer', 2), ('gpt', 2)])
+def test_cached_generation_matches_recomputation(name, layers):
+    program = reference_program(name, layers, batch=4)
+    cached_stats, naive_stats = {}, {}
+    cached = program.generate(24, cache=True, stats=cached_stats)
+    naive = program.generate(24, cache=False, stats=naive_stats)
+
+    assert cached.shape == (4, 24)
+    np.testing.assert_array_equal(cached, naive)
+    np.testing.assert_array_equal(cached[:, 0], program.tokens['target'][:, 0])
+    assert len(np.unique(cached)) > 1  # генерация не выродилась в один токен
+    assert cached_stats['cache_bytes'] > 0
+    assert naive_stats['cache_bytes'] == 0
+
+
+def test_cache_grows_linearly():
+    program = reference_program('gpt', 1, batch=2)
+    sizes = []
+    for length in (8, 16, 32):
+        stats = {}
+        program.generate(length, stats=stats)
+        sizes.append(stats['cache_bytes'])
+    assert sizes[1] == 2 * sizes[0] and sizes[2] == 2 * sizes[1]
+
+
+def test_generation_is_repeatable():
+    program = reference_program('transformer', 1, batch=2)
+    np.testing.assert_array_equal(program.generate(10), program.generate(10))
+
+
+@pytest.mark.parametrize('name', ['bert', 'pre_norm'])
+def test_encoder_only_cannot_generate(name):
+    with pytest.raises(ValueError, match="нет декодера"):
+        reference_program(name).generate(8)
+
+
+def test_generation_needs_two_tokens():
+    with pytest.raises(ValueError):
+        reference_program('gpt').generate(1)
@@ -0,0 +1,123 @@
+import shutil
+
+import pytest
+
+from architectures import SPEC_DIR, load_architecture
+from grader import diagram_hash, grade_all, grade_file, grade_snapshot
+from workspace import save_workspace
+
+
+def stage_rows(reference, first_uid):
+    # Блоки и стрелки этапа, собранного точно по эталону; uid блока - first_uid + индекс
+    blocks = [[first_uid + i, 'block', label, 40 * i, 60, 140, 40] for i, label in enumerate(reference.labels)]
+    arrows = [[first_uid + start, 'top', first_uid + end, 'bottom'] for start, end in reference.edge_list]
+    return blocks, arrows
+
+
+def solved_snapshot(name='transformer', layers=1):
+    # Решенное упражнение: все этапы и соединение выхода энкодера с cross-attention
+    architecture = load_architecture(name, layers)
+    snapshot = {'architecture': name, 'layers': layers, 'stage': len(architecture.stages) - 1,
+                'encoder_output': None, 'encoder_blocks': [], 'encoder_arrows': []}
+    first, *rest = architecture.stages
+    blocks, arrows = stage_rows(first.reference, 1)
+    if rest:
+        snapshot['encoder_blocks'], snapshot['encoder_arrows'] = blocks, arrows
+        snapshot['encoder_output'] = 1 + first.output
+        blocks, arrows = stage_rows(rest[0].reference, 1000)
+        arrows += [[snapshot['encoder_output'], 'right', 1000 + index, 'left'] for index in rest[0].cross_attention]
+    snapshot['blocks'], snapshot['arrows'] = blocks, arrows
+    return snapshot
+
+
+@pytest.mark.parametrize('layers', [1, 2])
+@pytest.mark.parametrize('name', ['transformer', 'bert', 'gpt'])
+def test_solved_diagram_passes(name, layers):
+    row = grade_snapshot(solved_snapshot(name, layers))
+    assert row['passed']
+    assert row['errors'] == 0
+    assert row['first_error'] == ""
+    assert row['missing_edges'] == []
+    assert row['stage_reached'] == len(load_architecture(name, layers).stages)
+
+
+def test_unconnected_cross_attention():
+    snapshot = solved_snapshot()
+    snapshot['arrows'] = [arrow for arrow in snapshot['arrows'] if arrow[0] != snapshot['encoder_output']]
+    row = grade_snapshot(snapshot)
+    assert not row['passed']
+    assert row['errors'] == 1
+    assert row['first_error'] == "Выход энкодера не соединен с cross-attention декодера"
+    assert row['missing_edges'] == ["decoder: выход энкодера -> Multi-Head Attention"]
+
+
+def test_missing_edge_is_listed():
+    snapshot = solved_snapshot()
+    snapshot['arrows'] = [arrow for arrow in snapshot['arrows'] if arrow[:3:2] != [1008, 1009]]
+    row = grade_snapshot(snapshot)
+    assert not row['passed']
+    assert row['missing_edges'] == ["decoder: Linear -> Softmax"]
+
+
+def test_unfinished_stage_counts_as_missing():
+    # Студент собрал только энкодер: он лежит в blocks, этап 0
+    encoder = load_architecture('transformer').stages[0].reference
+    snapshot = solved_snapshot()
+    snapshot.update(stage=0, encoder_output=None, encoder_blocks=[], encoder_arrows=[])
+    snapshot['blocks'], snapshot['arrows'] = stage_rows(encoder, 1)
+    row = grade_snapshot(snapshot)
+    assert not row['passed']
+    assert row['stage_reached'] == 1
+    assert row['first_error'] == "Не собран декодер"
+    decoder = load_architecture('transformer').stages[1].reference
+    assert len(row['missing_edges']) == len(decoder.edge_list)
+
+
+def test_custom_spec_needs_spec_dir(tmp_path):
+    spec = tmp_path / 'my_bert.json'
+    shutil.copy(f"{SPEC_DIR}/bert.json", spec)
+    snapshot = solved_snapshot('bert')
+    snapshot['architecture'] = '/home/student/specs/my_bert.json'  # путь с машины студента
+
+    with pytest.raises(ValueError):
+        grade_snapshot(snapshot, spec_dirs=[])
+    assert grade_snapshot(snapshot, spec_dirs=[str(tmp_path)])['passed']
+
+    snapshot['architecture'] = str(tmp_path / 'other.json')
+    with pytest.raises(ValueError):
+        grade_snapshot(snapshot, spec_dirs=[str(tmp_path)])
+
+
+def test_grade_files_in_order(tmp_path):
+    paths = []
+    for i, snapshot in enumerate([solved_snapshot(), dict(solved_snapshot(), arrows=[])]):
+        paths.append(str(tmp_path / f"student{i}.jsonl"))
+        save_workspace(paths[-1], snapshot)
+    broken = tmp_path / 'broken.jsonl'
+    broken.write_text('not json\n', encoding='utf-8')
+    paths.append(str(broken))
+
+    rows = list(grade_all(paths, jobs=2))
+    assert [row['student'] for row in rows] == ['student0', 'student1', 'broken']
+    assert [row['passed'] for row in rows] == [True, False, False]
+    assert rows[2]['first_error'].startswith("Не удалось прочитать работу")
+    assert grade_file(paths[0]) == rows[0]
+
+
+def test_hash_ignores_positions_and_uids():
+    snapshot = solved_snapshot()
+    moved = solved_snapshot()
+    for row in moved['blocks']:
+        row[3] += 500
+    shift = {row[0]: row[0] + 7 for row in moved['encoder_blocks'] + moved['blocks']}
+    for group in ('encoder_blocks', 'blocks'):
+        for row in moved[group]:
+            row[0] = shift[row[0]]
+    for group in ('encoder_arrows', 'arrows'):
+        for row in moved[group]:
+            row[0], row[2] = shift[row[0]], shift[row[2]]
+    moved['encoder_output'] = shift[moved['encoder_output']]
+    assert diagram_hash(moved) == diagram_hash(snapshot)
+
+    snapshot['arrows'].pop()
+    assert diagram_hash(snapshot) != diagram_hash(moved)
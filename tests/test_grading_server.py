@@ -0,0 +1,110 @@
+import asyncio
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+from architectures import SPEC_DIR
+from grading_server import GradingServer, LocalGrader, SocketGrader
+from test_grader import solved_snapshot
+
+
+@pytest.fixture
+def server(tmp_path):
+    # Сервер на unix-сокете в фоновом потоке со своим циклом событий
+    path = str(tmp_path / 'grader.sock')
+    grading = GradingServer(workers=1)
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(grading.serve(unix_path=path))
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not os.path.exists(path):
+        assert time.monotonic() < deadline, "сервер не запустился"
+        time.sleep(0.01)
+    client = SocketGrader(path)
+    yield grading, client
+    client.close()
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join()
+    loop.close()
+    grading.close()
+
+
+def test_grade_and_cache(server):
+    grading, client = server
+    result = client.submit(solved_snapshot())
+    assert result['passed'] and result['errors'] == 0
+
+    # Та же схема в другом месте холста - ответ из кэша
+    moved = solved_snapshot()
+    for row in moved['blocks']:
+        row[3] += 300
+    assert client.submit(moved) == result
+    broken = dict(solved_snapshot(), arrows=[])
+    assert not client.submit(broken)['passed']
+
+    stats = client.request({'type': 'stats'})
+    assert stats['graded'] == 2
+    assert stats['cache_hits'] == 1
+    assert stats['cache_size'] == 2
+
+
+def test_concurrent_clients_share_result(server):
+    grading, client = server
+    snapshot = solved_snapshot('gpt', 3)
+    results = []
+
+    def submit():
+        other = SocketGrader(client.address)
+        try:
+            results.append(other.submit(snapshot))
+        finally:
+            other.close()
+
+    threads = [threading.Thread(target=submit) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 4 and all(result == results[0] for result in results)
+    stats = client.request({'type': 'stats'})
+    assert stats['graded'] == 1
+    assert stats['cache_hits'] == 3
+
+
+def test_bad_requests(server):
+    grading, client = server
+    with pytest.raises(ValueError, match="нет поля"):
+        client.request({'type': 'grade'})
+    with pytest.raises(ValueError, match="неизвестный тип запроса"):
+        client.request({'type': 'shutdown'})
+
+    # Путь к спецификации сервер не открывает
+    snapshot = dict(solved_snapshot('bert'), architecture='/tmp/bert.json')
+    with pytest.raises(ValueError, match="неизвестное упражнение"):
+        client.request({'type': 'grade', 'snapshot': snapshot})
+    # ... а клиент такую работу даже не отправляет
+    requests = client.request({'type': 'stats'})['requests']
+    with pytest.raises(ValueError, match="только упражнения из specs/"):
+        client.submit(snapshot)
+    assert client.request({'type': 'stats'})['requests'] == requests + 1
+
+    # После ошибок соединение продолжает работать
+    assert client.submit(solved_snapshot('bert'))['passed']
+
+
+def test_local_grader_accepts_custom_spec(tmp_path):
+    spec = tmp_path / 'my_bert.json'
+    shutil.copy(os.path.join(SPEC_DIR, 'bert.json'), spec)
+    snapshot = dict(solved_snapshot('bert'), architecture=str(spec))
+    assert LocalGrader().submit(snapshot)['passed']
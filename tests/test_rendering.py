@@ -0,0 +1,84 @@
+import random
+
+import numpy as np
+import pygame
+import pytest
+
+import transformer_game as tg
+from replay import VirtualClock
+
+
+def screen_pixels(game):
+    return pygame.surfarray.array3d(game.screen)
+
+
+def random_edit(game, clock, rng, menu):
+    # Одна правка или движение мыши, как в живой сессии: блоки, стрелки (в том
+    # числе ошибочные), перетаскивание, наведение, корзина, камера, живая проверка
+    def motion(pos, buttons=(0, 0, 0)):
+        game.post_event(pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=buttons)
+        game.step()
+
+    def somewhere():
+        return rng.randrange(320, 1180), rng.randrange(60, 780)
+
+    roll = rng.random()
+    if roll < 0.15 or len(game.blocks) < 2:
+        game.drag(rng.choice(menu), somewhere())
+    elif roll < 0.3:
+        block = rng.choice(game.blocks)
+        game.drag(game.camera.to_screen(block.rect.center), somewhere())
+    elif roll < 0.5:
+        start, end = rng.sample(game.blocks, 2)
+        motion(game.camera.to_screen(start.rect.center))
+        clock.now += 0.6
+        game.step()
+        start = game.camera.to_screen(start.connection_points[rng.choice(('top', 'right', 'bottom'))].pos)
+        end = game.camera.to_screen(end.connection_points[rng.choice(('left', 'bottom', 'top'))].pos)
+        game.post_event(pygame.MOUSEBUTTONDOWN, pos=start, button=1)
+        game.step()
+        motion(end, (1, 0, 0))
+        game.post_event(pygame.MOUSEBUTTONUP, pos=end, button=1)
+        game.step()
+    elif roll < 0.65 and game.arrows:
+        # Наведение на стрелку подсвечивает ее, правая кнопка иногда удаляет
+        arrow = rng.choice(list(game.arrows))
+        (x1, y1), (x2, y2) = arrow.start_point.pos, arrow.end_point.pos
+        pos = game.camera.to_screen(((x1 + x2) / 2, (y1 + y2) / 2))
+        motion(pos)
+        if rng.random() < 0.3:
+            game.click(pos, 3)
+    elif roll < 0.72:
+        game.post_event(pygame.KEYDOWN, key=rng.choice((pygame.K_LEFT, pygame.K_UP, pygame.K_EQUALS,
+                                                        pygame.K_MINUS, pygame.K_HOME)), mod=0, unicode='')
+        game.step()
+    elif roll < 0.8:
+        game.post_event(pygame.KEYDOWN, key=pygame.K_l, mod=0, unicode='l')
+        game.step()
+    elif roll < 0.87:
+        game.click((150, 625))  # «Проверить»
+    elif roll < 0.9:
+        block = rng.choice(game.blocks)
+        game.drag(game.camera.to_screen(block.rect.center), game.menu.trash_rect.center)
+    else:
+        motion(somewhere())
+        clock.now += rng.choice((0.1, 0.6, 3.5))
+        game.step()
+
+
+@pytest.mark.parametrize('seed', range(2))
+def test_dirty_frames_match_full_redraw(seed):
+    # После каждой правки кадр, собранный из областей перерисовки, должен
+    # совпадать с полной перерисовкой до пикселя
+    clock = VirtualClock()
+    game = tg.TransformerGame(headless=True, time_source=clock)
+    assert game.dirty_rendering
+    menu = [block.rect.center for block in game.menu.blocks]
+    rng = random.Random(seed)
+    for step in range(80):
+        random_edit(game, clock, rng, menu)
+        incremental = screen_pixels(game)
+        game.invalidate_all()
+        game.draw()
+        differs = np.flatnonzero((incremental != screen_pixels(game)).any(axis=2))
+        assert differs.size == 0, f"шаг {step}: {differs.size} пикселей отличаются от полной перерисовки"
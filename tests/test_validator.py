@@ -0,0 +1,209 @@
+import random
+
+import pytest
+
+from architectures import available_architectures, load_architecture
+from validator import LiveValidator, validate
+
+# Эталон энкодера трансформера из одного слоя:
+# 0 Input Embedding, 1 Positional Encoding, 2 Multi-Head Attention,
+# 3 Add & Norm, 4 Feed Forward, 5 Add & Norm
+ENCODER = load_architecture('transformer', 1).stages[0].reference
+
+
+def shuffled_diagram(reference, seed):
+    # Правильная схема с перемешанными узлами и ребрами; узлы названы не по индексам эталона
+    rng = random.Random(seed)
+    order = list(range(len(reference)))
+    rng.shuffle(order)
+    node = {index: f"block-{position}" for position, index in enumerate(order)}
+    labels = {node[index]: reference.labels[index] for index in order}
+    edges = [(node[start], node[end]) for start, end in reference.edge_list]
+    rng.shuffle(edges)
+    return labels, edges
+
+
+def build_live(reference, labels, edges):
+    live = LiveValidator(reference)
+    for node, label in labels.items():
+        live.add_node(node, label)
+    for start, end in edges:
+        live.add_edge(start, end)
+    return live
+
+
+def batch_errors(labels, edges, reference):
+    result = validate(labels, edges, reference)
+    return set(result.extra_blocks), set(result.wrong_edges + result.extra_edges)
+
+
+def live_errors(live):
+    return set(live.error_nodes), set(live.error_edges)
+
+
+def identity_encoder():
+    labels = dict(enumerate(ENCODER.labels))
+    return labels, list(ENCODER.edge_list)
+
+
+@pytest.mark.parametrize('layers', [1, 3])
+@pytest.mark.parametrize('name', available_architectures())
+def test_shuffled_stack_is_ok(name, layers):
+    for stage in load_architecture(name, layers).stages:
+        for seed in range(5):
+            labels, edges = shuffled_diagram(stage.reference, seed)
+            result = validate(labels, edges, stage.reference)
+            assert result.ok
+            assert sorted(result.mapping.values()) == list(range(len(stage.reference)))
+
+            live = build_live(stage.reference, labels, edges)
+            assert live.ok
+            assert live_errors(live) == (set(), set())
+
+
+@pytest.mark.parametrize('name', available_architectures())
+def test_live_is_ok_for_any_edit_order(name):
+    # Ребра проводятся сразу, как только есть оба блока
+    reference = load_architecture(name, 2).stages[-1].reference
+    for seed in range(5):
+        rng = random.Random(seed)
+        labels, edges = shuffled_diagram(reference, seed)
+        live = LiveValidator(reference)
+        added = set()
+        for node, label in rng.sample(list(labels.items()), len(labels)):
+            live.add_node(node, label)
+            added.add(node)
+            for start, end in edges:
+                if node in (start, end) and start in added and end in added:
+                    live.add_edge(start, end)
+        assert live.ok
+        assert live_errors(live) == (set(), set())
+
+
+def test_extra_edge():
+    labels, edges = identity_encoder()
+    edges.append((0, 4))
+    result = validate(labels, edges, ENCODER)
+    assert result.extra_edges == [(0, 4)]
+    assert not (result.wrong_edges or result.missing_edges or result.extra_blocks or result.missing_blocks)
+    assert live_errors(build_live(ENCODER, labels, edges)) == batch_errors(labels, edges, ENCODER)
+
+
+def test_missing_edge():
+    labels, edges = identity_encoder()
+    edges.remove((4, 5))
+    result = validate(labels, edges, ENCODER)
+    assert result.missing_edges == [(4, 5)]
+    assert not (result.wrong_edges or result.extra_edges or result.extra_blocks or result.missing_blocks)
+    live = build_live(ENCODER, labels, edges)
+    assert not live.ok
+    assert live.missing_edges == {(4, 5)}
+
+
+def test_wrong_edge():
+    # Стрелка из Feed Forward ведет не в тот Add & Norm
+    labels, edges = identity_encoder()
+    edges.remove((4, 5))
+    edges.append((4, 3))
+    result = validate(labels, edges, ENCODER)
+    assert result.missing_edges == [(4, 5)]
+    assert result.wrong_edges == [(4, 3)]
+    assert not result.extra_edges
+    assert live_errors(build_live(ENCODER, labels, edges)) == batch_errors(labels, edges, ENCODER)
+
+
+def test_extra_block():
+    labels, edges = identity_encoder()
+    labels['extra'] = 'Linear'
+    result = validate(labels, edges, ENCODER)
+    assert result.extra_blocks == ['extra']
+    assert not (result.missing_blocks or result.missing_edges or result.wrong_edges or result.extra_edges)
+    assert live_errors(build_live(ENCODER, labels, edges)) == ({'extra'}, set())
+
+
+def test_surplus_block_of_known_kind():
+    # Третий Add & Norm при двух в эталоне
+    labels, edges = identity_encoder()
+    labels['extra'] = 'Add & Norm'
+    result = validate(labels, edges, ENCODER)
+    assert result.extra_blocks == ['extra']
+    assert live_errors(build_live(ENCODER, labels, edges)) == ({'extra'}, set())
+
+
+def test_missing_block():
+    labels, edges = identity_encoder()
+    del labels[4]
+    edges = [edge for edge in edges if 4 not in edge]
+    result = validate(labels, edges, ENCODER)
+    assert result.missing_blocks == [4]
+    assert result.missing_edges == [(3, 4), (4, 5)]
+    assert not (result.extra_blocks or result.wrong_edges or result.extra_edges)
+    assert not build_live(ENCODER, labels, edges).ok
+
+
+def test_live_errors_follow_edits():
+    labels, edges = identity_encoder()
+    live = build_live(ENCODER, labels, edges)
+
+    live.add_edge(0, 4)
+    assert live_errors(live) == (set(), {(0, 4)})
+    live.remove_edge(0, 4)
+    assert live.ok and live_errors(live) == (set(), set())
+
+    live.add_node('extra', 'Add & Norm')
+    live.add_edge(4, 'extra')
+    labels['extra'] = 'Add & Norm'
+    assert live_errors(live) == batch_errors(labels, edges + [(4, 'extra')], ENCODER)
+    live.remove_node('extra')
+    assert live.ok and live_errors(live) == (set(), set())
+
+    live.remove_edge(4, 5)
+    live.add_edge(4, 3)
+    del labels['extra']
+    edges = [edge for edge in edges if edge != (4, 5)] + [(4, 3)]
+    assert live_errors(live) == batch_errors(labels, edges, ENCODER)
+    live.remove_edge(4, 3)
+    live.add_edge(4, 5)
+    assert live.ok and live_errors(live) == (set(), set())
+
+
+@pytest.mark.parametrize('name', available_architectures())
+def test_undone_mistakes_leave_no_errors(name):
+    # Схема собирается с ошибками, которые потом убираются: лишние блоки и
+    # стрелки, в том числе выводящие сопоставление не в ту сторону
+    reference = load_architecture(name, 3).stages[-1].reference
+    for seed in range(20):
+        rng = random.Random(seed)
+        labels, edges = shuffled_diagram(reference, seed)
+        live = LiveValidator(reference)
+        present, drawn, extra_nodes, extra_edges = {}, set(), [], []
+        for node, label in labels.items():
+            live.add_node(node, label)
+            present[node] = label
+            for start, end in edges:
+                if start in present and end in present and (start, end) not in drawn:
+                    live.add_edge(start, end)
+                    drawn.add((start, end))
+
+            roll = rng.random()
+            if roll < 0.2:
+                extra = f"extra-{len(extra_nodes)}-{seed}"
+                live.add_node(extra, rng.choice(reference.labels))
+                present[extra] = None
+                extra_nodes.append(extra)
+            elif roll < 0.5 and len(present) > 1:
+                start, end = rng.sample(sorted(present), 2)
+                if (start, end) not in drawn and (start, end) not in edges:
+                    live.add_edge(start, end)
+                    drawn.add((start, end))
+                    extra_edges.append((start, end))
+
+        rng.shuffle(extra_edges)
+        for start, end in extra_edges:
+            live.remove_edge(start, end)
+        for extra in extra_nodes:
+            live.remove_node(extra)
+
+        assert validate(labels, edges, reference).ok
+        assert live.ok
+        assert live_errors(live) == (set(), set())
@@ -0,0 +1,103 @@
+import pytest
+
+from workspace import AutosaveJournal, load_workspace, save_workspace
+
+
+def make_snapshot(blocks=3):
+    return {
+        'architecture': 'transformer',
+        'layers': 1,
+        'stage': 0,
+        'encoder_output': None,
+        'encoder_blocks': [],
+        'encoder_arrows': [],
+        'blocks': [[uid, 'block', f"Блок {uid}", 100 * uid, 50, 140, 40] for uid in range(1, blocks + 1)],
+        'arrows': [[uid, 'top', uid + 1, 'bottom'] for uid in range(1, blocks)],
+    }
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / 'work.jsonl')
+    snapshot = make_snapshot()
+    snapshot['architecture'] = str(tmp_path / 'my_spec.json')  # собственная спецификация - полным путем
+    save_workspace(path, snapshot)
+    assert load_workspace(path) == snapshot
+
+
+def test_journal_replays_operations(tmp_path):
+    path = str(tmp_path / 'work.jsonl')
+    journal = AutosaveJournal(path, make_snapshot())
+    journal.append(['b', [4, 'pos', 'Positional\nEncoding', 10, 20, 60, 60]])
+    journal.append(['m', 1, 15, 25])
+    journal.append(['m', 1, 16, 26])
+    journal.append(['a', [4, 'right', 1, 'left']])
+    journal.append(['x', [1, 'top', 2, 'bottom']])
+    journal.append(['r', 3])
+    journal.close()
+
+    expected = make_snapshot()
+    expected['blocks'][0][3:5] = [16, 26]
+    del expected['blocks'][2]
+    expected['blocks'].append([4, 'pos', 'Positional\nEncoding', 10, 20, 60, 60])
+    expected['arrows'] = [[2, 'top', 3, 'bottom'], [4, 'right', 1, 'left']]
+    assert load_workspace(path) == expected
+    assert journal.state.snapshot() == expected
+
+
+def test_new_snapshot_replaces_journal(tmp_path):
+    path = str(tmp_path / 'work.jsonl')
+    journal = AutosaveJournal(path, make_snapshot())
+    journal.append(['r', 1])
+    journal.snapshot(make_snapshot(blocks=1))
+    journal.append(['m', 1, 0, 0])
+    journal.close()
+
+    expected = make_snapshot(blocks=1)
+    expected['blocks'][0][3:5] = [0, 0]
+    assert load_workspace(path) == expected
+
+
+def test_journal_compacts_into_snapshot(tmp_path):
+    path = str(tmp_path / 'work.jsonl')
+    journal = AutosaveJournal(path, make_snapshot(), compact_every=10)
+    for i in range(25):
+        journal.append(['b', [100 + i, 'block', 'Linear', i, i, 140, 40]])
+        journal.flush()
+    journal.close()
+
+    with open(path, encoding='utf-8') as file:
+        lines = file.readlines()
+    assert len(lines) < 2 + 10  # заголовок, снимок и хвост операций после него
+    snapshot = load_workspace(path)
+    assert [row[0] for row in snapshot['blocks']] == [1, 2, 3] + list(range(100, 125))
+
+
+def test_truncated_last_line_is_skipped(tmp_path):
+    path = str(tmp_path / 'work.jsonl')
+    journal = AutosaveJournal(path, make_snapshot())
+    journal.append(['m', 2, 7, 8])
+    journal.close()
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write('["m",3,9')  # сбой посреди записи
+
+    expected = make_snapshot()
+    expected['blocks'][1][3:5] = [7, 8]
+    assert load_workspace(path) == expected
+
+
+def test_backup_keeps_previous_work(tmp_path):
+    path = str(tmp_path / 'work.jsonl')
+    journal = AutosaveJournal(path, make_snapshot())
+    backup = journal.backup(make_snapshot())
+    journal.snapshot(make_snapshot(blocks=0))
+    journal.close()
+    assert backup == f"{path}.bak"
+    assert load_workspace(backup) == make_snapshot()
+    assert load_workspace(path)['blocks'] == []
+
+
+def test_foreign_file_is_rejected(tmp_path):
+    path = tmp_path / 'notes.jsonl'
+    path.write_text('{"format": "something-else"}\n', encoding='utf-8')
+    with pytest.raises(ValueError):
+        load_workspace(str(path))
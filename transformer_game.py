@@ -1,11 +1,36 @@
 import pygame
+import numpy as np
+import os
 import sys
 import math
 import time
+import heapq
+import itertools
+import threading
+from collections import OrderedDict, defaultdict, deque
 from typing import List, Tuple, Dict
 
-# Инициализация Pygame
-pygame.init()
+from architectures import DEFAULT_ARCHITECTURE, MAX_LAYERS, available_architectures, load_architecture
+from assets import ASSETS
+from engine import Program, compare_decoding
+from grading_server import LocalGrader
+from profiler import FrameProfiler, NullProfiler
+from workspace import AutosaveJournal, load_workspace
+from validator import LiveValidator, describe_error, validate
+
+
+
+def init_pygame(headless: bool = False):
+    # Инициализация Pygame; без окна работаем через видеодрайвер SDL dummy
+    if headless:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    # Поднимаем только видео и шрифты: звук, джойстики и прочие подсистемы
+    # игре не нужны, а их инициализация заметно удлиняет запуск
+    if not pygame.display.get_init():
+        pygame.display.init()
+    if not pygame.font.get_init():
+        pygame.font.init()
 
 # Константы
 WINDOW_WIDTH = 1200
@@ -14,69 +39,6 @@ MENU_WIDTH = 300
 BORDER_WIDTH = 3
 BORDER_RADIUS = 10
 
-# Эталонные последовательности для энкодера и декодера
-ENCODER_SEQUENCE = [
-    "Input\nEmbedding",
-    "Positional\nEncoding",
-    "Multi-Head\nAttention",
-    "Add & Norm",
-    "Feed\nForward",
-    "Add & Norm"
-]
-
-DECODER_SEQUENCE = [
-    "Output\nEmbedding",
-    "Positional\nEncoding",
-    "Masked\nMulti-Head\nAttention",
-    "Add & Norm",
-    "Multi-Head\nAttention",
-    "Add & Norm",
-    "Feed\nForward",
-    "Add & Norm",
-    "Linear",
-    "Softmax"
-]
-
-# Соединения для энкодера
-ENCODER_CONNECTIONS = [
-    (0, 1),  # Input Embedding -> Positional Encoding
-    (1, 2),  # Positional Encoding -> Multi-Head Attention
-    (2, 3),  # Multi-Head Attention -> Add & Norm
-    (1, 3),  # Positional Encoding -> Add & Norm
-    (3, 5),  # Multi-Head Attention -> Add & Norm
-    (3, 4),  # Add & Norm -> Feed Forward
-    (4, 5)   # Feed Forward -> Add & Norm
-]
-
-# Соединения для декодера
-DECODER_CONNECTIONS = [
-    (0, 1),  # Output Embedding -> Positional Encoding
-    (1, 2),  # Positional Encoding -> Masked Multi-Head Attention
-    (1, 3),  # Positional Encoding -> Add & Norm
-    (2, 3),  # Masked Multi-Head Attention -> Add & Norm
-    (3, 4),  # Add & Norm -> Multi-Head Attention
-    (3, 5),  # Add & Norm -> Add & Norm
-    (4, 5),  # Multi-Head Attention -> Add & Norm
-    (5, 6),  # Add & Norm -> Feed Forward
-    (6, 7),  # Feed Forward -> Add & Norm
-    (5, 7),  # Add & Norm -> Add & Norm
-    (7, 8),  # Add & Norm -> Linear
-    (8, 9),   # Linear -> Softmax
-]
-
-DECODER_SEQUENCE = [
-    "Output\nEmbedding",
-    "Positional\nEncoding",
-    "Masked\nMulti-Head\nAttention",
-    "Add & Norm",
-    "Multi-Head\nAttention",
-    "Add & Norm",
-    "Feed\nForward",
-    "Add & Norm",
-    "Linear",
-    "Softmax"
-]
-
 COLORS = {
     'Input\nEmbedding': (247, 225, 225),
     'Output\nEmbedding': (247, 225, 225),
@@ -94,7 +56,8 @@ COLORS = {
     'TRASH_BG': (255, 200, 200),
     'BORDER': (0, 0, 0),
     'ERROR': (255, 0, 0),  # Красный цвет для ошибок
-    'CHECK_BUTTON': (100, 200, 100)  # Зеленый цвет для кнопки проверки
+    'CHECK_BUTTON': (100, 200, 100),  # Зеленый цвет для кнопки проверки
+    'ARROW_HOVER': (30, 120, 230)  # Стрелка под курсором
 }
 
 SIZE = {
@@ -104,15 +67,529 @@ SIZE = {
     'big_block': (150, 75)  # высота в 1.5 раза больше стандартного
 }
 
+ARROW_PICK_DISTANCE = 10  # на каком расстоянии от линии стрелка считается выбранной
+CONNECTION_POINT_RADIUS = 5
+POINT_PICK_RADIUS = 5  # на каком расстоянии (пикселей экрана) клик попадает в точку соединения
+ARROW_HEAD_LENGTH = 10
+ARROW_HEAD_ANGLE = math.pi / 6  # 30 градусов
+ARROW_WIDTH = 3
+LABEL_FONT_SIZE = 24
+MESSAGE_FONT_SIZE = 36
+TIMING_FONT_SIZE = 20
+
+HOVER_DELAY = 0.5  # через сколько секунд наведения появляются точки соединения
+MESSAGE_DURATION = 3.0  # сколько секунд показывается сообщение
+FPS = 60
+PROFILER_OVERLAY_RECT = pygame.Rect(WINDOW_WIDTH - 240, 80, 230, 270)
+DECODE_LENGTHS = (8, 16, 32, 64)  # длины генерации для сравнения KV-кэша с пересчетом (D)
+DECODE_PANEL_CORNER = (WINDOW_WIDTH - 10, WINDOW_HEIGHT - 24)  # правый нижний угол панели генерации
+
+# Серые подложки под энкодер и декодер в координатах холста
+PANEL_RECTS = (pygame.Rect(400, 300, 250, 350), pygame.Rect(700, 100, 250, 550))
+PANEL_COLOR = (243, 243, 244)
+
+# Масштабы холста - дискретные уровни: спрайты и надписи кэшируются для каждого
+ZOOM_LEVELS = (0.25, 0.35, 0.5, 0.7, 1.0, 1.4, 2.0)
+PAN_STEP = 100  # сдвиг холста стрелками клавиатуры, пикселей экрана
+CULL_MARGIN = 150  # насколько подпись блока может выступать за его rect
+CAMERA_KEYS = {  # клавиша -> (сдвиг по x, сдвиг по y, шаг масштаба)
+    pygame.K_LEFT: (PAN_STEP, 0, 0),
+    pygame.K_RIGHT: (-PAN_STEP, 0, 0),
+    pygame.K_UP: (0, PAN_STEP, 0),
+    pygame.K_DOWN: (0, -PAN_STEP, 0),
+    pygame.K_EQUALS: (0, 0, 1),
+    pygame.K_MINUS: (0, 0, -1),
+}
+
+
+class LabelCache:
+    # Общий кэш шрифтов и отрендеренных надписей: шрифт каждого размера
+    # загружается один раз, надписи хранятся по ключу (text, size, color)
+    # и вытесняются по принципу LRU
+    def __init__(self, max_labels: int = 512):
+        self.max_labels = max_labels
+        self.fonts = {}
+        self.labels = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_font(self, size: int):
+        font = self.fonts.get(size)
+        if font is None:
+            font = pygame.font.Font(None, size)
+            self.fonts[size] = font
+        return font
+
+    def render(self, text: str, size: int, color: Tuple[int, int, int]):
+        key = (text, size, color)
+        surface = self.labels.get(key)
+        if surface is not None:
+            self.labels.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = self.get_font(size).render(text, True, color)
+        self.labels[key] = surface
+        if len(self.labels) > self.max_labels:
+            self.labels.popitem(last=False)
+        return surface
+
+    def draw_lines(self, screen, text: str, center: Tuple[int, int],
+                   size: int = LABEL_FONT_SIZE, color: Tuple[int, int, int] = (0, 0, 0)):
+        # Многострочная надпись, отцентрированная относительно center
+        lines = text.split('\n')
+        line_height = self.get_font(size).get_height()
+        total_height = line_height * len(lines)
+
+        for i, line in enumerate(lines):
+            surface = self.render(line, size, color)
+            text_rect = surface.get_rect(centerx=center[0],
+                                         centery=center[1] - total_height/2 + line_height/2 + i*line_height)
+            screen.blit(surface, text_rect)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'fonts': len(self.fonts),
+            'labels': len(self.labels),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def clear(self):
+        self.labels.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+LABEL_CACHE = LabelCache()
+
+
+class Scheduler:
+    # Отложенные действия по монотонным часам; действие с тем же ключом
+    # заменяет ранее запланированное
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.deadlines = []  # куча (deadline, seq, key)
+        self.callbacks = {}  # key -> (seq, callback)
+        self.counter = itertools.count()
+
+    def schedule(self, key, delay: float, callback):
+        seq = next(self.counter)
+        self.callbacks[key] = (seq, callback)
+        heapq.heappush(self.deadlines, (self.clock() + delay, seq, key))
+
+    def cancel(self, key):
+        self.callbacks.pop(key, None)
+
+    def _drop_stale(self):
+        while self.deadlines:
+            _, seq, key = self.deadlines[0]
+            entry = self.callbacks.get(key)
+            if entry is not None and entry[0] == seq:
+                return
+            heapq.heappop(self.deadlines)
+
+    def run_due(self) -> bool:
+        fired = False
+        now = self.clock()
+        self._drop_stale()
+        while self.deadlines and self.deadlines[0][0] <= now:
+            _, _, key = heapq.heappop(self.deadlines)
+            _, callback = self.callbacks.pop(key)
+            callback()
+            fired = True
+            self._drop_stale()
+        return fired
+
+    def time_until_next(self):
+        # Секунды до ближайшего действия или None, если ждать нечего
+        self._drop_stale()
+        if not self.deadlines:
+            return None
+        return max(0.0, self.deadlines[0][0] - self.clock())
+
+
+def bake_sprite(surface):
+    # Приводим спрайт к формату экрана для быстрого blit (если окно уже создано)
+    if pygame.display.get_surface() is not None:
+        return surface.convert_alpha()
+    return surface
+
+
+def scale_length(value, zoom: float, minimum: int = 1) -> int:
+    # Длина в пикселях экрана для длины value на холсте
+    return max(minimum, round(value * zoom))
+
+
+class SpriteCache:
+    # Спрайты блоков по ключу (вид блока, внешний вид, масштаб): одинаковые
+    # блоки делят один спрайт, каждый уровень масштаба хранится отдельно,
+    # старые спрайты вытесняются по принципу LRU. Вместе со спрайтом хранится
+    # его сдвиг от угла блока, чтобы кадр не измерял подписи заново
+    def __init__(self, max_sprites: int = 1024):
+        self.max_sprites = max_sprites
+        self.sprites = OrderedDict()
+
+    def get(self, block, error=False, zoom: float = 1.0):
+        key = (type(block), block.sprite_key(error), zoom)
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.sprites.move_to_end(key)
+            return sprite
+        sprite = (bake_sprite(block.build_sprite(error, zoom)), block.sprite_offset(zoom))
+        self.sprites[key] = sprite
+        if len(self.sprites) > self.max_sprites:
+            self.sprites.popitem(last=False)
+        return sprite
+
+    def clear(self):
+        self.sprites.clear()
+
+
+SPRITE_CACHE = SpriteCache()
+
+
+def get_block_sprite(block, error=False, zoom: float = 1.0):
+    # (спрайт, сдвиг от угла блока); перестраивается только при изменении
+    # внешнего вида блока или масштаба
+    return SPRITE_CACHE.get(block, error, zoom)
+
+class SpatialGrid:
+    # Равномерная сетка: каждый объект записан во все ячейки, которые
+    # пересекает его прямоугольник
+    def __init__(self, cell_size: int = 100):
+        self.cell_size = cell_size
+        self.cells = defaultdict(set)
+        self.item_cells = {}
+
+    def _cells_for(self, rect):
+        size = self.cell_size
+        return [(cx, cy)
+                for cx in range(rect.left // size, (rect.right - 1) // size + 1)
+                for cy in range(rect.top // size, (rect.bottom - 1) // size + 1)]
+
+    def insert(self, item, rect):
+        keys = self._cells_for(rect)
+        for key in keys:
+            self.cells[key].add(item)
+        self.item_cells[item] = keys
+
+    def remove(self, item):
+        for key in self.item_cells.pop(item, ()):
+            cell = self.cells[key]
+            cell.discard(item)
+            if not cell:
+                del self.cells[key]
+
+    def update(self, item, rect):
+        keys = self._cells_for(rect)
+        if self.item_cells.get(item) == keys:
+            return
+        self.remove(item)
+        for key in keys:
+            self.cells[key].add(item)
+        self.item_cells[item] = keys
+
+    def query_point(self, pos):
+        size = self.cell_size
+        return self.cells.get((int(pos[0]) // size, int(pos[1]) // size), ())
+
+    def query_rect(self, rect):
+        found = set()
+        for key in self._cells_for(rect):
+            found.update(self.cells.get(key, ()))
+        return found
+
+    def clear(self):
+        self.cells.clear()
+        self.item_cells.clear()
+
+    def __len__(self):
+        return len(self.item_cells)
+
+
+class BlockIndex:
+    # Пространственный индекс блоков и их точек соединения. При совпадении
+    # нескольких кандидатов выигрывает раньше добавленный блок
+    def __init__(self, cell_size: int = 100):
+        self.blocks = SpatialGrid(cell_size)
+        self.points = SpatialGrid(cell_size)
+        self.order = {}
+        self.counter = itertools.count()
+
+    @staticmethod
+    def _point_rect(point):
+        return pygame.Rect(point.pos[0] - point.radius, point.pos[1] - point.radius,
+                           2 * point.radius + 1, 2 * point.radius + 1)
+
+    def add(self, block):
+        seq = next(self.counter)
+        self.order[block] = seq
+        self.blocks.insert(block, block.rect)
+        for i, point in enumerate(block.connection_points.values()):
+            self.order[point] = (seq, i)
+            self.points.insert(point, self._point_rect(point))
+        block.index = self
+
+    def remove(self, block):
+        self.order.pop(block, None)
+        self.blocks.remove(block)
+        for point in block.connection_points.values():
+            self.order.pop(point, None)
+            self.points.remove(point)
+        if block.index is self:
+            block.index = None
+
+    def update(self, block):
+        self.blocks.update(block, block.rect)
+        for point in block.connection_points.values():
+            self.points.update(point, self._point_rect(point))
+
+    def clear(self):
+        for block in list(self.blocks.item_cells):
+            if block.index is self:
+                block.index = None
+        self.blocks.clear()
+        self.points.clear()
+        self.order.clear()
+
+    def block_at(self, pos):
+        hits = [block for block in self.blocks.query_point(pos) if block.is_clicked(pos)]
+        if not hits:
+            return None
+        return min(hits, key=self.order.__getitem__)
+
+    def point_at(self, pos, exclude=None, radius: float = 0):
+        # Видимая точка соединения под курсором; radius расширяет зону клика
+        # (при мелком масштабе точка на холсте меньше пальца мыши)
+        if radius > CONNECTION_POINT_RADIUS:
+            # Зона шире той, под которой точка записана в сетку
+            reach = math.ceil(radius)
+            candidates = self.points.query_rect(pygame.Rect(int(pos[0]) - reach, int(pos[1]) - reach,
+                                                            2 * reach + 1, 2 * reach + 1))
+        else:
+            candidates = self.points.query_point(pos)
+        hits = [point for point in candidates if point is not exclude and point.is_clicked(pos, radius)]
+        if not hits:
+            return None
+        return min(hits, key=self.order.__getitem__)
+
+    def blocks_in(self, rect):
+        # Блоки, видимые в прямоугольнике, в порядке добавления (порядке отрисовки).
+        # Сетка хранит rect блока, а подпись может выступать за него на CULL_MARGIN
+        candidates = self.blocks.query_rect(rect.inflate(2 * CULL_MARGIN, 2 * CULL_MARGIN))
+        return sorted((block for block in candidates
+                       if rect.colliderect(block.rect) or rect.colliderect(block.bounds())),
+                      key=self.order.__getitem__)
+
+    def __len__(self):
+        return len(self.blocks)
+
+
+class ArrowTable:
+    # Отрезки стрелок в массиве NumPy (x1, y1, x2, y2) для пакетных запросов
+    # близости; строки удаляются перестановкой последней строки на место удаленной.
+    # Вершины наконечников (x1, y1, x2, y2) хранятся рядом и пересчитываются
+    # одним векторным проходом только для сдвинувшихся стрелок
+    def __init__(self, capacity: int = 64):
+        self.segments = np.zeros((capacity, 4), dtype=np.float64)
+        self.heads = np.zeros((capacity, 4), dtype=np.float64)
+        self.stale = set()  # строки с устаревшими наконечниками
+        self.arrows = []
+        self.rows = {}
+        self.by_block = defaultdict(set)
+
+    def _write(self, row, arrow):
+        self.segments[row] = (*arrow.start_point.pos, *arrow.end_point.pos)
+        self.stale.add(row)
+
+    def add(self, arrow):
+        row = len(self.arrows)
+        if row == len(self.segments):
+            self.segments = np.concatenate([self.segments, np.zeros_like(self.segments)])
+            self.heads = np.concatenate([self.heads, np.zeros_like(self.heads)])
+        self.arrows.append(arrow)
+        self.rows[arrow] = row
+        self._write(row, arrow)
+        self.by_block[arrow.start_point.block].add(arrow)
+        self.by_block[arrow.end_point.block].add(arrow)
+
+    def remove(self, arrow):
+        row = self.rows.pop(arrow)
+        last = self.arrows.pop()
+        moved = len(self.arrows)
+        if last is not arrow:
+            self.arrows[row] = last
+            self.rows[last] = row
+            self.segments[row] = self.segments[moved]
+            self.heads[row] = self.heads[moved]
+            if moved in self.stale:
+                self.stale.add(row)
+            else:
+                self.stale.discard(row)
+        else:
+            self.stale.discard(row)
+        self.stale.discard(moved)
+        for block in (arrow.start_point.block, arrow.end_point.block):
+            arrows = self.by_block.get(block)
+            if arrows is not None:
+                arrows.discard(arrow)
+                if not arrows:
+                    del self.by_block[block]
+
+    def arrows_of(self, block):
+        return self.by_block.get(block, ())
+
+    def update_block(self, block):
+        # Блок сдвинулся: обновляем строки его стрелок
+        for arrow in self.arrows_of(block):
+            self._write(self.rows[arrow], arrow)
+
+    def clear(self):
+        self.arrows.clear()
+        self.rows.clear()
+        self.by_block.clear()
+        self.stale.clear()
+
+    def refresh_heads(self):
+        # Наконечники всех сдвинувшихся стрелок одним проходом NumPy
+        if not self.stale:
+            return
+        rows = np.fromiter(self.stale, dtype=np.intp, count=len(self.stale))
+        self.stale.clear()
+        segments = self.segments[rows]
+        angle = np.arctan2(segments[:, 3] - segments[:, 1], segments[:, 2] - segments[:, 0])
+        heads = self.heads
+        for column, side in ((0, -ARROW_HEAD_ANGLE), (2, ARROW_HEAD_ANGLE)):
+            heads[rows, column] = segments[:, 2] - ARROW_HEAD_LENGTH * np.cos(angle + side)
+            heads[rows, column + 1] = segments[:, 3] - ARROW_HEAD_LENGTH * np.sin(angle + side)
+
+    def draw(self, screen, arrows, color=COLORS['BORDER'], camera=None):
+        # Рисует стрелки одним цветом по готовой геометрии, без тригонометрии на кадр
+        if not arrows:
+            return
+        self.refresh_heads()
+        rows = [self.rows[arrow] for arrow in arrows]
+        segments = self.segments[rows]
+        heads = self.heads[rows]
+        width = ARROW_WIDTH
+        if camera is not None:
+            offset = np.array(camera.offset * 2, dtype=np.float64)
+            segments = np.round(segments * camera.zoom) + offset
+            heads = heads * camera.zoom + offset
+            width = scale_length(width, camera.zoom)
+        line, polygon = pygame.draw.line, pygame.draw.polygon
+        for (x1, y1, x2, y2), (hx1, hy1, hx2, hy2) in zip(segments.tolist(), heads.tolist()):
+            line(screen, color, (x1, y1), (x2, y2), width)
+            polygon(screen, color, ((x2, y2), (hx1, hy1), (hx2, hy2)))
+
+    def nearest(self, pos, threshold: float = ARROW_PICK_DISTANCE):
+        # Ближайшая к точке стрелка не дальше threshold или None
+        count = len(self.arrows)
+        if count == 0:
+            return None
+        segments = self.segments[:count]
+        start = segments[:, :2]
+        delta = segments[:, 2:] - start
+        point = np.asarray(pos, dtype=np.float64)
+
+        length_sq = np.einsum('ij,ij->i', delta, delta)
+        degenerate = length_sq == 0
+        t = np.einsum('ij,ij->i', point - start, delta) / np.where(degenerate, 1.0, length_sq)
+        np.clip(t, 0.0, 1.0, out=t)
+        offset = point - (start + t[:, None] * delta)
+        distance_sq = np.einsum('ij,ij->i', offset, offset)
+        distance_sq[degenerate] = np.inf
+
+        row = int(np.argmin(distance_sq))
+        if distance_sq[row] > threshold * threshold:
+            return None
+        return self.arrows[row]
+
+    def arrows_in(self, rect):
+        # Стрелки, ограничивающий прямоугольник которых (с наконечником) пересекает rect
+        count = len(self.arrows)
+        if count == 0:
+            return []
+        segments = self.segments[:count]
+        margin = ARROW_HEAD_LENGTH + 3
+        low = np.minimum(segments[:, :2], segments[:, 2:]) - margin
+        high = np.maximum(segments[:, :2], segments[:, 2:]) + margin
+        hits = ((low[:, 0] < rect.right) & (high[:, 0] >= rect.left)
+                & (low[:, 1] < rect.bottom) & (high[:, 1] >= rect.top))
+        return [self.arrows[row] for row in np.flatnonzero(hits)]
+
+    def __len__(self):
+        return len(self.arrows)
+
+
+class Camera:
+    # Камера холста: экранная точка = точка холста * zoom + offset.
+    # Масштаб выбирается из ZOOM_LEVELS, сдвиг - целые пиксели экрана
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.level = ZOOM_LEVELS.index(1.0)
+        self.zoom = 1.0
+        self.offset = (0, 0)
+
+    def key(self):
+        return (self.level, self.offset)
+
+    @property
+    def is_identity(self) -> bool:
+        # Холст совпадает с экраном: отрисовка может обойтись без преобразования
+        return self.level == ZOOM_LEVELS.index(1.0) and self.offset == (0, 0)
+
+    def to_screen(self, pos):
+        zoom = self.zoom
+        return (round(pos[0] * zoom) + self.offset[0], round(pos[1] * zoom) + self.offset[1])
+
+    def to_world(self, pos):
+        zoom = self.zoom
+        return (round((pos[0] - self.offset[0]) / zoom), round((pos[1] - self.offset[1]) / zoom))
+
+    def rect_to_screen(self, rect):
+        left, top = self.to_screen(rect.topleft)
+        right, bottom = self.to_screen(rect.bottomright)
+        return pygame.Rect(left, top, max(1, right - left), max(1, bottom - top))
+
+    def rect_to_world(self, rect):
+        # Наименьший прямоугольник холста, целиком покрывающий экранный rect
+        zoom = self.zoom
+        left = math.floor((rect.left - self.offset[0]) / zoom)
+        top = math.floor((rect.top - self.offset[1]) / zoom)
+        right = math.ceil((rect.right - self.offset[0]) / zoom)
+        bottom = math.ceil((rect.bottom - self.offset[1]) / zoom)
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+    def pan(self, dx: int, dy: int):
+        self.offset = (self.offset[0] + dx, self.offset[1] + dy)
+
+    def zoom_at(self, pos, steps: int) -> bool:
+        # Меняет масштаб на steps уровней так, что точка под pos остается на месте
+        level = min(max(self.level + steps, 0), len(ZOOM_LEVELS) - 1)
+        if level == self.level:
+            return False
+        zoom = self.zoom
+        world = ((pos[0] - self.offset[0]) / zoom, (pos[1] - self.offset[1]) / zoom)
+        self.level = level
+        self.zoom = ZOOM_LEVELS[level]
+        self.offset = (round(pos[0] - world[0] * self.zoom), round(pos[1] - world[1] * self.zoom))
+        return True
+
+
 class ConnectionPoint:
     def __init__(self, block, side: str):
         self.block = block
         self.side = side  # 'top', 'right', 'bottom', 'left'
-        self.radius = 5
+        self.radius = CONNECTION_POINT_RADIUS
         self.update_position()
         self.visible = False
         self.hover_time = 0
-        self.hover_threshold = 0.5  # время в секундах для появления точки
+        self.hover_threshold = HOVER_DELAY  # время в секундах для появления точки
 
     def update_position(self):
         if self.side == 'top':
@@ -124,14 +601,19 @@ class ConnectionPoint:
         else:  # left
             self.pos = (self.block.rect.left, self.block.rect.centery)
 
-    def draw(self, screen):
+    def draw(self, screen, camera=None):
         if self.visible:
-            pygame.draw.circle(screen, COLORS['BORDER'], self.pos, self.radius)
+            if camera is None:
+                pygame.draw.circle(screen, COLORS['BORDER'], self.pos, self.radius)
+            else:
+                pygame.draw.circle(screen, COLORS['BORDER'], camera.to_screen(self.pos),
+                                   scale_length(self.radius, camera.zoom, 2))
 
-    def is_clicked(self, pos):
+    def is_clicked(self, pos, radius: float = 0):
         if not self.visible:
             return False
-        return math.sqrt((pos[0] - self.pos[0])**2 + (pos[1] - self.pos[1])**2) <= self.radius
+        radius = max(self.radius, radius)
+        return (pos[0] - self.pos[0])**2 + (pos[1] - self.pos[1])**2 <= radius**2
 
     def show(self):
         self.visible = True
@@ -145,33 +627,17 @@ class Arrow:
     def __init__(self, start_point: ConnectionPoint, end_point: ConnectionPoint):
         self.start_point = start_point
         self.end_point = end_point
-        self.width = 3
+        self.width = ARROW_WIDTH
 
-    def draw(self, screen):
-        pygame.draw.line(screen, COLORS['BORDER'], 
-                        self.start_point.pos, self.end_point.pos, 
-                        self.width)
-        # Рисуем стрелку
-        angle = math.atan2(self.end_point.pos[1] - self.start_point.pos[1],
-                          self.end_point.pos[0] - self.start_point.pos[0])
-        arrow_length = 10
-        arrow_angle = math.pi / 6  # 30 градусов
-        
-        # Вычисляем точки стрелки
-        arrow_point1 = (
-            self.end_point.pos[0] - arrow_length * math.cos(angle - arrow_angle),
-            self.end_point.pos[1] - arrow_length * math.sin(angle - arrow_angle)
-        )
-        arrow_point2 = (
-            self.end_point.pos[0] - arrow_length * math.cos(angle + arrow_angle),
-            self.end_point.pos[1] - arrow_length * math.sin(angle + arrow_angle)
-        )
-        
-        # Рисуем стрелку
-        pygame.draw.polygon(screen, COLORS['BORDER'], 
-                          [self.end_point.pos, arrow_point1, arrow_point2])
+    def bounds(self):
+        # Ограничивающий прямоугольник линии вместе с наконечником
+        x1, y1 = self.start_point.pos
+        x2, y2 = self.end_point.pos
+        margin = ARROW_HEAD_LENGTH + self.width
+        return pygame.Rect(min(x1, x2) - margin, min(y1, y2) - margin,
+                           abs(x2 - x1) + 2 * margin + 1, abs(y2 - y1) + 2 * margin + 1)
 
-    def is_point_near(self, point, threshold=10):
+    def is_point_near(self, point, threshold=ARROW_PICK_DISTANCE):
         # Вычисляем расстояние от точки до линии
         x1, y1 = self.start_point.pos
         x2, y2 = self.end_point.pos
@@ -212,60 +678,72 @@ class TransformerBlock:
             'left': ConnectionPoint(self, 'left')
         }
         self.is_hovered = False
-        self.hover_start_time = 0
+        self.index = None  # BlockIndex, в котором зарегистрирован блок
+        self.uid = None  # номер блока в рабочей области (для сохранения)
 
     def is_clicked(self, pos):
         return self.rect.collidepoint(pos)
 
-    def draw(self, screen):
-        # Рисуем закругленный прямоугольник с обводкой
-        pygame.draw.rect(screen, self.color, self.rect, border_radius=BORDER_RADIUS)
-        pygame.draw.rect(screen, COLORS['BORDER'], self.rect, width=BORDER_WIDTH, border_radius=BORDER_RADIUS)
-        
-        # Отрисовка текста
-        font = pygame.font.Font(None, 24)
-        lines = self.name.split('\n')
-        line_height = font.get_height()
-        total_height = line_height * len(lines)
-        
-        for i, line in enumerate(lines):
-            text = font.render(line, True, COLORS['text'])
-            text_rect = text.get_rect(centerx=self.rect.centerx,
-                                    centery=self.rect.centery - total_height/2 + line_height/2 + i*line_height)
-            screen.blit(text, text_rect)
+    def sprite_key(self, error=False):
+        return (self.name, tuple(self.size), error)
+
+    def sprite_offset(self, zoom: float = 1.0):
+        return (0, 0)
+
+    def build_sprite(self, error=False, zoom: float = 1.0):
+        # Рисуем закругленный прямоугольник с обводкой и текстом в масштабе zoom
+        sprite = pygame.Surface((scale_length(self.size[0], zoom), scale_length(self.size[1], zoom)), pygame.SRCALPHA)
+        local_rect = sprite.get_rect()
+        radius = scale_length(BORDER_RADIUS, zoom)
+        pygame.draw.rect(sprite, self.color, local_rect, border_radius=radius)
+        pygame.draw.rect(sprite, COLORS['BORDER'], local_rect, width=scale_length(BORDER_WIDTH, zoom),
+                         border_radius=radius)
+
+        text_color = COLORS['ERROR'] if error else COLORS['text']
+        LABEL_CACHE.draw_lines(sprite, self.name, local_rect.center, scale_length(LABEL_FONT_SIZE, zoom, 6), text_color)
+        return sprite
+
+    def draw(self, screen, error=False, camera=None, points=True):
+        # camera: преобразование холста в экран (None - как есть, например в меню);
+        # points=False - без точек соединения (для запекания в фон)
+        zoom = camera.zoom if camera is not None else 1.0
+        x, y = camera.to_screen(self.rect.topleft) if camera is not None else self.rect.topleft
+        screen.blit(get_block_sprite(self, error, zoom)[0], (x, y))
 
         # Обновляем и отрисовываем точки соединения
-        for point in self.connection_points.values():
-            point.update_position()
-            point.draw(screen)
+        if points:
+            for point in self.connection_points.values():
+                point.update_position()
+                point.draw(screen, camera)
 
     def move(self, pos):
         self.rect.x = pos[0] - self.size[0] // 2
         self.rect.y = pos[1] - self.size[1] // 2
+        for point in self.connection_points.values():
+            point.update_position()
+        if self.index is not None:
+            self.index.update(self)
+
+    def bounds(self):
+        # Область экрана, которую занимает блок вместе с точками соединения
+        radius = self.connection_points['top'].radius
+        return self.rect.inflate(2 * radius + 2, 2 * radius + 2)
+
+    def set_hovered(self, hovered: bool) -> bool:
+        # Возвращает True, если изменилась видимость точек соединения
+        self.is_hovered = hovered
+        if not hovered and self.connection_points['top'].visible:
+            self.hide_points()
+            return True
+        return False
+
+    def show_points(self):
+        for point in self.connection_points.values():
+            point.show()
 
-    def check_hover(self, pos, is_connecting=False):
-        if is_connecting:
-            for point in self.connection_points.values():
-                point.show()
-            return
-
-        current_time = time.time()
-        is_currently_hovered = self.rect.collidepoint(pos)
-
-        if is_currently_hovered and not self.is_hovered:
-            # Только что навели на блок
-            self.is_hovered = True
-            self.hover_start_time = current_time
-        elif not is_currently_hovered and self.is_hovered:
-            # Вышли за пределы блока
-            self.is_hovered = False
-            for point in self.connection_points.values():
-                point.hide()
-        elif is_currently_hovered and self.is_hovered:
-            # Находимся внутри блока
-            if current_time - self.hover_start_time >= 0.5:
-                for point in self.connection_points.values():
-                    point.show()
+    def hide_points(self):
+        for point in self.connection_points.values():
+            point.hide()
 
 class YinYangBlock:
     def __init__(self, name: str, pos: Tuple[int, int],
@@ -287,125 +765,166 @@ class YinYangBlock:
             'left': ConnectionPoint(self, 'left')
         }
         self.is_hovered = False
-        self.hover_start_time = 0
+        self.index = None  # BlockIndex, в котором зарегистрирован блок
+        self.uid = None  # номер блока в рабочей области (для сохранения)
+        self.label_center_dx = -75  # подпись рисуется слева от круга
 
     def is_clicked(self, pos):
         return self.rect.collidepoint(pos)
 
-    def check_hover(self, pos, is_connecting=False):
-        if is_connecting:
-            for point in self.connection_points.values():
-                point.show()
-            return
+    def set_hovered(self, hovered: bool) -> bool:
+        # Возвращает True, если изменилась видимость точек соединения
+        self.is_hovered = hovered
+        if not hovered and self.connection_points['top'].visible:
+            self.hide_points()
+            return True
+        return False
 
-        current_time = time.time()
-        is_currently_hovered = self.rect.collidepoint(pos)
+    def show_points(self):
+        for point in self.connection_points.values():
+            point.show()
 
-        if is_currently_hovered and not self.is_hovered:
-            # Только что навели на блок
-            self.is_hovered = True
-            self.hover_start_time = current_time
-        elif not is_currently_hovered and self.is_hovered:
-            # Вышли за пределы блока
-            self.is_hovered = False
-            for point in self.connection_points.values():
-                point.hide()
-        elif is_currently_hovered and self.is_hovered:
-            # Находимся внутри блока
-            if current_time - self.hover_start_time >= 0.5:
-                for point in self.connection_points.values():
-                    point.show()
+    def hide_points(self):
+        for point in self.connection_points.values():
+            point.hide()
+
+    def sprite_key(self, error=False):
+        return (self.name, tuple(self.size), error)
+
+    def _label_rect(self, zoom: float = 1.0):
+        # Прямоугольник подписи в координатах блока (в масштабе zoom)
+        font = LABEL_CACHE.get_font(scale_length(LABEL_FONT_SIZE, zoom, 6))
+        lines = self.name.split('\n')
+        width = max(font.size(line)[0] for line in lines)
+        height = font.get_height() * len(lines)
+        size = self._scaled_size(zoom)
+        label_rect = pygame.Rect(0, 0, width, height)
+        label_rect.center = (size[0] // 2 + round(self.label_center_dx * zoom), size[1] // 2)
+        return label_rect
+
+    def _scaled_size(self, zoom: float):
+        return scale_length(self.size[0], zoom), scale_length(self.size[1], zoom)
+
+    def sprite_offset(self, zoom: float = 1.0):
+        # Спрайт шире блока: слева от круга находится подпись
+        bounds = self._label_rect(zoom).union(pygame.Rect((0, 0), self._scaled_size(zoom)))
+        return bounds.topleft
+
+    def build_sprite(self, error=False, zoom: float = 1.0):
+        width, height = self._scaled_size(zoom)
+        bounds = self._label_rect(zoom).union(pygame.Rect(0, 0, width, height))
+        sprite = pygame.Surface(bounds.size, pygame.SRCALPHA)
 
-    def draw(self, screen):
         # Рисуем Инь-Янь
-        x, y = self.center
-        h = 2  # толщина линии обводки
+        x = width // 2 - bounds.x
+        y = height // 2 - bounds.y
+        radius = max(2, min(width, height) // 2 - scale_length(5, zoom))
+        h = scale_length(2, zoom)  # толщина линии обводки
 
         # Рисуем основную окружность
-        pygame.draw.circle(screen, COLORS['BORDER'], self.center, self.radius, h)
+        pygame.draw.circle(sprite, COLORS['BORDER'], (x, y), radius, h)
 
         # Рисуем правую полуокружность (верхняя часть после поворота)
-        pygame.draw.arc(screen, COLORS['BORDER'], 
-                       (x - self.radius, y - self.radius, 2 * self.radius, 2 * self.radius), 
+        pygame.draw.arc(sprite, COLORS['BORDER'],
+                       (x - radius, y - radius, 2 * radius, 2 * radius),
                        0, math.pi, h)
 
         # Рисуем левую полуокружность (нижняя часть после поворота)
-        pygame.draw.arc(screen, COLORS['BORDER'], 
-                       (x - self.radius, y - self.radius, 2 * self.radius, 2 * self.radius), 
+        pygame.draw.arc(sprite, COLORS['BORDER'],
+                       (x - radius, y - radius, 2 * radius, 2 * radius),
                        math.pi, 2 * math.pi, h)
 
         # Рисуем правый малый полукруг (верхний после поворота)
-        small_r = self.radius // 2
-        pygame.draw.arc(screen, COLORS['BORDER'], 
-                       (x - small_r * 2, y - small_r, small_r * 2, small_r * 2), 
+        small_r = radius // 2
+        pygame.draw.arc(sprite, COLORS['BORDER'],
+                       (x - small_r * 2, y - small_r, small_r * 2, small_r * 2),
                        0, math.pi, h)
 
         # Рисуем левый малый полукруг (нижний после поворота)
-        pygame.draw.arc(screen, COLORS['BORDER'],
-                       (x, y - small_r, small_r * 2, small_r * 2), 
+        pygame.draw.arc(sprite, COLORS['BORDER'],
+                       (x, y - small_r, small_r * 2, small_r * 2),
                        math.pi, 2 * math.pi, h)
 
-        # Обновляем и отрисовываем точки соединения
-        for point in self.connection_points.values():
-            point.update_position()
-            point.draw(screen)
-
-        font = pygame.font.Font(None, 24)
-        lines = self.name.split('\n')
-        line_height = font.get_height()
-        total_height = line_height * len(lines)
+        text_color = COLORS['ERROR'] if error else COLORS['text']
+        LABEL_CACHE.draw_lines(sprite, self.name, (x + round(self.label_center_dx * zoom), y),
+                               scale_length(LABEL_FONT_SIZE, zoom, 6), text_color)
+        return sprite
 
-        for i, line in enumerate(lines):
-            text = font.render(line, True, COLORS['text'])
-            text_rect = text.get_rect(centerx=self.rect.centerx-75,
-                                      centery=self.rect.centery - total_height / 2 + line_height / 2 + i * line_height)
-            screen.blit(text, text_rect)
+    def draw(self, screen, error=False, camera=None, points=True):
+        zoom = camera.zoom if camera is not None else 1.0
+        x, y = camera.to_screen(self.rect.topleft) if camera is not None else self.rect.topleft
+        sprite, (offset_x, offset_y) = get_block_sprite(self, error, zoom)
+        screen.blit(sprite, (x + offset_x, y + offset_y))
 
         # Обновляем и отрисовываем точки соединения
-        for point in self.connection_points.values():
-            point.update_position()
-            point.draw(screen)
+        if points:
+            for point in self.connection_points.values():
+                point.update_position()
+                point.draw(screen, camera)
 
     def move(self, pos):
         self.rect.x = pos[0] - self.size[0] // 2
         self.rect.y = pos[1] - self.size[1] // 2
         self.center = (self.rect.x + self.size[0]//2, self.rect.y + self.size[1]//2)
+        for point in self.connection_points.values():
+            point.update_position()
+        if self.index is not None:
+            self.index.update(self)
+
+    def bounds(self):
+        # Область экрана вместе с подписью слева и точками соединения
+        # (спрайт в масштабе 1 - это круг вместе с подписью)
+        radius = self.connection_points['top'].radius
+        sprite, offset = get_block_sprite(self)
+        local = pygame.Rect(offset, sprite.get_size())
+        local.move_ip(self.rect.x, self.rect.y)
+        return local.inflate(2 * radius + 2, 2 * radius + 2)
+
+def block_row(block) -> List:
+    kind = 'pos' if isinstance(block, YinYangBlock) else 'block'
+    return [block.uid, kind, block.name, block.rect.x, block.rect.y, block.size[0], block.size[1]]
+
+
+def arrow_row(arrow) -> List:
+    start, end = arrow.start_point, arrow.end_point
+    return [start.block.uid, start.side, end.block.uid, end.side]
+
 
 class Menu:
-    def __init__(self):
+    def __init__(self, items):
+        # items: [(подпись, ключ размера из SIZE)] из спецификации упражнения
         self.rect = pygame.Rect(0, 0, MENU_WIDTH, WINDOW_HEIGHT)
         self.blocks = []
-        block_menu = [
-            ("Input\nEmbedding", SIZE['block']),
-            ('Output\nEmbedding', SIZE['block']),
-            ("Multi-Head\nAttention", SIZE['block']),
-            ("Masked\nMulti-Head\nAttention", SIZE['big_block']),
-            ("Add & Norm", SIZE['small_block']),
-            ("Linear", SIZE['small_block']),
-            ("Feed\nForward", SIZE['block']),
-            ("Softmax", SIZE['small_block'])
-        ]
         spacing = 10
         current_y = 20
-        for name, size in block_menu:
-            self.blocks.append(TransformerBlock(name,
-                                                ((MENU_WIDTH-size[0])//2, current_y),
-                                                size))
+        for name, size_key in items:
+            size = SIZE[size_key]
+            if size_key == 'pos':
+                self.blocks.append(YinYangBlock(name, ((MENU_WIDTH-size[0])//2+50, current_y), size))
+            else:
+                self.blocks.append(TransformerBlock(name,
+                                                    ((MENU_WIDTH-size[0])//2, current_y),
+                                                    size))
             current_y += size[1] + spacing
 
-        self.blocks.append(YinYangBlock("Positional\nEncoding", ((MENU_WIDTH-SIZE['pos'][0])//2+50, current_y), SIZE['pos']))
+        self.index = BlockIndex()
+        for block in self.blocks:
+            self.index.add(block)
 
         self.trash_rect = pygame.Rect(100, WINDOW_HEIGHT - 100, 150, 50)
-        self.trash_img = pygame.image.load("static/trash.png")
-        self.trash_img = pygame.transform.smoothscale(self.trash_img, (self.trash_rect.width//1.5, self.trash_rect.height))
+        self.trash_size = (self.trash_rect.width // 1.5, self.trash_rect.height)
         
         # Добавляем кнопку проверки
         self.check_button_rect = pygame.Rect(50, WINDOW_HEIGHT - 200, 200, 50)
-        self.check_button_font = pygame.font.Font(None, 36)
         self.check_button_text = "Проверить"
-        self.check_button_text_surface = self.check_button_font.render(self.check_button_text, True, COLORS['text'])
+        self.check_button_text_surface = LABEL_CACHE.render(self.check_button_text, MESSAGE_FONT_SIZE, COLORS['text'])
         self.check_button_text_rect = self.check_button_text_surface.get_rect(center=self.check_button_rect.center)
 
+    @property
+    def trash_img(self):
+        # Иконка загружается при первой отрисовке из кэша готовых картинок
+        return ASSETS.load_scaled("trash.png", self.trash_size)
+
     def draw(self, screen):
         # Фон меню
         pygame.draw.rect(screen, COLORS['MENU_BG'], self.rect)
@@ -428,143 +947,688 @@ class Menu:
         return self.check_button_rect.collidepoint(pos)
 
     def get_block_at_pos(self, pos):
-        for block in self.blocks:
-            if block.is_clicked(pos):
-                return block
-        return None
+        return self.index.block_at(pos)
 
 class TransformerGame:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-        pygame.display.set_caption("Архитектура Трансформера")
+    def __init__(self, headless: bool = False, time_source=time.monotonic, profiler=None,
+                 architecture: str = DEFAULT_ARCHITECTURE, layers: int = 1):
+        # headless: рисуем во внеэкранную поверхность, события подаются через step()
+        # time_source: монотонные часы для таймеров (при воспроизведении - виртуальные)
+        # profiler: FrameProfiler для замера фаз кадра (F3 - экранная сводка)
+        # architecture, layers: упражнение из specs/ и число слоев в стеке
+        self.headless = headless
+        self.profiler = profiler or NullProfiler()
+        init_pygame(headless)
+        if headless:
+            self.screen = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+        else:
+            self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+            pygame.display.set_caption("Архитектура Трансформера")
+        self.pending_events = deque()  # программный источник событий
         self.clock = pygame.time.Clock()
-        self.menu = Menu()
+        self.architecture = load_architecture(architecture, layers)
+        self.register_colors()
+        self.menu = Menu(self.architecture.menu)
+        self.stage_index = 0  # текущий этап сборки из architecture.stages
         self.blocks = []
         self.encoder_blocks = []  # Сохраняем блоки энкодера
         self.encoder_arrows = []  # Сохраняем стрелки энкодера
+        self.encoder_output_block = None  # Выход энкодера, к которому подключается декодер
+        self.block_index = BlockIndex()  # Индекс текущих блоков
+        self.encoder_index = BlockIndex()  # Индекс блоков энкодера (точки соединения - единственное живое в нем)
         self.selected_block = None
         self.dragging = False
         self.dragging_from_menu = False
-        self.arrows = []
+        self.arrows = {}  # Упорядоченное множество текущих стрелок (ключи словаря)
+        self.arrow_table = ArrowTable()  # Отрезки текущих стрелок для поиска под курсором
+        self.encoder_arrow_table = ArrowTable()  # Стрелки энкодера (для отбора видимых при запекании фона)
+        self.hovered_arrow = None
         self.connecting = False
         self.start_connection_point = None
         self.error_blocks = set()
         self.error_arrows = set()
-        self.message_font = pygame.font.Font(None, 36)
+        self.live_validator = LiveValidator(self.current_reference())
+        self.live_validation = False  # Подсветка ошибок сразу при каждой правке
+        self.live_validator_ok = False
         self.message = None
-        self.message_timer = 0
-        self.current_mode = 'encoder'  # 'encoder' или 'decoder'
+        self.scheduler = Scheduler(time_source)
+        self.recorder = None  # запись входных событий (см. replay.InputRecorder)
+        self.journal = None  # журнал автосохранения (см. workspace.AutosaveJournal)
+        self.switch_pending = False  # первое нажатие Tab над непустой схемой ждет подтверждения
+        self.grader = LocalGrader()  # куда отправлять работу на проверку (G), см. grading_server
+        self.grading_thread = None
+        self.grading_results = deque()  # ответы проверки из фонового потока
+        self.diagram_complete = False  # схема целиком прошла проверку и ее можно выполнить (R)
+        self.block_timings = {}  # блок -> подпись с замером прямого прохода
+        self.decode_lines = []  # сводка генерации с KV-кэшем и без (D)
+        self.decode_panel_rect = None
+        self.decode_thread = None
+        self.decode_program = None  # программа, замер которой сейчас актуален
+        self.decode_results = deque()  # (программа, замеры) из фонового потока
+        self.uids = itertools.count(1)
+        self.current_mode = self.current_stage().name  # 'encoder', 'decoder', ...
         self.encoder_decoder_connected = False  # Флаг соединения энкодера и декодера
+        self.hovered_block = None  # Блок под курсором
+        self.mouse_pos = (0, 0)
+        self.camera = Camera()  # Сдвиг и масштаб холста (средняя кнопка, колесо, стрелки, Home)
+        self.panning = False
+        # Отрисовка только измененных областей экрана
+        self.dirty_rendering = True
+        self.background = None
+        self.background_key = None
+        self.arrow_layer = None  # Неизменившиеся стрелки, отрисованные заранее (см. build_arrow_layer)
+        self.arrow_layer_key = None
+        self.dirty_rects = []
+        self.full_redraw = True
+        self.message_rect = None
+        self.connection_line_rect = None
+
+    def invalidate(self, rect):
+        if rect is not None:
+            self.dirty_rects.append(pygame.Rect(rect))
+
+    def invalidate_world(self, rect):
+        # rect в координатах холста; запас на округление масштабированных спрайтов
+        self.invalidate(self.camera.rect_to_screen(rect).inflate(2, 2))
+
+    def invalidate_all(self):
+        self.full_redraw = True
+
+    def invalidate_arrow_layer(self):
+        self.arrow_layer = None
+
+    def invalidate_block(self, block):
+        # Блок и все стрелки, которые к нему подходят
+        self.invalidate_world(block.bounds())
+        for arrow in self.arrow_table.arrows_of(block):
+            self.invalidate_world(arrow.bounds())
+        if block in self.block_timings:
+            self.invalidate(self.timing_label(block)[1])
+
+    def register_colors(self):
+        # Цвета новых блоков из спецификации; стандартная палитра не меняется
+        for label, color in self.architecture.colors.items():
+            COLORS.setdefault(label, color)
+
+    def current_stage(self):
+        return self.architecture.stages[self.stage_index]
+
+    def current_reference(self):
+        return self.current_stage().reference
+
+    def set_architecture(self, name: str, layers: int = None):
+        # Переключение упражнения: рабочая область и этапы начинаются заново
+        self.architecture = load_architecture(name, self.architecture.layers if layers is None else layers)
+        self.register_colors()
+        self.menu = Menu(self.architecture.menu)
+        self.stage_index = 0
+        self.current_mode = self.current_stage().name
+        self.clear_encoder()  # замороженный этап прежнего упражнения тоже не нужен
+        self.clear_workspace()
+        self.camera.reset()
+        self.background = None
+        self.show_message(self.architecture.title)
+
+    def next_architecture(self):
+        # Смена упражнения стирает схему, поэтому над непустой рабочей областью
+        # Tab нужно подтвердить повторным нажатием, а журнал перед сменой
+        # сохраняет прежнюю схему в резервный файл
+        workspace_used = bool(self.blocks or self.encoder_blocks)
+        if workspace_used and not self.switch_pending:
+            self.switch_pending = True
+            self.show_message("Tab еще раз - новое упражнение, схема будет сброшена")
+            self.scheduler.schedule('switch', MESSAGE_DURATION, self.cancel_switch)
+            return
+        self.cancel_switch()
+        if workspace_used and self.journal is not None:
+            try:
+                self.journal.backup(self.snapshot())
+            except OSError as error:
+                self.show_message(f"Не удалось сохранить копию схемы: {error}")
+                return
+        names = available_architectures()
+        index = names.index(self.architecture.source) if self.architecture.source in names else -1
+        self.set_architecture(names[(index + 1) % len(names)])
+
+    def cancel_switch(self):
+        self.switch_pending = False
+        self.scheduler.cancel('switch')
+
+    def add_block(self, block):
+        if block.uid is None:
+            block.uid = next(self.uids)
+        self.blocks.append(block)
+        self.block_index.add(block)
+        self.live_validator.add_node(block, block.name)
+        self.invalidate_block(block)
+        self.apply_live_changes()
+        self.forget_forward_pass()
+        self.journal_append(['b', block_row(block)])
+
+    def remove_block(self, block):
+        # Вместе с блоком удаляются его стрелки: O(степени блока) через arrow_table
+        self.invalidate_block(block)
+        for arrow in tuple(self.arrow_table.arrows_of(block)):
+            self.remove_arrow(arrow)
+        self.journal_append(['r', block.uid])
+        self.blocks.remove(block)
+        self.block_index.remove(block)
+        self.forget_block(block)
+        self.error_blocks.discard(block)
+        self.live_validator.remove_node(block)
+        self.apply_live_changes()
+        self.forget_forward_pass()
+
+    def add_arrow(self, arrow):
+        self.arrows[arrow] = None
+        self.arrow_table.add(arrow)
+        self.invalidate_arrow_layer()
+        self.invalidate_world(arrow.bounds())
+        self.live_validator.add_edge(arrow.start_point.block, arrow.end_point.block)
+        self.apply_live_changes()
+        self.forget_forward_pass()
+        self.journal_append(['a', arrow_row(arrow)])
+
+    def remove_arrow(self, arrow):
+        self.journal_append(['x', arrow_row(arrow)])
+        self.invalidate_world(arrow.bounds())
+        del self.arrows[arrow]
+        self.arrow_table.remove(arrow)
+        self.invalidate_arrow_layer()
+        self.error_arrows.discard(arrow)
+        if arrow is self.hovered_arrow:
+            self.hovered_arrow = None
+        self.live_validator.remove_edge(arrow.start_point.block, arrow.end_point.block)
+        self.apply_live_changes()
+        self.forget_forward_pass()
+
+    def clear_encoder(self):
+        self.encoder_blocks.clear()
+        self.encoder_arrows.clear()
+        self.encoder_index.clear()
+        self.encoder_arrow_table.clear()
+        self.encoder_output_block = None
+        self.background = None
+
+    def clear_workspace(self):
+        self.blocks.clear()
+        if self.stage_index > 0:
+            self.clear_encoder()
+        self.block_index.clear()
+        self.forget_block(self.hovered_block)
+        self.arrows.clear()
+        self.arrow_table.clear()
+        self.invalidate_arrow_layer()
+        self.hovered_arrow = None
+        self.error_blocks.clear()
+        self.error_arrows.clear()
+        self.live_validator = LiveValidator(self.current_reference())
+        self.forget_forward_pass()
+        self.invalidate_all()
+        self.journal_snapshot()
+
+    def journal_append(self, op):
+        if self.journal is not None:
+            self.journal.append(op)
+
+    def journal_snapshot(self):
+        if self.journal is not None:
+            self.journal.snapshot(self.snapshot())
+
+    def snapshot(self) -> Dict:
+        # Компактное состояние рабочей области (формат описан в workspace.py)
+        return {
+            'architecture': self.architecture.source,
+            'layers': self.architecture.layers,
+            'stage': self.stage_index,
+            'encoder_output': self.encoder_output_block.uid if self.encoder_output_block is not None else None,
+            'encoder_blocks': [block_row(block) for block in self.encoder_blocks],
+            'encoder_arrows': [arrow_row(arrow) for arrow in self.encoder_arrows],
+            'blocks': [block_row(block) for block in self.blocks],
+            'arrows': [arrow_row(arrow) for arrow in self.arrows],
+        }
+
+    def restore(self, snapshot: Dict):
+        # Восстанавливает рабочую область из снимка (например, из workspace.load_workspace)
+        journal, self.journal = self.journal, None
+        try:
+            self.set_architecture(snapshot['architecture'], snapshot['layers'])
+            blocks = {}
+
+            def build(rows, arrow_rows):
+                for uid, kind, name, x, y, width, height in rows:
+                    cls = YinYangBlock if kind == 'pos' else TransformerBlock
+                    block = cls(name, (x, y), (width, height))
+                    block.uid = uid
+                    blocks[uid] = block
+                    self.add_block(block)
+                for start_uid, start_side, end_uid, end_side in arrow_rows:
+                    if start_uid in blocks and end_uid in blocks:
+                        self.add_arrow(Arrow(blocks[start_uid].connection_points[start_side],
+                                             blocks[end_uid].connection_points[end_side]))
+
+            if snapshot['stage'] > 0:
+                build(snapshot['encoder_blocks'], snapshot['encoder_arrows'])
+                self.freeze_stage(blocks.get(snapshot['encoder_output']))
+            build(snapshot['blocks'], snapshot['arrows'])
+            self.uids = itertools.count(max(blocks, default=0) + 1)
+            self.show_message("Работа восстановлена")
+        finally:
+            self.journal = journal
+        self.journal_snapshot()
+
+    def apply_live_changes(self):
+        # Переносим изменившиеся статусы из живой проверки в подсветку ошибок
+        was_ok = self.live_validator_ok
+        self.live_validator_ok = self.live_validator.ok
+        nodes, edges = self.live_validator.pop_changes()
+        if not self.live_validation:
+            return
+
+        for block in nodes:
+            if block in self.live_validator.error_nodes:
+                self.error_blocks.add(block)
+            else:
+                self.error_blocks.discard(block)
+            if block in self.live_validator.labels:
+                self.invalidate_world(block.bounds())
+        for start, end in edges:
+            wrong = (start, end) in self.live_validator.error_edges
+            for arrow in self.arrow_table.arrows_of(start):
+                if arrow.end_point.block is end:
+                    if wrong:
+                        self.error_arrows.add(arrow)
+                    else:
+                        self.error_arrows.discard(arrow)
+                    self.invalidate_world(arrow.bounds())
+
+        if self.live_validator_ok and not was_ok:
+            self.show_message("Похоже, все верно! Нажмите «Проверить»")
+
+    def set_live_validation(self, enabled: bool):
+        self.live_validation = enabled
+        self.live_validator.pop_changes()
+        self.error_blocks = set(self.live_validator.error_nodes) if enabled else set()
+        self.error_arrows = {arrow for arrow in self.arrows
+                             if (arrow.start_point.block, arrow.end_point.block) in self.live_validator.error_edges
+                             } if enabled else set()
+        self.show_message("Живая проверка включена" if enabled else "Живая проверка выключена")
+        self.invalidate_all()
 
     def check_sequence(self):
         # Сбрасываем предыдущие ошибки
         self.error_blocks.clear()
         self.error_arrows.clear()
         
-        # Определяем текущую последовательность и соединения
-        if self.current_mode == 'encoder':
-            reference_sequence = ENCODER_SEQUENCE
-            reference_connections = ENCODER_CONNECTIONS
-        else:
-            reference_sequence = DECODER_SEQUENCE
-            reference_connections = DECODER_CONNECTIONS
-        
-        # Проверяем количество элементов
-        if len(self.blocks) != len(reference_sequence):
-            self.show_message(f"Неверное количество элементов для {self.current_mode}!")
+        # Определяем текущий эталонный граф
+        reference = self.current_reference()
+
+        labels = {block: block.name for block in self.blocks}
+        arrows_by_edge = {}
+        for arrow in self.arrows:
+            arrows_by_edge.setdefault((arrow.start_point.block, arrow.end_point.block), arrow)
+        result = validate(labels, arrows_by_edge, reference)
+        # Живая проверка продолжает от точного сопоставления
+        self.live_validator.rebuild(labels, arrows_by_edge, result.mapping)
+        self.live_validator.pop_changes()
+
+        # Подсвечиваем все найденные ошибки сразу
+        self.error_blocks.update(result.extra_blocks)
+        for edge in result.wrong_edges + result.extra_edges:
+            self.error_arrows.add(arrows_by_edge[edge])
+            self.error_blocks.update(edge)
+
+        if not result.ok:
+            self.show_message(self.describe_error(result, reference))
             return False
-            
-        # Сортируем блоки по их позиции (снизу вверх, слева направо)
-        sorted_blocks = sorted(self.blocks, key=lambda b: (-b.rect.y, b.rect.x))
-        
-        # Проверяем каждый блок
-        for i, block in enumerate(sorted_blocks):
-            if block.name != reference_sequence[i]:
-                self.error_blocks.add(block)
-                self.show_message(f"Неверный элемент на позиции {i+1} в {self.current_mode}: {block.name}")
-                return False
-                
-        # Проверяем соединения
-        for start_idx, end_idx in reference_connections:
-            start_block = sorted_blocks[start_idx]
-            end_block = sorted_blocks[end_idx]
-            
-            # Ищем соответствующую стрелку
-            connection_found = False
-            for arrow in self.arrows:
-                if (arrow.start_point.block == start_block and 
-                    arrow.end_point.block == end_block):
-                    connection_found = True
-                    break
-                    
-            if not connection_found:
-                self.show_message(f"Отсутствует соединение между {start_block.name.replace('\n',' ')} и {end_block.name.replace('\n',' ')} в {self.current_mode}")
+
+        # Выход предыдущего этапа (энкодера) должен приходить в cross-attention каждого слоя
+        stage = self.current_stage()
+        if stage.cross_attention:
+            edges = {(arrow.start_point.block, arrow.end_point.block) for arrow in self.arrows}
+            unconnected = [index for index in stage.cross_attention
+                           if (self.encoder_output_block, result.node_for(index)) not in edges]
+
+            if unconnected:
+                if len(stage.cross_attention) == 1:
+                    self.show_message("Отлично! Осталось соедините энкодер и декодер!")
+                else:
+                    self.show_message(f"Отлично! Осталось соединить выход энкодера "
+                                      f"со слоями декодера (не хватает: {len(unconnected)})")
+                for index in unconnected:
+                    self.error_blocks.add(result.node_for(index))
                 return False
-        
+
         # Если все проверки пройдены успешно
-        if self.current_mode == 'encoder':
-            self.current_mode = 'decoder'
-            self.encoder_blocks = self.blocks.copy()  # Сохраняем блоки энкодера
-            self.encoder_arrows = self.arrows.copy()  # Сохраняем стрелки энкодера
-            self.show_message("Энкодер собран правильно! Теперь соберите декодер")
-            self.blocks.clear()  # Очищаем только текущие блоки
-            self.arrows.clear()  # Очищаем только текущие стрелки
+        if self.stage_index + 1 < len(self.architecture.stages):
+            self.freeze_stage(result.node_for(stage.output))
+            self.show_message(f"{stage.title.capitalize()} собран правильно! "
+                              f"Теперь соберите {self.current_stage().title}")
+            self.journal_snapshot()
         else:
-            # Проверяем соединение между энкодером и декодером
-            encoder_last_block = self.encoder_blocks[-1]  # Последний блок энкодера
-            decoder_mha_block = None
-            for block in self.blocks:
-                if block.name == "Multi-Head\nAttention":
-                    decoder_mha_block = block
-                    break
-            
-            if not decoder_mha_block:
-                self.show_message("Не найден блок Multi-Head Attention в декодере!")
-                return False
-                
-            # Проверяем наличие соединения между энкодером и декодером
-            encoder_decoder_connected = False
-            for arrow in self.arrows:
-                if (arrow.start_point.block == encoder_last_block and 
-                    arrow.end_point.block == decoder_mha_block):
-                    encoder_decoder_connected = True
-                    break
-            
-            if not encoder_decoder_connected:
-                self.show_message("Отлично! Осталось соедините энкодер и декодер!")
-                return False
-                
-            self.show_message("Все верно! Вы шикарны!")
+            self.diagram_complete = True
+            self.show_message("Все верно! Вы шикарны! Нажмите R, чтобы запустить схему")
         
         return True
 
+    def freeze_stage(self, output_block):
+        # Собранный этап (энкодер) остается на экране неизменным, начинается следующий.
+        # Его блоки и стрелки запекаются в фон (build_background), поверх рисуются
+        # только показанные точки соединения
+        self.set_hovered_block(None)
+        for block in self.blocks:
+            block.hide_points()
+        self.stage_index += 1
+        self.current_mode = self.current_stage().name
+        self.encoder_blocks = self.blocks.copy()  # Сохраняем блоки энкодера
+        self.encoder_output_block = output_block
+        self.encoder_index = self.block_index
+        self.block_index = BlockIndex()
+        self.encoder_arrows = list(self.arrows)  # Сохраняем стрелки энкодера
+        self.blocks.clear()  # Очищаем только текущие блоки
+        self.arrows.clear()  # Очищаем только текущие стрелки
+        self.encoder_arrow_table = self.arrow_table
+        self.arrow_table = ArrowTable()
+        self.invalidate_arrow_layer()
+        self.hovered_arrow = None
+        self.live_validator = LiveValidator(self.current_reference())
+        self.live_validator_ok = False
+
+    def describe_error(self, result, reference):
+        labels = {block: block.name for block in self.blocks}
+        return describe_error(result, reference, labels, self.current_mode)
+
     def show_message(self, text):
+        self.invalidate(self.message_rect)
         self.message = text
-        self.message_timer = 180  # Показывать сообщение 3 секунды (60 FPS)
+        self.message_rect = LABEL_CACHE.render(text, MESSAGE_FONT_SIZE, COLORS['text']).get_rect(
+            center=(WINDOW_WIDTH//2, 50))
+        self.invalidate(self.message_rect)
+        self.scheduler.schedule('message', MESSAGE_DURATION, self.hide_message)
+
+    def hide_message(self):
+        self.message = None
+        self.invalidate(self.message_rect)
+
+    def on_hover_timeout(self, block):
+        # Курсор задержался на блоке: показываем точки соединения
+        if block.is_hovered and not self.connecting:
+            block.show_points()
+            self.invalidate_world(block.bounds())
+
+    def interactive_blocks(self):
+        if self.stage_index > 0:
+            return self.blocks + self.encoder_blocks
+        return self.blocks
+
+    def block_under_cursor(self, pos):
+        # pos - точка экрана
+        pos = self.camera.to_world(pos)
+        block = self.block_index.block_at(pos)
+        if block is None and self.stage_index > 0:
+            block = self.encoder_index.block_at(pos)
+        return block
+
+    def set_hovered_block(self, block):
+        # Обновляем только блоки, на которые курсор зашел или с которых ушел
+        if block is self.hovered_block:
+            return
+        previous = self.hovered_block
+        if previous is not None:
+            self.scheduler.cancel('hover')
+            if previous.set_hovered(False):
+                self.invalidate_world(previous.bounds())
+        self.hovered_block = block
+        if block is not None:
+            block.set_hovered(True)
+            self.scheduler.schedule('hover', HOVER_DELAY, lambda: self.on_hover_timeout(block))
+
+    def set_connecting_points(self, visible: bool):
+        # Во время соединения показываем точки всех доступных блоков
+        for block in self.interactive_blocks():
+            if visible:
+                block.show_points()
+            elif block is not self.hovered_block:
+                block.hide_points()
+            self.invalidate_world(block.bounds())
+
+    def forget_block(self, block):
+        if block is self.hovered_block:
+            self.scheduler.cancel('hover')
+            self.hovered_block = None
+
+    def on_mouse_motion(self, pos):
+        if self.panning:
+            self.pan_camera(pos[0] - self.mouse_pos[0], pos[1] - self.mouse_pos[1])
+        self.mouse_pos = pos
+        if self.dragging and self.selected_block:
+            if not self.dragging_from_menu or pos[0] >= MENU_WIDTH:
+                self.invalidate_block(self.selected_block)
+                self.selected_block.move(self.camera.to_world(pos))
+                self.arrow_table.update_block(self.selected_block)
+                self.invalidate_block(self.selected_block)
+
+        # Во время соединения точки уже показаны у всех блоков
+        if not self.connecting:
+            self.set_hovered_block(self.block_under_cursor(pos))
+
+        # Подсветка стрелки под курсором
+        arrow = None
+        if not self.dragging and not self.connecting and not self.panning:
+            arrow = self.arrow_at(pos)
+        self.set_hovered_arrow(arrow)
+
+    def arrow_at(self, pos):
+        # Стрелка под точкой экрана; порог выбора задан в пикселях экрана
+        return self.arrow_table.nearest(self.camera.to_world(pos), ARROW_PICK_DISTANCE / self.camera.zoom)
+
+    def pan_camera(self, dx: int, dy: int):
+        if dx or dy:
+            self.camera.pan(dx, dy)
+            self.invalidate_all()
+
+    def zoom_camera(self, pos, steps: int):
+        if self.camera.zoom_at(pos, steps):
+            self.invalidate_all()
+
+    def reset_camera(self):
+        self.camera.reset()
+        self.invalidate_all()
+
+    def set_hovered_arrow(self, arrow):
+        if arrow is self.hovered_arrow:
+            return
+        if self.hovered_arrow is not None:
+            self.invalidate_world(self.hovered_arrow.bounds())
+        self.hovered_arrow = arrow
+        if arrow is not None:
+            self.invalidate_world(arrow.bounds())
+
+    def point_at(self, pos, exclude=None):
+        # В режиме декодера доступны и точки блоков энкодера; pos - точка экрана
+        pos = self.camera.to_world(pos)
+        radius = POINT_PICK_RADIUS / self.camera.zoom
+        point = self.block_index.point_at(pos, exclude, radius)
+        if point is None and self.stage_index > 0:
+            point = self.encoder_index.point_at(pos, exclude, radius)
+        return point
+
+    def needs_frame(self) -> bool:
+        # Есть ли работа на ближайший кадр (перерисовка или перетаскивание)
+        return bool(self.full_redraw or self.dirty_rects or self.dragging or self.connecting
+                    or self.grading_results or self.decode_results)
+
+    def wake_event_loop(self):
+        # Из фонового потока: пустое событие выводит цикл из ожидания ввода
+        if not self.headless:
+            pygame.event.post(pygame.event.Event(pygame.USEREVENT))
+
+    def submit_for_grading(self):
+        # Отправка снимка работы в фоновом потоке: сетевой запрос не задерживает кадры
+        if self.grading_thread is not None and self.grading_thread.is_alive():
+            self.show_message("Работа уже на проверке")
+            return
+        snapshot = self.snapshot()
+
+        def submit():
+            try:
+                result = self.grader.submit(snapshot)
+            except (OSError, ValueError) as error:
+                result = {'error': str(error)}
+            self.grading_results.append(result)
+            self.wake_event_loop()
+
+        self.show_message("Работа отправлена на проверку")
+        self.grading_thread = threading.Thread(target=submit, name='grading', daemon=True)
+        self.grading_thread.start()
+
+    def forget_forward_pass(self):
+        # Схема изменилась: прежние замеры к ней больше не относятся
+        self.diagram_complete = False
+        if self.block_timings:
+            self.block_timings = {}
+            self.invalidate_all()
+        self.decode_program = None
+        if self.decode_lines:
+            self.set_decode_lines([])
+
+    def compile_diagram(self):
+        # Проверенная схема как программа на NumPy (см. engine.py) или None с сообщением
+        if not self.diagram_complete:
+            self.show_message("Сначала соберите схему и нажмите «Проверить»")
+            return None
+        parts = [(self.blocks, self.arrows)]
+        if self.stage_index > 0:
+            parts.insert(0, (self.encoder_blocks, self.encoder_arrows))
+        stages = [({block: block.name for block in blocks},
+                   list(dict.fromkeys((arrow.start_point.block, arrow.end_point.block) for arrow in arrows)))
+                  for blocks, arrows in parts]
+        try:
+            return Program(stages)
+        except ValueError as error:
+            self.show_message(f"Схему нельзя выполнить: {error}")
+            return None
+
+    def run_forward_pass(self):
+        # Прямой проход проверенной схемы: у каждого блока - время его шага и доля FLOP
+        program = self.compile_diagram()
+        if program is None:
+            return
+        profile = program.profile()
+
+        total_flops = profile.total_flops or 1
+        self.block_timings = {}
+        for step, ms in zip(profile.program.steps, profile.times_ms):
+            self.block_timings[step.nodes[0]] = f"{ms:.2f} мс, {step.flops / total_flops:.1%} FLOP"
+            for node in step.nodes[1:]:
+                self.block_timings[node] = "в одном шаге с предыдущим"
+        self.invalidate_all()
+        self.show_message(f"Прямой проход: {profile.total_ms:.1f} мс, "
+                          f"{profile.tokens_per_second:.0f} токенов/с")
+
+    def run_decode_comparison(self):
+        # Генерация по собранному декодеру с KV-кэшем и с пересчетом префикса
+        # на растущих длинах. Замер занимает секунды, поэтому идет в фоновом
+        # потоке, а итог попадает в панель справа внизу через update_timers
+        if self.decode_thread is not None and self.decode_thread.is_alive():
+            self.show_message("Генерация уже замеряется")
+            return
+        if self.decode_lines:
+            self.set_decode_lines([])
+            return
+        program = self.compile_diagram()
+        if program is None:
+            return
+        try:
+            program.decoder_steps()
+        except ValueError as error:
+            self.show_message(f"Генерация недоступна: {error}")
+            return
+
+        def measure():
+            self.decode_results.append((program, compare_decoding(program, DECODE_LENGTHS, repeats=1)))
+            self.wake_event_loop()
+
+        self.decode_program = program
+        self.show_message("Замеряем генерацию с KV-кэшем и без...")
+        self.decode_thread = threading.Thread(target=measure, name='decode', daemon=True)
+        self.decode_thread.start()
+
+    def show_decode_results(self, results):
+        lines = ["длина: ток/с с кэшем / без (ускорение), пик памяти, КБ"]
+        for cached, full in results:
+            speedup = cached.tokens_per_second / full.tokens_per_second if full.tokens_per_second else 0.0
+            lines.append(
+                f"{cached.length:>3}: {cached.tokens_per_second:,.0f} / {full.tokens_per_second:,.0f} "
+                f"({speedup:.1f}x), {cached.peak_bytes // 1024:,} / {full.peak_bytes // 1024:,} "
+                f"(кэш {cached.cache_bytes // 1024:,})")
+        self.set_decode_lines(lines)
+
+    def set_decode_lines(self, lines):
+        # Панель подгоняется под самую широкую строку
+        self.invalidate(self.decode_panel_rect)
+        self.decode_lines = lines
+        self.decode_panel_rect = None
+        if lines:
+            width = max(LABEL_CACHE.render(line, TIMING_FONT_SIZE, COLORS['text']).get_width() for line in lines)
+            self.decode_panel_rect = pygame.Rect(0, 0, width + 16, 16 + 16 * len(lines))
+            self.decode_panel_rect.bottomright = DECODE_PANEL_CORNER
+            self.invalidate(self.decode_panel_rect)
+
+    def draw_decode_panel(self):
+        panel = pygame.Surface(self.decode_panel_rect.size, pygame.SRCALPHA)
+        panel.fill((255, 255, 255, 220))
+        for i, line in enumerate(self.decode_lines):
+            panel.blit(LABEL_CACHE.render(line, TIMING_FONT_SIZE, COLORS['text']), (8, 8 + i * 16))
+        self.screen.blit(panel, self.decode_panel_rect)
+
+    def timing_label(self, block):
+        # Надпись с замером справа от блока и ее место на экране
+        surface = LABEL_CACHE.render(self.block_timings[block], TIMING_FONT_SIZE, COLORS['text'])
+        return surface, surface.get_rect(midleft=self.camera.to_screen((block.rect.right + 8, block.rect.centery)))
+
+    def show_grading_result(self, result):
+        if 'error' in result:
+            self.show_message(f"Проверка недоступна: {result['error']}")
+        elif result['passed']:
+            self.show_message("Работа сдана: все верно!")
+        else:
+            missing = len(result['missing_edges'])
+            suffix = f" (не хватает соединений: {missing})" if missing else ""
+            self.show_message(f"Не сдано: {result['first_error']}{suffix}")
+
+    def handle_events(self, events=None):
+        if events is None:
+            events = pygame.event.get()
+        if self.recorder is not None:
+            self.recorder.record_frame(self.scheduler.clock(), events)
+        # Несколько событий движения подряд сводим к последней позиции курсора
+        pending_motion = None
+        for event in events:
+            if event.type == pygame.MOUSEMOTION:
+                pending_motion = event.pos
+                continue
+            if pending_motion is not None:
+                self.on_mouse_motion(pending_motion)
+                pending_motion = None
 
-    def handle_events(self):
-        for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 return False
-            
+
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.invalidate_all()
+
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1:  # Левая кнопка мыши
                     # Проверяем клик по кнопке проверки
                     if self.menu.is_check_button_clicked(event.pos):
                         self.check_sequence()
+                        self.invalidate_all()
                         return True
                         
                     # Проверяем клик по корзине
                     if self.menu.is_in_trash(event.pos):
-                        if self.current_mode == 'encoder':
-                            self.blocks.clear()
-                        else:
-                            self.blocks.clear()
-                            self.encoder_blocks.clear()
-                            self.encoder_arrows.clear()
-                        self.arrows.clear()
-                        self.error_blocks.clear()
-                        self.error_arrows.clear()
+                        self.clear_workspace()
                         return True
 
                     # Проверяем клик по меню
@@ -572,172 +1636,512 @@ class TransformerGame:
                         menu_block = self.menu.get_block_at_pos(event.pos)
                         if menu_block:
                             # Создаем новый блок того же типа, что и в меню
+                            pos = self.camera.to_world(event.pos)
                             if isinstance(menu_block, YinYangBlock):
                                 new_block = YinYangBlock(
                                     menu_block.name,
-                                    (event.pos[0], event.pos[1]),
+                                    pos,
                                     menu_block.size
                                 )
                             else:
                                 new_block = TransformerBlock(
                                     menu_block.name,
-                                    (event.pos[0], event.pos[1]),
+                                    pos,
                                     menu_block.size
                                 )
-                            self.blocks.append(new_block)
+                            self.add_block(new_block)
                             self.selected_block = new_block
                             self.dragging = True
                             self.dragging_from_menu = True
                     else:
                         # Проверяем клик по точкам соединения
-                        if self.current_mode == 'decoder':
-                            # Проверяем точки соединения как в блоках декодера, так и в блоках энкодера
-                            for block in self.blocks + self.encoder_blocks:
-                                for point in block.connection_points.values():
-                                    if point.is_clicked(event.pos):
-                                        self.connecting = True
-                                        self.start_connection_point = point
-                                        break
-                                if self.connecting:
-                                    break
-                        else:
-                            # В режиме энкодера проверяем только точки в текущих блоках
-                            for block in self.blocks:
-                                for point in block.connection_points.values():
-                                    if point.is_clicked(event.pos):
-                                        self.connecting = True
-                                        self.start_connection_point = point
-                                        break
-                                if self.connecting:
-                                    break
-                        
+                        point = self.point_at(event.pos)
+                        if point is not None:
+                            self.connecting = True
+                            self.start_connection_point = point
+                            self.set_connecting_points(True)
+
                         # Если не кликнули по точке соединения, проверяем клик по блокам
                         if not self.connecting:
-                            for block in self.blocks:
-                                if block.is_clicked(event.pos):
-                                    self.selected_block = block
-                                    self.dragging = True
-                                    self.dragging_from_menu = False
-                                    break
+                            block = self.block_index.block_at(self.camera.to_world(event.pos))
+                            if block is not None:
+                                self.selected_block = block
+                                self.dragging = True
+                                self.dragging_from_menu = False
+
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_l:
+                self.set_live_validation(not self.live_validation)
+
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.toggle_profiler_overlay()
+
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_TAB:
+                self.next_architecture()
+
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_g:
+                self.submit_for_grading()
+
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_r:
+                self.run_forward_pass()
+
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_d:
+                self.run_decode_comparison()
+
+            # Холст: средняя кнопка двигает, колесо и +/- меняют масштаб, Home - исходный вид
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 2 and event.pos[0] >= MENU_WIDTH:
+                self.panning = True
+                self.mouse_pos = event.pos
+                self.set_hovered_arrow(None)
+
+            if event.type == pygame.MOUSEBUTTONUP and event.button == 2:
+                self.panning = False
+
+            if event.type == pygame.MOUSEWHEEL and event.y and self.mouse_pos[0] >= MENU_WIDTH:
+                self.zoom_camera(self.mouse_pos, 1 if event.y > 0 else -1)
+
+            if event.type == pygame.KEYDOWN and event.key in CAMERA_KEYS:
+                dx, dy, steps = CAMERA_KEYS[event.key]
+                if steps:
+                    self.zoom_camera(((WINDOW_WIDTH + MENU_WIDTH) // 2, WINDOW_HEIGHT // 2), steps)
+                else:
+                    self.pan_camera(dx, dy)
+
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_HOME:
+                self.reset_camera()
+
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_s and event.mod & pygame.KMOD_CTRL:
+                if self.journal is not None:
+                    self.journal_snapshot()
+                    self.show_message("Работа сохранена")
+
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 3:
+                # Правая кнопка мыши удаляет стрелку под курсором
+                arrow = self.arrow_at(event.pos)
+                if arrow is not None:
+                    self.remove_arrow(arrow)
 
             if event.type == pygame.MOUSEBUTTONUP:
                 if event.button == 1:
                     if self.dragging and self.selected_block:
                         if self.menu.is_in_trash(event.pos):
-                            self.blocks.remove(self.selected_block)
+                            self.remove_block(self.selected_block)
+                        else:
+                            block = self.selected_block
+                            self.journal_append(['m', block.uid, block.rect.x, block.rect.y])
                     self.dragging = False
                     self.selected_block = None
                     self.dragging_from_menu = False
                     
                     # Завершаем соединение
                     if self.connecting:
-                        if self.current_mode == 'decoder':
-                            # В режиме декодера проверяем точки как в блоках декодера, так и в блоках энкодера
-                            for block in self.blocks + self.encoder_blocks:
-                                for point in block.connection_points.values():
-                                    if point.is_clicked(event.pos) and point != self.start_connection_point:
-                                        self.arrows.append(Arrow(self.start_connection_point, point))
-                                        break
-                        else:
-                            # В режиме энкодера проверяем только точки в текущих блоках
-                            for block in self.blocks:
-                                for point in block.connection_points.values():
-                                    if point.is_clicked(event.pos) and point != self.start_connection_point:
-                                        self.arrows.append(Arrow(self.start_connection_point, point))
-                                        break
+                        point = self.point_at(event.pos, exclude=self.start_connection_point)
+                        if point is not None:
+                            self.add_arrow(Arrow(self.start_connection_point, point))
                         self.connecting = False
                         self.start_connection_point = None
+                        self.set_hovered_block(self.block_under_cursor(event.pos))
+                        self.set_connecting_points(False)
+                        self.invalidate(self.connection_line_rect)
+                        self.connection_line_rect = None
 
-            if event.type == pygame.MOUSEMOTION:
-                if self.dragging and self.selected_block:
-                    if not self.dragging_from_menu or event.pos[0] >= MENU_WIDTH:
-                        self.selected_block.move(event.pos)
-                
-                # Проверяем наведение на блоки
-                for block in self.blocks:
-                    block.check_hover(event.pos, self.connecting)
-                if self.current_mode == 'decoder':
-                    for block in self.encoder_blocks:
-                        block.check_hover(event.pos, self.connecting)
+        if pending_motion is not None:
+            self.on_mouse_motion(pending_motion)
 
         return True
 
-    def draw(self):
-        self.screen.fill(COLORS['WHITE'])
-        
+    def build_background(self):
+        # Статичные слои: фон, серые панели, меню и заголовок режима.
+        # Фон зависит от камеры и перестраивается при сдвиге или смене масштаба
+        background = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+        background.fill(COLORS['WHITE'])
+        camera = self.camera
+        view = camera.rect_to_world(background.get_rect())
+
         # Отрисовка фоновых прямоугольников
-        gray_color = (243, 243, 244)  # Серый цвет
-        rect1 = pygame.Rect(400, 300, 250, 350)
-        rect2 = pygame.Rect(700, 100, 250, 550)
-        pygame.draw.rect(self.screen, gray_color, rect1, border_radius=BORDER_RADIUS)
-        pygame.draw.rect(self.screen, gray_color, rect2, border_radius=BORDER_RADIUS)
-        
+        for rect in PANEL_RECTS:
+            pygame.draw.rect(background, PANEL_COLOR, camera.rect_to_screen(rect),
+                             border_radius=scale_length(BORDER_RADIUS, camera.zoom))
+
+        # Собранный энкодер больше не меняется: рисуем его видимую часть вместе с фоном
+        if self.stage_index > 0:
+            self.encoder_arrow_table.draw(background, self.encoder_arrow_table.arrows_in(view), camera=camera)
+            for block in self.encoder_index.blocks_in(view):
+                block.draw(background, camera=camera, points=False)
+
         # Отрисовка меню
-        self.menu.draw(self.screen)
-        
-        # Отрисовка стрелок энкодера, если мы в режиме декодера
-        if self.current_mode == 'decoder':
-            for arrow in self.encoder_arrows:
-                arrow.draw(self.screen)
-        
-        # Отрисовка стрелок
-        for arrow in self.arrows:
-            color = COLORS['ERROR'] if arrow in self.error_arrows else COLORS['BORDER']
-            arrow.draw(self.screen)
-        
-        # Отрисовка блоков энкодера, если мы в режиме декодера
-        if self.current_mode == 'decoder':
-            for block in self.encoder_blocks:
-                block.draw(self.screen)
-        
-        # Отрисовка всех блоков
-        for block in self.blocks:
-            block.draw(self.screen)
-            # Если блок в списке ошибок, рисуем его название красным
-            if block in self.error_blocks:
-                font = pygame.font.Font(None, 24)
-                lines = block.name.split('\n')
-                line_height = font.get_height()
-                total_height = line_height * len(lines)
-                
-                for i, line in enumerate(lines):
-                    text = font.render(line, True, COLORS['ERROR'])
-                    text_rect = text.get_rect(centerx=block.rect.centerx,
-                                            centery=block.rect.centery - total_height/2 + line_height/2 + i*line_height)
-                    self.screen.blit(text, text_rect)
-
-        # Отрисовка временной линии соединения
-        if self.connecting and self.start_connection_point:
-            pygame.draw.line(self.screen, COLORS['BORDER'],
-                           self.start_connection_point.pos,
-                           pygame.mouse.get_pos(),
-                           2)
-
-        # Отрисовка сообщения
-        if self.message and self.message_timer > 0:
-            text_surface = self.message_font.render(self.message, True, COLORS['text'])
-            text_rect = text_surface.get_rect(center=(WINDOW_WIDTH//2, 50))
-            self.screen.blit(text_surface, text_rect)
-            self.message_timer -= 1
+        self.menu.draw(background)
 
         # Отрисовка текущего режима
         mode_text = f"Собери блок {self.current_mode}"
-        mode_surface = self.message_font.render(mode_text, True, COLORS['text'])
+        if self.architecture.layers > 1:
+            mode_text += f" ({self.architecture.layers}x)"
+        if self.architecture.name != DEFAULT_ARCHITECTURE:
+            mode_text = f"{self.architecture.title}: собери блок {self.current_mode}"
+        mode_surface = LABEL_CACHE.render(mode_text, MESSAGE_FONT_SIZE, COLORS['text'])
         mode_rect = mode_surface.get_rect(center=(WINDOW_WIDTH//2, 30))
-        self.screen.blit(mode_surface, mode_rect)
+        background.blit(mode_surface, mode_rect)
+
+        if pygame.display.get_surface() is not None:
+            background = background.convert()
+        self.background = background
+        self.background_key = (self.current_mode, camera.key())
+
+    def draw_scene(self, area=None):
+        # Рисуем динамические слои поверх фона; area ограничивает перерисовку
+        profiler = self.profiler
+        camera = self.camera
+        with profiler.phase('background'):
+            if self.background is None or self.background_key != (self.current_mode, camera.key()):
+                self.build_background()
+                area = None
+
+            if area is None:
+                self.screen.blit(self.background, (0, 0))
+            else:
+                self.screen.blit(self.background, area, area)
+
+        # Видимая часть холста: рисуется только то, что в нее попадает
+        view = camera.rect_to_world(area if area is not None else self.screen.get_rect())
+        transform = None if camera.is_identity else camera
+
+        with profiler.phase('arrows'):
+            drawn = 0
+            # Неизменившиеся стрелки берем из готового слоя
+            live = self.live_arrows()
+            if self.arrow_layer is None or self.arrow_layer_key != self.arrow_layer_state(live):
+                drawn += self.build_arrow_layer(live)
+            if area is None:
+                self.screen.blit(self.arrow_layer, (0, 0))
+            else:
+                self.screen.blit(self.arrow_layer, area, area)
+
+            # Поверх слоя: перетаскиваемые, ошибочные и стрелка под курсором. Цвета
+            # идут в том порядке, в каком стрелки лягут в слой и поверх него: иначе
+            # черная перетаскиваемая стрелка закроет красную, а после отпускания
+            # блока эти пиксели никто не перерисует
+            overlay = {COLORS['BORDER']: [], COLORS['ERROR']: [], COLORS['ARROW_HOVER']: []}
+            for arrow in self.overlay_arrows(live):
+                if view.colliderect(arrow.bounds()):
+                    overlay[self.arrow_color(arrow)].append(arrow)
+            for color, arrows in overlay.items():
+                self.arrow_table.draw(self.screen, arrows, color, transform)
+                drawn += len(arrows)
+            profiler.count('arrows_drawn', drawn)
+
+        with profiler.phase('encoder_blocks'):
+            # Блоки энкодера уже в фоне; рисуем только их показанные точки соединения
+            if self.stage_index > 0:
+                for point in self.encoder_index.points.query_rect(view):
+                    point.draw(self.screen, transform)
+
+        with profiler.phase('blocks'):
+            drawn = 0
+            # Отрисовка видимых блоков
+            for block in self.block_index.blocks_in(view):
+                # Если блок в списке ошибок, его название рисуется красным
+                block.draw(self.screen, error=block in self.error_blocks, camera=transform)
+                drawn += 1
+            profiler.count('blocks_drawn', drawn)
+
+        with profiler.phase('overlay'):
+            # Отрисовка временной линии соединения
+            if self.connecting and self.start_connection_point:
+                pygame.draw.line(self.screen, COLORS['BORDER'],
+                               camera.to_screen(self.start_connection_point.pos),
+                               self.mouse_pos,
+                               2)
+
+            # Замеры прямого прохода рядом с блоками
+            for block in self.block_timings:
+                surface, rect = self.timing_label(block)
+                if area is None or area.colliderect(rect):
+                    self.screen.blit(surface, rect)
+
+            # Отрисовка сообщения
+            if self.message:
+                text_surface = LABEL_CACHE.render(self.message, MESSAGE_FONT_SIZE, COLORS['text'])
+                self.screen.blit(text_surface, self.message_rect)
+
+            if self.decode_lines:
+                self.draw_decode_panel()
+
+            if profiler.overlay_visible:
+                self.draw_profiler_overlay()
+
+    def arrow_color(self, arrow):
+        if arrow is self.hovered_arrow:
+            return COLORS['ARROW_HOVER']
+        return COLORS['ERROR'] if arrow in self.error_arrows else COLORS['BORDER']
+
+    def live_arrows(self):
+        # Стрелки перетаскиваемого блока меняются каждый кадр и в слой не попадают
+        if self.dragging and self.selected_block is not None:
+            return frozenset(self.arrow_table.arrows_of(self.selected_block))
+        return frozenset()
+
+    def overlay_arrows(self, live):
+        # Стрелки, которые рисуются поверх слоя своим цветом
+        return [arrow for arrow in dict.fromkeys(itertools.chain(live, self.error_arrows, (self.hovered_arrow,)))
+                if arrow in self.arrows]
+
+    def arrow_layer_state(self, live):
+        return (self.camera.key(), live, frozenset(self.error_arrows), self.hovered_arrow)
+
+    def build_arrow_layer(self, live) -> int:
+        # Прозрачный слой со всеми видимыми стрелками обычного цвета. Стрелок
+        # поверх слоя в нем нет: черная стрелка под красной или синей оставила бы
+        # кайму там, где растеризация разойдется, поэтому слой перестраивается и
+        # при смене ошибок или подсветки, а не только стрелок и камеры
+        layer = pygame.Surface(self.screen.get_size(), pygame.SRCALPHA)
+        camera = self.camera
+        overlay = set(self.overlay_arrows(live))
+        arrows = [arrow for arrow in self.arrow_table.arrows_in(camera.rect_to_world(layer.get_rect()))
+                  if arrow not in overlay]
+        self.arrow_table.draw(layer, arrows, COLORS['BORDER'], None if camera.is_identity else camera)
+        self.arrow_layer = layer
+        self.arrow_layer_key = self.arrow_layer_state(live)
+        return len(arrows)
+
+    def draw_profiler_overlay(self):
+        # Сводка профилировщика; текст меняется каждый кадр, поэтому не кэшируется
+        rect = PROFILER_OVERLAY_RECT
+        panel = pygame.Surface(rect.size, pygame.SRCALPHA)
+        panel.fill((255, 255, 255, 220))
+        font = LABEL_CACHE.get_font(20)
+        lines = self.profiler.overlay_lines()
+        for i, line in enumerate(lines):
+            panel.blit(font.render(line, True, COLORS['text']), (8, 6 + i * 16))
+        # Мимо LABEL_CACHE, поэтому в font_renders сами собой не попадают
+        self.profiler.count('font_renders', len(lines))
+        self.screen.blit(panel, rect)
+
+    def toggle_profiler_overlay(self):
+        if not self.profiler.enabled:
+            self.profiler = FrameProfiler()
+        self.profiler.overlay_visible = not self.profiler.overlay_visible
+        self.invalidate(PROFILER_OVERLAY_RECT)
+
+    def update_timers(self):
+        self.scheduler.run_due()
+        while self.grading_results:
+            self.show_grading_result(self.grading_results.popleft())
+        while self.decode_results:
+            program, results = self.decode_results.popleft()
+            if program is self.decode_program:  # схема с тех пор не менялась
+                self.show_decode_results(results)
+
+        # Временная линия соединения меняется вместе с курсором
+        if self.connecting and self.start_connection_point:
+            start = self.camera.to_screen(self.start_connection_point.pos)
+            end = self.mouse_pos
+            line_rect = pygame.Rect(min(start[0], end[0]), min(start[1], end[1]),
+                                    abs(end[0] - start[0]) + 1, abs(end[1] - start[1]) + 1).inflate(4, 4)
+            if line_rect != self.connection_line_rect:
+                self.invalidate(self.connection_line_rect)
+                self.invalidate(line_rect)
+                self.connection_line_rect = line_rect
+
+    def cover_overlay_arrows(self, rects, screen_rect):
+        # Стрелки поверх слоя растрируются прямо на экране, а линия, обрезанная
+        # областью перерисовки, ложится на пиксели иначе, чем целая, и оставляет
+        # швы. Поэтому каждая область расширяется до целых стрелок, которые задевает
+        camera = self.camera
+        boxes = [camera.rect_to_screen(arrow.bounds()).inflate(2, 2)
+                 for arrow in self.overlay_arrows(self.live_arrows())]
+        covered = []
+        for rect in rects:
+            grown = bool(boxes)
+            while grown:
+                grown = False
+                for box in boxes:
+                    if rect.colliderect(box) and not rect.contains(box):
+                        rect = rect.union(box)
+                        grown = True
+            covered.append(rect.clip(screen_rect))
+        return covered
+
+    def draw(self):
+        self.update_timers()
+
+        if self.profiler.overlay_visible and self.dirty_rects:
+            self.invalidate(PROFILER_OVERLAY_RECT)
+
+        if not self.dirty_rendering or self.full_redraw:
+            self.draw_scene()
+            self.profiler.count('dirty_rects', 1)
+            if not self.headless:
+                with self.profiler.phase('flip'):
+                    pygame.display.flip()
+        elif self.dirty_rects:
+            screen_rect = self.screen.get_rect()
+            rects = [rect.clip(screen_rect) for rect in self.dirty_rects]
+            rects = [rect for rect in rects if rect.width and rect.height]
+            # Много мелких областей дешевле перерисовать одним прямоугольником
+            if len(rects) > 16:
+                rects = [rects[0].unionall(rects[1:])]
+            rects = self.cover_overlay_arrows(rects, screen_rect)
+            for rect in rects:
+                self.screen.set_clip(rect)
+                self.draw_scene(rect)
+            self.screen.set_clip(None)
+            self.profiler.count('dirty_rects', len(rects))
+            if not self.headless:
+                with self.profiler.phase('flip'):
+                    pygame.display.update(rects)
+
+        self.dirty_rects.clear()
+        self.full_redraw = False
+
+    def wait_events(self):
+        if self.headless:
+            events = list(self.pending_events)
+            self.pending_events.clear()
+            return events
+
+        # Без активности блокируемся до события или ближайшего таймера
+        if self.needs_frame():
+            return pygame.event.get()
+
+        timeout = self.scheduler.time_until_next()
+        if timeout is None:
+            event = pygame.event.wait()
+        else:
+            event = pygame.event.wait(max(1, math.ceil(timeout * 1000)))
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
+
+    # --- программное управление (headless) ---
+
+    def post_event(self, event_type, **attributes):
+        self.pending_events.append(pygame.event.Event(event_type, **attributes))
+
+    def step(self, events=None) -> bool:
+        # Один кадр: события из очереди и переданные явно, таймеры, отрисовка
+        if events is not None:
+            self.pending_events.extend(events)
+        return self.run_frame(self.wait_events())
+
+    def click(self, pos, button: int = 1):
+        self.post_event(pygame.MOUSEBUTTONDOWN, pos=pos, button=button)
+        self.post_event(pygame.MOUSEBUTTONUP, pos=pos, button=button)
+        return self.step()
+
+    def drag(self, start, end, steps: int = 5, button: int = 1):
+        self.post_event(pygame.MOUSEBUTTONDOWN, pos=start, button=button)
+        self.step()
+        for i in range(1, steps + 1):
+            pos = (start[0] + (end[0] - start[0]) * i // steps,
+                   start[1] + (end[1] - start[1]) * i // steps)
+            self.post_event(pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(1, 0, 0))
+            self.step()
+        self.post_event(pygame.MOUSEBUTTONUP, pos=end, button=button)
+        return self.step()
+
+    def get_state(self) -> Dict:
+        # Снимок состояния игры из простых типов: блоки, стрелки, режим, сообщение
+        refs = {}
+        for group, blocks in (('encoder', self.encoder_blocks), ('current', self.blocks)):
+            for i, block in enumerate(blocks):
+                refs[block] = (group, i)
+
+        def block_state(block):
+            return {
+                'name': block.name,
+                'kind': type(block).__name__,
+                'rect': (block.rect.x, block.rect.y, block.rect.width, block.rect.height),
+                'error': block in self.error_blocks,
+            }
+
+        def arrow_state(arrow):
+            return {
+                'start': (*refs.get(arrow.start_point.block, ('deleted', -1)), arrow.start_point.side),
+                'end': (*refs.get(arrow.end_point.block, ('deleted', -1)), arrow.end_point.side),
+                'error': arrow in self.error_arrows,
+            }
+
+        return {
+            'mode': self.current_mode,
+            'architecture': self.architecture.name,
+            'layers': self.architecture.layers,
+            'blocks': [block_state(block) for block in self.blocks],
+            'arrows': [arrow_state(arrow) for arrow in self.arrows],
+            'encoder_blocks': [block_state(block) for block in self.encoder_blocks],
+            'encoder_arrows': [arrow_state(arrow) for arrow in self.encoder_arrows],
+            'message': self.message,
+            'live_validation': self.live_validation,
+        }
 
-        pygame.display.flip()
+    def run_frame(self, events) -> bool:
+        profiler = self.profiler
+        profiler.begin_frame()
+        renders = LABEL_CACHE.misses
+        with profiler.phase('events'):
+            running = self.handle_events(events)
+        self.draw()
+        profiler.count('font_renders', LABEL_CACHE.misses - renders)
+        profiler.end_frame()
+        return running
 
     def run(self):
         running = True
         while running:
-            running = self.handle_events()
-            self.draw()
-            self.clock.tick(60)
+            running = self.run_frame(self.wait_events())
+            if self.needs_frame():
+                self.clock.tick(FPS)
 
         pygame.quit()
         sys.exit()
 
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Тренажер архитектуры трансформера")
+    parser.add_argument('--record', metavar='PATH', help="записать входные события сессии в файл")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="замерять фазы каждого кадра и писать их в CSV (*.csv) или JSON-строки")
+    parser.add_argument('--profile-overlay', action='store_true', help="сразу показать сводку профилировщика (F3)")
+    parser.add_argument('--arch', default=DEFAULT_ARCHITECTURE,
+                        help=f"упражнение: {', '.join(available_architectures())} или путь к файлу спецификации")
+    parser.add_argument('--workspace', metavar='PATH',
+                        help="восстановить работу из файла и автосохранять ее туда же (Ctrl+S - сохранить сразу)")
+    parser.add_argument('--grader', metavar='ADDRESS',
+                        help="сервер проверки для клавиши G: host:port или путь к unix-сокету "
+                             "(по умолчанию проверка в самой игре)")
+    parser.add_argument('--layers', type=int, default=1, choices=range(1, MAX_LAYERS + 1), metavar='N',
+                        help=f"собирать стек из N слоев энкодера и декодера (1-{MAX_LAYERS}, по умолчанию 1)")
+    args = parser.parse_args(argv)
+
+    profiler = None
+    if args.profile or args.profile_overlay:
+        profiler = FrameProfiler(args.profile)
+        profiler.overlay_visible = args.profile_overlay
+    game = TransformerGame(profiler=profiler, architecture=args.arch, layers=args.layers)
+    if args.grader:
+        from grading_server import SocketGrader
+        game.grader = SocketGrader(args.grader)
+    restored = False
+    if args.workspace:
+        if os.path.exists(args.workspace):
+            game.restore(load_workspace(args.workspace))
+            restored = True
+        game.journal = AutosaveJournal(args.workspace, game.snapshot())
+    if args.record:
+        from replay import InputRecorder
+        # Восстановленная работа - начальное состояние трассы, иначе воспроизведение разойдется
+        game.recorder = InputRecorder(args.record, architecture=game.architecture.source,
+                                      layers=game.architecture.layers,
+                                      snapshot=game.snapshot() if restored else None)
+    try:
+        game.run()
+    finally:
+        if game.journal is not None:
+            game.journal.close()
+        game.grader.close()
+        if game.recorder is not None:
+            game.recorder.close()
+        game.profiler.close()
+
+
 if __name__ == "__main__":
-    game = TransformerGame()
-    game.run() 
\ No newline at end of file
+    main() 
\ No newline at end of file
@@ -0,0 +1,523 @@
+# Проверка собранной схемы по эталонному графу.
+# Блоки сопоставляются с эталоном по подписям и связям, а не по положению
+# на экране, поэтому проверка не зависит от раскладки схемы.
+import hashlib
+from collections import Counter, defaultdict, deque
+from typing import Dict, Hashable, Iterable, List, Tuple
+
+
+class ReferenceGraph:
+    # Эталон: подписи блоков и множество ориентированных ребер между их индексами.
+    # Все таблицы поиска строятся один раз, граф можно сохранять через pickle.
+    def __init__(self, sequence: List[str], connections: Iterable[Tuple[int, int]]):
+        self.labels = list(sequence)
+        self.edges = set(connections)
+        self.edge_list = sorted(self.edges)  # каноничный порядок ребер
+        self.out_edges = [[] for _ in self.labels]
+        self.in_edges = [[] for _ in self.labels]
+        for start, end in self.edge_list:
+            self.out_edges[start].append(end)
+            self.in_edges[end].append(start)
+        self.by_label = defaultdict(list)
+        for i, label in enumerate(self.labels):
+            self.by_label[label].append(i)
+        self.label_counts = Counter(self.labels)
+        self.degrees = [(len(self.out_edges[i]), len(self.in_edges[i])) for i in range(len(self.labels))]
+        # Соседи каждого узла, сгруппированные по подписи: распространение
+        # сопоставления берет кандидатов нужного вида без перебора
+        self.out_by_label = [_group_by_label(self.out_edges[i], self.labels) for i in range(len(self.labels))]
+        self.in_by_label = [_group_by_label(self.in_edges[i], self.labels) for i in range(len(self.labels))]
+        self.digest = graph_digest(self.labels, self.edge_list)
+
+    def __len__(self):
+        return len(self.labels)
+
+
+def _group_by_label(indexes, labels):
+    groups = {}
+    for index in indexes:
+        groups.setdefault(labels[index], []).append(index)
+    return groups
+
+
+def graph_digest(labels: List[str], edges: Iterable[Tuple[int, int]]) -> str:
+    # Устойчивый между запусками хэш графа (hash() строк зависит от PYTHONHASHSEED)
+    h = hashlib.blake2b(digest_size=16)
+    for label in labels:
+        h.update(label.encode('utf-8') + b'\0')
+    h.update(b'\1')
+    for start, end in edges:
+        h.update(f"{start},{end};".encode('ascii'))
+    return h.hexdigest()
+
+
+class ValidationResult:
+    def __init__(self, mapping, missing_blocks, extra_blocks, missing_edges, wrong_edges, extra_edges):
+        self.mapping = mapping                  # узел пользователя -> индекс в эталоне
+        self.missing_blocks = missing_blocks    # индексы эталона без пары
+        self.extra_blocks = extra_blocks        # узлы пользователя без пары
+        self.missing_edges = missing_edges      # ребра эталона (i, j), которых нет у пользователя
+        self.wrong_edges = wrong_edges          # ребра пользователя, проведенные вместо недостающих
+        self.extra_edges = extra_edges          # прочие лишние ребра пользователя
+
+    @property
+    def ok(self) -> bool:
+        return not (self.missing_blocks or self.extra_blocks or self.missing_edges
+                    or self.wrong_edges or self.extra_edges)
+
+    def node_for(self, index: int):
+        # Узел пользователя, сопоставленный индексу эталона
+        for node, ref_index in self.mapping.items():
+            if ref_index == index:
+                return node
+        return None
+
+
+class _Matcher:
+    # Жадное сопоставление графов: начинаем с подписей, которые встречаются
+    # в эталоне один раз, и распространяем пары по ребрам. Каждое ребро
+    # просматривается O(1) раз, поэтому время почти линейное.
+    def __init__(self, labels: Dict[Hashable, str], edges, reference: ReferenceGraph):
+        self.labels = labels
+        self.reference = reference
+        self.order = {node: i for i, node in enumerate(labels)}
+        self.out_edges = defaultdict(list)
+        self.in_edges = defaultdict(list)
+        for start, end in edges:
+            self.out_edges[start].append(end)
+            self.in_edges[end].append(start)
+        self.mapping = {}
+        self.used = set()
+        self.queue = deque()
+
+    def _signature(self, node):
+        return len(self.out_edges[node]), len(self.in_edges[node])
+
+    def _ref_signature(self, index):
+        return self.reference.degrees[index]
+
+    def _pair(self, node, index):
+        self.mapping[node] = index
+        self.used.add(index)
+        self.queue.append((node, index))
+
+    def _pair_groups(self, nodes, indexes):
+        # Пары внутри одной подписи: ближайшие по числу входящих и исходящих ребер
+        nodes = sorted(nodes, key=lambda n: (self._signature(n), self.order[n]))
+        indexes = sorted(indexes, key=lambda i: (self._ref_signature(i), i))
+        if len(nodes) == 1 or len(indexes) == 1:
+            # Единственный кандидат с одной стороны выбираем по сходству степеней
+            if len(nodes) == 1:
+                sig = self._signature(nodes[0])
+                best = min(indexes, key=lambda i: (_distance(sig, self._ref_signature(i)), i))
+                self._pair(nodes[0], best)
+            else:
+                sig = self._ref_signature(indexes[0])
+                best = min(nodes, key=lambda n: (_distance(self._signature(n), sig), self.order[n]))
+                self._pair(best, indexes[0])
+            return
+        for node, index in zip(nodes, indexes):
+            self._pair(node, index)
+
+    def _propagate(self):
+        reference = self.reference
+        while self.queue:
+            node, index = self.queue.popleft()
+            for user_side, ref_side in ((self.out_edges[node], reference.out_by_label[index]),
+                                        (self.in_edges[node], reference.in_by_label[index])):
+                free_nodes = defaultdict(list)
+                for neighbor in user_side:
+                    if neighbor not in self.mapping and neighbor in self.labels:
+                        free_nodes[self.labels[neighbor]].append(neighbor)
+                for label, nodes in free_nodes.items():
+                    indexes = [i for i in ref_side.get(label, ()) if i not in self.used]
+                    if indexes:
+                        self._pair_groups(list(dict.fromkeys(nodes)), indexes)
+
+    def run(self):
+        reference = self.reference
+        by_label = defaultdict(list)
+        for node, label in self.labels.items():
+            by_label[label].append(node)
+
+        # Сначала подписи, уникальные в эталоне, затем остальные по одной паре
+        labels = sorted(by_label, key=lambda label: (reference.label_counts.get(label, 0) != 1,
+                                                     reference.by_label.get(label, [len(reference)])[0]))
+        for label in labels:
+            while True:
+                nodes = [n for n in by_label[label] if n not in self.mapping]
+                indexes = [i for i in reference.by_label.get(label, ()) if i not in self.used]
+                if not nodes or not indexes:
+                    break
+                self._pair_groups(nodes[:1] if len(indexes) > 1 else nodes, indexes)
+                self._propagate()
+        return self.mapping
+
+
+def _distance(a, b):
+    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+
+def validate(labels: Dict[Hashable, str], edges: Iterable[Tuple[Hashable, Hashable]],
+             reference: ReferenceGraph) -> ValidationResult:
+    # labels: узел -> подпись (порядок задает порядок сообщений об ошибках),
+    # edges: ориентированные ребра между узлами
+    edges = list(dict.fromkeys((start, end) for start, end in edges
+                               if start in labels and end in labels))
+    mapping = _Matcher(labels, edges, reference).run()
+
+    realized = set()
+    incorrect = []
+    for start, end in edges:
+        ref_edge = (mapping.get(start), mapping.get(end))
+        if ref_edge in reference.edges:
+            realized.add(ref_edge)
+        else:
+            incorrect.append((start, end))
+
+    missing_edges = [edge for edge in reference.edge_list if edge not in realized]
+    missing_starts = {start for start, _ in missing_edges}
+    missing_ends = {end for _, end in missing_edges}
+    wrong_edges = []
+    extra_edges = []
+    for start, end in incorrect:
+        if mapping.get(start) in missing_starts or mapping.get(end) in missing_ends:
+            wrong_edges.append((start, end))
+        else:
+            extra_edges.append((start, end))
+
+    used = set(mapping.values())
+    missing_blocks = [i for i in range(len(reference)) if i not in used]
+    extra_blocks = [node for node in labels if node not in mapping]
+    return ValidationResult(mapping, missing_blocks, extra_blocks, missing_edges, wrong_edges, extra_edges)
+
+
+def describe_error(result: ValidationResult, reference: ReferenceGraph,
+                   labels: Dict[Hashable, str], mode: str) -> str:
+    # Сообщение о первой ошибке и общее число ошибок
+    errors = (len(result.extra_blocks) + len(result.missing_blocks) + len(result.missing_edges)
+              + len(result.wrong_edges) + len(result.extra_edges))
+    suffix = f" (всего ошибок: {errors})" if errors > 1 else ""
+
+    if len(labels) != len(reference):
+        return f"Неверное количество элементов для {mode}!{suffix}"
+    if result.extra_blocks:
+        name = labels[result.extra_blocks[0]].replace('\n', ' ')
+        return f"Лишний элемент в {mode}: {name}{suffix}"
+    if result.missing_blocks:
+        name = reference.labels[result.missing_blocks[0]].replace('\n', ' ')
+        return f"Не хватает элемента в {mode}: {name}{suffix}"
+    if result.missing_edges:
+        start_idx, end_idx = result.missing_edges[0]
+        start_name = reference.labels[start_idx].replace('\n', ' ')
+        end_name = reference.labels[end_idx].replace('\n', ' ')
+        return f"Отсутствует соединение между {start_name} и {end_name} в {mode}{suffix}"
+    start, end = (result.wrong_edges + result.extra_edges)[0]
+    start_name = labels[start].replace('\n', ' ')
+    end_name = labels[end].replace('\n', ' ')
+    return f"Лишнее соединение между {start_name} и {end_name} в {mode}{suffix}"
+
+
+class LiveValidator:
+    # Инкрементальная проверка: поддерживает сопоставление с эталоном и
+    # множества ошибок при каждом добавлении или удалении блока и ребра.
+    # Каждая правка стоит O(степени) затронутых узлов. Сопоставление жадное,
+    # окончательный ответ дает validate().
+    def __init__(self, reference: ReferenceGraph):
+        self.reference = reference
+        self.labels = {}
+        self.order = {}
+        self.counter = 0
+        self.out_edges = defaultdict(set)
+        self.in_edges = defaultdict(set)
+        self.edge_counts = Counter()
+        self.mapping = {}
+        self.reverse = {}
+        # Узел, сопоставленный через соседа, помнит (соседа, ребро): при удалении
+        # ребра сопоставления, выведенные через него, снимаются целым поддеревом
+        self.parent = {}
+        self.children = defaultdict(set)
+        self.realized = set()
+        self.realized_by_edge = {}  # ребро пользователя -> ребро эталона, которое оно реализует
+        self.unmatched_by_label = defaultdict(set)
+        self.free_slots = Counter(reference.label_counts)
+        self.error_nodes = set()
+        self.error_edges = set()
+        self.changed_nodes = set()
+        self.changed_edges = set()
+
+    # --- правки схемы ---
+
+    def add_node(self, node, label: str):
+        self.labels[node] = label
+        self.order[node] = self.counter
+        self.counter += 1
+        self.unmatched_by_label[label].add(node)
+        if self.reference.label_counts.get(label) == 1 and self.free_slots[label]:
+            self._match(node, self.reference.by_label[label][0])
+        self._refresh_node(node)
+
+    def remove_node(self, node):
+        if node not in self.labels:
+            return
+        detached = self._detach(node) if node in self.mapping else []
+        for end in list(self.out_edges[node]):
+            self._drop_edge(node, end)
+        for start in list(self.in_edges[node]):
+            self._drop_edge(start, node)
+        label = self.labels[node]
+        self.unmatched_by_label[label].discard(node)
+        del self.labels[node]
+        del self.order[node]
+        self.out_edges.pop(node, None)
+        self.in_edges.pop(node, None)
+        if node in self.error_nodes:
+            self.error_nodes.discard(node)
+            self.changed_nodes.add(node)
+        self._fill_unique_slot(label)
+        self._refresh_label(label)
+        self._reattach(detached, label)
+
+    def add_edge(self, start, end):
+        if start not in self.labels or end not in self.labels:
+            return
+        edge = (start, end)
+        self.edge_counts[edge] += 1
+        if self.edge_counts[edge] > 1:
+            return
+        self.out_edges[start].add(end)
+        self.in_edges[end].add(start)
+        if start in self.mapping and end not in self.mapping:
+            self._extend(start, end, outgoing=True)
+        elif end in self.mapping and start not in self.mapping:
+            self._extend(end, start, outgoing=False)
+        self._refresh_edge(edge)
+
+    def remove_edge(self, start, end):
+        edge = (start, end)
+        if not self.edge_counts.get(edge):
+            return
+        self.edge_counts[edge] -= 1
+        if self.edge_counts[edge] == 0:
+            self._drop_edge(start, end)
+            # Узел, сопоставленный через это ребро или державшийся только на нем,
+            # снова ждет сопоставления вместе со всеми, кто выведен через него
+            detached = []
+            for node in edge:
+                if node in self.mapping and (
+                        self.parent.get(node, (None, None))[1] == edge
+                        or (self.reference.label_counts.get(self.labels[node]) != 1
+                            and not self._has_correct_edge(node))):
+                    detached += self._detach(node)
+            self._reattach(detached)
+
+    def rebuild(self, labels, edges, mapping=None):
+        # Полная пересборка состояния, например по результату validate()
+        self.__init__(self.reference)
+        for node, label in labels.items():
+            self.labels[node] = label
+            self.order[node] = self.counter
+            self.counter += 1
+            self.unmatched_by_label[label].add(node)
+        for start, end in edges:
+            if start in self.labels and end in self.labels:
+                self.edge_counts[(start, end)] += 1
+                self.out_edges[start].add(end)
+                self.in_edges[end].add(start)
+        for node, index in (mapping or {}).items():
+            self._match(node, index, propagate=False)
+        for node in list(self.labels):
+            if node not in self.mapping and self.reference.label_counts.get(self.labels[node]) == 1:
+                self._fill_unique_slot(self.labels[node])
+        for node in self.labels:
+            self._refresh_node(node)
+        for edge in self.edge_counts:
+            self._refresh_edge(edge)
+
+    # --- состояние ---
+
+    @property
+    def missing_edges(self):
+        return self.reference.edges - self.realized
+
+    @property
+    def ok(self) -> bool:
+        return (len(self.mapping) == len(self.labels) == len(self.reference)
+                and not self.error_edges and self.realized == self.reference.edges)
+
+    def pop_changes(self):
+        # Узлы и ребра, у которых с прошлого вызова мог измениться статус ошибки
+        nodes, edges = self.changed_nodes, self.changed_edges
+        self.changed_nodes, self.changed_edges = set(), set()
+        return nodes, edges
+
+    # --- внутренние операции ---
+
+    def _match(self, node, index, propagate=True, parent=None):
+        # parent: (сопоставленный сосед, ребро), через которое выведена пара
+        label = self.labels[node]
+        self.mapping[node] = index
+        self.reverse[index] = node
+        if parent is not None:
+            self.parent[node] = parent
+            self.children[parent[0]].add(node)
+        self.unmatched_by_label[label].discard(node)
+        self.free_slots[label] -= 1
+        self._refresh_incident(node)
+        self._refresh_label(label)
+        self._refresh_node(node)
+        if propagate:
+            for end in list(self.out_edges[node]):
+                if end not in self.mapping:
+                    self._extend(node, end, outgoing=True)
+            for start in list(self.in_edges[node]):
+                if start not in self.mapping:
+                    self._extend(node, start, outgoing=False)
+
+    def _unmatch(self, node):
+        label = self.labels[node]
+        index = self.mapping.pop(node)
+        del self.reverse[index]
+        parent = self.parent.pop(node, None)
+        if parent is not None:
+            self.children[parent[0]].discard(node)
+        self.unmatched_by_label[label].add(node)
+        self.free_slots[label] += 1
+        self._refresh_incident(node)
+        self._refresh_node(node)
+
+    def _extend(self, matched, candidate, outgoing: bool):
+        # Сопоставляем соседа уже сопоставленного узла по ребру эталона
+        index = self.mapping[matched]
+        neighbors = self.reference.out_edges[index] if outgoing else self.reference.in_edges[index]
+        label = self.labels[candidate]
+        edge = (matched, candidate) if outgoing else (candidate, matched)
+        for neighbor in neighbors:
+            if neighbor not in self.reverse and self.reference.labels[neighbor] == label:
+                self._match(candidate, neighbor, parent=(matched, edge))
+                return
+
+    def _detach(self, node) -> List:
+        # Снимает сопоставление узла и всех, кто сопоставлен через него
+        detached = []
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            stack.extend(self.children.pop(current, ()))
+            if current in self.mapping:
+                self._unmatch(current)
+                detached.append(current)
+        for current in detached:
+            self._refresh_label(self.labels[current])
+        return detached
+
+    def _reattach(self, nodes, freed_label=None):
+        # Отцепленные узлы и ждущие узлы с освободившимися подписями заново ищут
+        # пару: уникальные подписи - свое место в эталоне, остальные - через уже
+        # сопоставленных соседей
+        labels = {self.labels[node] for node in nodes if node in self.labels}
+        if freed_label is not None:
+            labels.add(freed_label)
+        waiting = [node for label in labels for node in self.unmatched_by_label.get(label, ())]
+        for node in list(nodes) + sorted(waiting, key=self.order.__getitem__):
+            if node not in self.labels or node in self.mapping:
+                continue
+            label = self.labels[node]
+            if self.reference.label_counts.get(label) == 1:
+                self._fill_unique_slot(label)
+                continue
+            for start in list(self.in_edges[node]):
+                if start in self.mapping:
+                    self._extend(start, node, outgoing=True)
+                    if node in self.mapping:
+                        break
+            else:
+                for end in list(self.out_edges[node]):
+                    if end in self.mapping:
+                        self._extend(end, node, outgoing=False)
+                        if node in self.mapping:
+                            break
+
+    def _fill_unique_slot(self, label):
+        if self.reference.label_counts.get(label) != 1 or not self.free_slots[label]:
+            return
+        waiting = self.unmatched_by_label.get(label)
+        if waiting:
+            node = min(waiting, key=self.order.__getitem__)
+            self._match(node, self.reference.by_label[label][0])
+
+    def _has_correct_edge(self, node):
+        index = self.mapping[node]
+        for end in self.out_edges[node]:
+            if (index, self.mapping.get(end)) in self.reference.edges:
+                return True
+        for start in self.in_edges[node]:
+            if (self.mapping.get(start), index) in self.reference.edges:
+                return True
+        return False
+
+    def _drop_edge(self, start, end):
+        edge = (start, end)
+        self.edge_counts.pop(edge, None)
+        self.out_edges[start].discard(end)
+        self.in_edges[end].discard(start)
+        ref_edge = self.realized_by_edge.pop(edge, None)
+        if ref_edge is not None:
+            self.realized.discard(ref_edge)
+        if edge in self.error_edges:
+            self.error_edges.discard(edge)
+        self.changed_edges.add(edge)
+
+    def _edge_is_wrong(self, start, end):
+        reference = self.reference
+        start_index = self.mapping.get(start)
+        end_index = self.mapping.get(end)
+        if start_index is not None and end_index is not None:
+            return (start_index, end_index) not in reference.edges
+        if start in self.error_nodes or end in self.error_nodes:
+            return True
+        # Один конец сопоставлен, а подходящего свободного соседа в эталоне нет
+        if start_index is not None:
+            return True
+        if end_index is not None:
+            return True
+        return False
+
+    def _refresh_edge(self, edge):
+        start, end = edge
+        previous = self.realized_by_edge.pop(edge, None)
+        if previous is not None:
+            self.realized.discard(previous)
+        ref_edge = (self.mapping.get(start), self.mapping.get(end))
+        if ref_edge in self.reference.edges:
+            self.realized.add(ref_edge)
+            self.realized_by_edge[edge] = ref_edge
+        wrong = self._edge_is_wrong(start, end)
+        if wrong != (edge in self.error_edges):
+            if wrong:
+                self.error_edges.add(edge)
+            else:
+                self.error_edges.discard(edge)
+        self.changed_edges.add(edge)
+
+    def _refresh_incident(self, node):
+        for end in self.out_edges[node]:
+            self._refresh_edge((node, end))
+        for start in self.in_edges[node]:
+            self._refresh_edge((start, node))
+
+    def _refresh_node(self, node):
+        # Лишний блок: такой подписи нет в эталоне или все ее места заняты
+        label = self.labels[node]
+        error = node not in self.mapping and self.free_slots.get(label, 0) <= 0
+        if error != (node in self.error_nodes):
+            if error:
+                self.error_nodes.add(node)
+            else:
+                self.error_nodes.discard(node)
+            self.changed_nodes.add(node)
+            self._refresh_incident(node)
+
+    def _refresh_label(self, label):
+        for node in self.unmatched_by_label.get(label, ()):
+            self._refresh_node(node)
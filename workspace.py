@@ -0,0 +1,198 @@
+# Сохранение рабочей области и журнал автосохранения.
+#
+# Файл рабочей области - JSON-строки: заголовок, снимок состояния и дальше
+# операции правки по одной на строку. Журнал только дописывается, причем из
+# фонового потока, поэтому сохранение не задерживает кадр; когда операций
+# набирается много, поток сам сворачивает их в новый снимок. Оборванная при
+# сбое последняя строка при загрузке пропускается.
+#
+# Снимок: {'architecture', 'layers', 'stage', 'encoder_output',
+#          'encoder_blocks', 'encoder_arrows', 'blocks', 'arrows'}
+# Упражнение - имя из specs/ или полный путь к файлу спецификации
+# (architectures.spec_source)
+# Блок: [uid, вид ('block' или 'pos'), подпись, x, y, ширина, высота]
+# Стрелка: [uid начала, сторона, uid конца, сторона]
+# Операции: ['b', <блок>] - добавлен, ['m', uid, x, y] - перемещен,
+#           ['r', uid] - удален, ['a', <стрелка>] и ['x', <стрелка>] - стрелка
+#           добавлена и удалена, {'snapshot': <снимок>} - новое состояние целиком.
+import json
+import os
+import queue
+import threading
+from typing import Dict, List, Optional
+
+WORKSPACE_FORMAT = 'transformer-game-workspace'
+WORKSPACE_VERSION = 1
+
+
+class WorkspaceState:
+    # Состояние рабочей области из простых типов, к которому применяются операции журнала
+    def __init__(self, snapshot: Dict):
+        self.architecture = snapshot['architecture']
+        self.layers = snapshot['layers']
+        self.stage = snapshot['stage']
+        self.encoder_output = snapshot.get('encoder_output')
+        self.encoder_blocks = [list(row) for row in snapshot.get('encoder_blocks', ())]
+        self.encoder_arrows = [list(row) for row in snapshot.get('encoder_arrows', ())]
+        self.blocks = {row[0]: list(row) for row in snapshot.get('blocks', ())}
+        self.arrows = dict.fromkeys(tuple(row) for row in snapshot.get('arrows', ()))
+
+    def apply(self, op: List):
+        kind = op[0]
+        if kind == 'b':
+            self.blocks[op[1][0]] = list(op[1])
+        elif kind == 'm':
+            block = self.blocks.get(op[1])
+            if block is not None:
+                block[3], block[4] = op[2], op[3]
+        elif kind == 'r':
+            self.blocks.pop(op[1], None)
+        elif kind == 'a':
+            self.arrows[tuple(op[1])] = None
+        elif kind == 'x':
+            self.arrows.pop(tuple(op[1]), None)
+        else:
+            raise ValueError(f"Неизвестная операция журнала: {op!r}")
+
+    def snapshot(self) -> Dict:
+        return {
+            'architecture': self.architecture,
+            'layers': self.layers,
+            'stage': self.stage,
+            'encoder_output': self.encoder_output,
+            'encoder_blocks': self.encoder_blocks,
+            'encoder_arrows': self.encoder_arrows,
+            'blocks': list(self.blocks.values()),
+            'arrows': [list(arrow) for arrow in self.arrows],
+        }
+
+
+def _header() -> str:
+    return json.dumps({'format': WORKSPACE_FORMAT, 'version': WORKSPACE_VERSION}) + '\n'
+
+
+def _dumps(item) -> str:
+    return json.dumps(item, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def save_workspace(path: str, snapshot: Dict):
+    # Записывает рабочую область одним снимком (атомарно, через временный файл)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        file.write(_header())
+        file.write(_dumps({'snapshot': snapshot}))
+    os.replace(tmp_path, path)
+
+
+def load_workspace(path: str) -> Dict:
+    # Последний снимок из файла с примененными после него операциями
+    state = None
+    with open(path, encoding='utf-8') as file:
+        header = json.loads(file.readline())
+        if header.get('format') != WORKSPACE_FORMAT or header.get('version') != WORKSPACE_VERSION:
+            raise ValueError(f"{path}: неподдерживаемый формат рабочей области")
+        for line in file:
+            try:
+                item = json.loads(line)
+            except ValueError:
+                break  # недописанная строка после сбоя
+            if isinstance(item, dict):
+                state = WorkspaceState(item['snapshot'])
+            elif state is not None:
+                state.apply(item)
+    if state is None:
+        raise ValueError(f"{path}: в файле нет снимка рабочей области")
+    return state.snapshot()
+
+
+class AutosaveJournal:
+    # Журнал автосохранения: игра ставит операции в очередь, а фоновый поток
+    # пишет их пачками. Перемещения одного блока внутри пачки схлопываются.
+    def __init__(self, path: str, snapshot: Dict, compact_every: int = 5000):
+        self.path = path
+        self.compact_every = compact_every
+        self.queue = queue.Queue()
+        self.error: Optional[Exception] = None
+        self.state = WorkspaceState(snapshot)
+        self.ops_since_snapshot = 0
+        save_workspace(path, snapshot)
+        self.file = open(path, 'a', encoding='utf-8')
+        self.thread = threading.Thread(target=self._run, name='workspace-autosave', daemon=True)
+        self.thread.start()
+
+    def append(self, op: List):
+        self.queue.put(op)
+
+    def snapshot(self, snapshot: Dict):
+        # Новое состояние целиком (смена этапа, очистка); предыдущий журнал больше не нужен
+        self.queue.put({'snapshot': snapshot})
+
+    def backup(self, snapshot: Dict) -> str:
+        # Копия состояния рядом с журналом, пока его не затер новый снимок
+        path = f"{self.path}.bak"
+        save_workspace(path, snapshot)
+        return path
+
+    def flush(self):
+        # Дождаться, пока поток запишет все поставленное в очередь
+        self.queue.join()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.file.close()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            try:
+                self._write([item for item in batch if item is not None])
+            except OSError as error:
+                self.error = error  # автосохранение не должно ронять игру
+            for _ in batch:
+                self.queue.task_done()
+            if stop:
+                return
+
+    def _write(self, batch: List):
+        # Все до последнего снимка в пачке уже неактуально
+        for i in range(len(batch) - 1, -1, -1):
+            if isinstance(batch[i], dict):
+                self.state = WorkspaceState(batch[i]['snapshot'])
+                self._compact()
+                batch = batch[i + 1:]
+                break
+
+        moves = {}
+        ops = []
+        for op in batch:
+            if op[0] == 'm':
+                if op[1] not in moves:
+                    ops.append(op)
+                moves[op[1]] = op
+            else:
+                ops.append(op)
+        lines = []
+        for op in ops:
+            if op[0] == 'm':
+                op = moves[op[1]]
+            self.state.apply(op)
+            lines.append(_dumps(op))
+        if lines:
+            self.file.write(''.join(lines))
+            self.file.flush()
+            self.ops_since_snapshot += len(lines)
+        if self.ops_since_snapshot >= self.compact_every:
+            self._compact()
+
+    def _compact(self):
+        self.file.close()
+        save_workspace(self.path, self.state.snapshot())
+        self.file = open(self.path, 'a', encoding='utf-8')
+        self.ops_since_snapshot = 0